@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import utm
+from utm.tm import TuringMachine, TuringMachineParser
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+EXAMPLES_DIR = os.path.join(ROOT_DIR, "tm_examples")
+
+# Version of the results file format
+FORMAT_VERSION = 1
+
+# Default relative slowdown of the best time reported as a regression
+DEFAULT_THRESHOLD = 0.1
+
+
+# Benchmarks
+##############################################################################
+#
+# A benchmark is a setup function that prepares everything that is not
+# measured and returns the function to time. BENCHMARKS maps each name to
+# (setup, arguments, repeat, quick), quick benchmarks are the ones run with
+# --quick.
+
+
+def _load_example(name):
+    parser = TuringMachineParser()
+    parser.parse_file(os.path.join(EXAMPLES_DIR, name))
+    return parser.create()
+
+
+def generated_source(num_transitions):
+    """Returns the source of a machine with the given number of transitions,
+    a chain of states that flip each bit of the tape from left to right.
+    """
+    lines = ["HALT H", "BLANK #", "INITIAL s"]
+    num_states = max((num_transitions + 1) // 2, 1)
+    names = ["s"] + ["q%d" % i for i in range(1, num_states)] + ["H"]
+    for i in range(num_states):
+        lines.append("%s, 0 -> %s, 1, >" % (names[i], names[i + 1]))
+        lines.append("%s, 1 -> %s, 0, >" % (names[i], names[i + 1]))
+    return "\n".join(lines[: num_transitions + 3])
+
+
+def setup_parse(num_transitions):
+    source = generated_source(num_transitions)
+
+    def bench():
+        TuringMachineParser().parse_string(source)
+
+    return bench
+
+
+def setup_create(num_transitions):
+    parser = TuringMachineParser()
+    parser.parse_string(generated_source(num_transitions))
+    return parser.create
+
+
+def _setup_run(tm, tape):
+    def bench():
+        tm.set_at_initial_state()
+        tm.reset_executed_steps_counter()
+        tm.set_tape(tape)
+        tm.run()
+
+    return bench
+
+
+def setup_run_addition(n):
+    return _setup_run(_load_example("tm_addition.txt"), "#%s#%s" % ("1" * n, "1" * n))
+
+
+def setup_run_multiplication(n):
+    return _setup_run(
+        _load_example("tm_multiplication.txt"), "#%s#%s" % ("1" * n, "1" * n)
+    )
+
+
+def setup_tape_growth(steps, movement):
+    # Writes a 1 on every blank, so it is not a scan loop
+    tm = TuringMachine(
+        ["s", "H"],
+        ["1"],
+        ["1", "#"],
+        {("s", "#"): ("s", "1", movement)},
+        "s",
+        [],
+        "H",
+        "#",
+    )
+
+    def bench():
+        tm.reset_executed_steps_counter()
+        tm.set_tape("#")
+        tm.run(steps)
+
+    return bench
+
+
+def _addition_words(num_words):
+    # The first number can not be 0, the machine would not halt
+    return ["#%s#%s" % ("1" * (1 + i % 17), "1" * (i % 13)) for i in range(num_words)]
+
+
+def setup_is_word_accepted(num_words):
+    tm = _load_example("tm_addition.txt")
+    words = _addition_words(num_words)
+
+    def bench():
+        for word in words:
+            tm.is_word_accepted(word)
+
+    return bench
+
+
+def setup_accept_many(num_words):
+    tm = _load_example("tm_addition.txt")
+    words = _addition_words(num_words)
+
+    def bench():
+        for _ in tm.accept_many(words, workers=1):
+            pass
+
+    return bench
+
+
+BENCHMARKS = {}
+
+
+def _add(prefix, setup, args, repeat, quick, **kwargs):
+    extra = tuple(kwargs.values())
+    for arg, r, q in zip(args, repeat, quick):
+        BENCHMARKS["%s_%d" % (prefix, arg)] = (setup, (arg,) + extra, r, q)
+
+
+_add(
+    "parse",
+    setup_parse,
+    (10**3, 10**4, 10**5, 10**6),
+    (20, 5, 3, 1),
+    (1, 1, 0, 0),
+)
+_add(
+    "create",
+    setup_create,
+    (10**3, 10**4, 10**5, 10**6),
+    (20, 5, 3, 1),
+    (1, 1, 0, 0),
+)
+_add(
+    "run_addition",
+    setup_run_addition,
+    (10**3, 10**4, 10**5),
+    (20, 5, 3),
+    (1, 1, 0),
+)
+_add(
+    "run_multiplication",
+    setup_run_multiplication,
+    (10, 30, 60),
+    (20, 5, 3),
+    (1, 1, 0),
+)
+_add(
+    "tape_growth_right",
+    setup_tape_growth,
+    (10**5, 10**6),
+    (5, 3),
+    (1, 0),
+    movement=TuringMachine.MOVE_RIGHT,
+)
+_add(
+    "tape_growth_left",
+    setup_tape_growth,
+    (10**5, 10**6),
+    (5, 3),
+    (1, 0),
+    movement=TuringMachine.MOVE_LEFT,
+)
+_add("is_word_accepted", setup_is_word_accepted, (10**3, 10**4), (5, 3), (1, 0))
+_add("accept_many", setup_accept_many, (10**3, 10**4), (5, 3), (1, 0))
+
+
+# Running and comparing
+##############################################################################
+
+
+def select(patterns=(), quick=False):
+    """Returns the names of the benchmarks that contain any of the patterns
+    (all if there are none), only the quick ones if quick is True.
+    """
+    return [
+        name
+        for name, (_, _, _, is_quick) in BENCHMARKS.items()
+        if (not quick or is_quick)
+        and (not patterns or any(p in name for p in patterns))
+    ]
+
+
+def run(names, repeat=None, log=None):
+    """Runs the given benchmarks.
+
+    :param repeat: Number of timed runs of every benchmark, by default the
+        one of each benchmark.
+    :param log: Function called with a line of progress after each
+        benchmark.
+
+    :return: Dictionary name -> {"best", "median", "mean", "repeat"}, the
+        times are in seconds.
+    """
+    results = {}
+    for name in names:
+        setup, args, default_repeat, _ = BENCHMARKS[name]
+        bench = setup(*args)
+        times = []
+        for _ in range(repeat or default_repeat):
+            start = time.perf_counter()
+            bench()
+            times.append(time.perf_counter() - start)
+        results[name] = {
+            "best": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "repeat": len(times),
+        }
+        if log is not None:
+            log("%-28s %12.6f s" % (name, min(times)))
+    return results
+
+
+def metadata():
+    """Returns the environment of a run: versions, platform and commit"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "utm_version": utm.__version__,
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.machine(),
+    }
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """Compares the best times of results with the ones of a baseline.
+
+    :return: List of tuples (name, baseline time, new time, ratio,
+        regression) of the benchmarks in both, regression is True if the new
+        time is more than threshold (relative) slower.
+    """
+    rows = []
+    for name, result in results.items():
+        if name in baseline:
+            old, new = baseline[name]["best"], result["best"]
+            ratio = new / old if old else float("inf")
+            rows.append((name, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Times the simulator core and writes the results as "
+        "JSON, optionally comparing them with a previous results file.",
+    )
+    arg_parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        default=[],
+        help="run only the benchmarks whose name contains this text, it can "
+        "be given several times",
+    )
+    arg_parser.add_argument(
+        "--quick", action="store_true", help="run only the small benchmarks"
+    )
+    arg_parser.add_argument(
+        "--repeat", type=int, default=None, help="timed runs of each benchmark"
+    )
+    arg_parser.add_argument(
+        "-o", "--output", default=None, help="file where the results are written"
+    )
+    arg_parser.add_argument(
+        "--compare",
+        default=None,
+        help="results file of a previous run to compare with, the exit status "
+        "is 1 if some benchmark got slower than the threshold",
+    )
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown reported as a regression (default: %(default)s)",
+    )
+    arg_parser.add_argument(
+        "--list", action="store_true", help="list the benchmarks and exit"
+    )
+    args = arg_parser.parse_args(argv)
+
+    names = select(args.filter, args.quick)
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("version") != FORMAT_VERSION:
+            print(
+                "Error: %s has another format version" % args.compare,
+                file=sys.stderr,
+            )
+            return 2
+
+    results = run(names, args.repeat, log=print)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": FORMAT_VERSION, "metadata": metadata(), "results": results},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+
+    if baseline is None:
+        return 0
+
+    print()
+    print("%-28s %12s %12s %8s" % ("Benchmark", "Baseline", "Current", "Ratio"))
+    regressions = 0
+    for name, old, new, ratio, regression in compare(
+        baseline["results"], results, args.threshold
+    ):
+        regressions += regression
+        print(
+            "%-28s %12.6f %12.6f %7.2fx%s"
+            % (name, old, new, ratio, "  REGRESSION" if regression else "")
+        )
+    return 1 if regressions else 0
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+from unittest import TestCase
+
+from utm.log import ActivityLog
+
+
+class TestActivityLog(TestCase):
+    def test_export(self):
+        log = ActivityLog()
+        log.append(ActivityLog.INFO, "not exported")
+        self.assertFalse(log.is_exporting())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "log.txt")
+            shown = [(ActivityLog.INFO, "a"), (ActivityLog.ERROR, "b")]
+            log.start_export(path, shown)
+            self.assertTrue(log.is_exporting())
+            for msg in ("c", "d", "e"):
+                log.append(ActivityLog.INFO, msg)
+            log.append(ActivityLog.ERROR, "f")
+            log.stop_export()
+            self.assertFalse(log.is_exporting())
+            log.append(ActivityLog.INFO, "g")
+
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), "a\nERROR: b\nc\nd\ne\nERROR: f\n")
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import os
+from unittest import TestCase
+
+from utm.tm import TuringMachine, TuringMachineParser
+from utm.tm.analysis import analyze, warnings
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
+TEST_STR = """
+HALT H
+BLANK #
+INITIAL a
+FINAL f
+a, 0 -> b, 1, >
+a, 1 -> f, 1, >
+b, 0 -> b, 0, >
+b, # -> c, #, <
+c, 0 -> c, 1, <
+c, 1 -> c, 0, <
+c, # -> c, #, <
+f, 0 -> H, 0, _
+u, 0 -> H, 0, _
+"""
+
+
+def create(source):
+    parser = TuringMachineParser()
+    parser.parse_string(source)
+    return parser.create()
+
+
+class TestAnalysis(TestCase):
+    def test_analyze(self):
+        result = create(TEST_STR).get_definition().analysis
+        self.assertEqual(result.unreachable_states, {"u"})
+        # f is final, stopping there accepts the input
+        self.assertEqual(result.missing_transitions, {("a", "#"), ("b", "1")})
+        self.assertEqual(result.non_halting_states, {"b", "c"})
+        self.assertEqual(result.endless_states, {"c"})
+        self.assertEqual(result.dead_end_states, set())
+        self.assertEqual(result.unread_symbols, set())
+
+    def test_dead_ends_and_scan_loops(self):
+        tm = TuringMachine(
+            ["s", "t", "d", "H"],
+            ["1"],
+            ["1", "x", "#"],
+            {
+                ("s", "1"): ("t", "1", TuringMachine.MOVE_RIGHT),
+                ("s", "#"): ("d", "#", TuringMachine.NON_MOVEMENT),
+                ("t", "#"): ("t", "#", TuringMachine.MOVE_RIGHT),
+            },
+            "s",
+            [],
+            "H",
+            "#",
+        )
+        result = analyze(tm.get_definition().table, "s")
+        self.assertEqual(result.dead_end_states, {"d"})
+        self.assertEqual(result.scan_loop_states, {"t"})
+        self.assertEqual(result.unread_symbols, {"x"})
+        self.assertEqual(
+            result.missing_transitions,
+            {("s", "x"), ("t", "1"), ("t", "x"), ("d", "1"), ("d", "x"), ("d", "#")},
+        )
+
+    def test_examples(self):
+        for name in ("tm_addition.txt", "tm_multiplication.txt"):
+            parser = TuringMachineParser()
+            parser.parse_file(os.path.join(EXAMPLES_DIR, name))
+            result = parser.create().get_definition().analysis
+            self.assertFalse(result.unreachable_states)
+            self.assertFalse(result.endless_states)
+            self.assertEqual(warnings(result), [])
+
+    def test_warnings(self):
+        result = create(TEST_STR).get_definition().analysis
+        self.assertEqual(
+            warnings(result),
+            [
+                "Unreachable states: u",
+                "Missing transitions: (a, #), (b, 1)",
+                "States that can not reach the halt state: b, c",
+                "States from which the machine never stops: c",
+            ],
+        )
+        self.assertEqual(
+            warnings(result, limit=1)[1], "Missing transitions: (a, #) and 1 more"
+        )
+
+    def test_endless_states_stop_loop_detection(self):
+        tm = create(TEST_STR)
+        tm.set_tape("00")
+        self.assertEqual(tm.run(10**6, detect_loops=True), TuringMachine.EXIT_LOOP)
+        self.assertEqual(tm.get_current_state(), "c")
+        self.assertLessEqual(
+            tm.get_executed_steps_counter(), TuringMachine.LOOP_CHECK_INTERVAL
+        )
+
+        # Already in an endless state, nothing is run
+        tm.reset_executed_steps_counter()
+        self.assertEqual(tm.run(10**6, detect_loops=True), TuringMachine.EXIT_LOOP)
+        self.assertEqual(tm.get_executed_steps_counter(), 0)
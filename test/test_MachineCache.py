@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from utm.tm import MachineCache, TuringMachine
+
+
+SOURCE = """
+HALT H
+BLANK #
+INITIAL a
+a, 1 -> a, 0, >
+a, # -> H, #, _
+"""
+
+
+class TestMachineCache(TestCase):
+    def test_get(self):
+        cache = MachineCache()
+        tm1 = cache.get(SOURCE)
+        tm2 = cache.get(SOURCE)
+        self.assertEqual((cache.get_hits(), cache.get_misses()), (1, 1))
+        self.assertIsNot(tm1, tm2)
+        self.assertIs(tm1._table, tm2._table)
+
+        tm1.set_tape("111")
+        self.assertEqual(tm1.run(), TuringMachine.EXIT_HALT)
+        self.assertEqual(tm2.get_current_state(), "a")
+        self.assertFalse(tm2.is_tape_set())
+        self.assertFalse(tm2.is_word_accepted("11"))
+
+    def test_eviction(self):
+        cache = MachineCache(2)
+        sources = [SOURCE + "FINAL %s\n" % s for s in "abc"]
+        for src in sources:
+            cache.get(src)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(sources[0], cache)
+
+        cache.get(sources[1])  # sources[2] becomes the least recently used
+        cache.get(sources[0])
+        self.assertNotIn(sources[2], cache)
+        self.assertIn(sources[1], cache)
+
+        cache.set_max_size(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIn(sources[0], cache)
+
+    def test_invalid_source(self):
+        cache = MachineCache()
+        with self.assertRaises(Exception):
+            cache.get("HALT H\nINITIAL a\n")
+        self.assertEqual(len(cache), 0)
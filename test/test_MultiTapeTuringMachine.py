@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+from unittest import TestCase
+
+from utm.tm import (
+    MultiTapeDefinition,
+    MultiTapeTuringMachine,
+    TuringMachine,
+    TuringMachineParser,
+)
+from utm.tm.builder import TuringMachineBuilder
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
+
+def load_compare():
+    parser = TuringMachineParser()
+    parser.parse_file(os.path.join(EXAMPLES_DIR, "tm_2tape_compare.txt"))
+    return parser.create()
+
+
+class TestMultiTapeTuringMachine(TestCase):
+    def test_accept(self):
+        tm = load_compare()
+        self.assertIsInstance(tm, MultiTapeTuringMachine)
+        self.assertEqual(tm.get_num_tapes(), 2)
+        for word in ("#", "0110#0110", "1#1"):
+            self.assertTrue(tm.is_word_accepted(word), word)
+        for word in ("0110#0111", "01#011", "0#"):
+            self.assertFalse(tm.is_word_accepted(word), word)
+
+    def test_run(self):
+        tm = load_compare()
+        word = "01" * 500
+        tm.set_tape(word + "#" + word)
+        self.assertEqual(tm.run(), TuringMachine.EXIT_UNKNOWN_TRANSITION)
+        self.assertEqual(tm.get_current_state(), "y")
+        # Linear: copy, rewind and compare take about len(word) steps each
+        self.assertEqual(tm.get_executed_steps_counter(), 3 * len(word) + 3)
+        self.assertEqual("".join(tm.get_tape_iterator(1)).strip("_"), word)
+        self.assertEqual(tm.get_head_position(0), 2 * len(word) + 1)
+
+        tm.set_at_initial_state()
+        tm.set_tapes(["0#1", "_"], [0, 5])
+        tm.run_step()
+        self.assertEqual(tm.get_current_state(), "c")
+        self.assertEqual(tm.get_symbol_at(tm.get_head_position(1) - 1, 1), "0")
+
+    def test_builder_validation(self):
+        builder = TuringMachineBuilder()
+        builder.set_blank_symbol("#")
+        builder.set_halt_state("H")
+        builder.set_initial_state("a")
+        with self.assertRaises(Exception):
+            builder.add_transition("a", ("1", "1"), "H", ("1",), (1, 1))
+        with self.assertRaises(Exception):
+            builder.add_transition("a", ("1", "1"), "H", ("1", "1"), (1, 7))
+
+        builder.add_transition("a", ("1", "#"), "H", ("1", "1"), (1, 3))
+        builder.add_transition("a", "#", "H", "#", TuringMachine.NON_MOVEMENT)
+        with self.assertRaisesRegex(Exception, "same number of tapes"):
+            builder.create()
+        builder.remove_transition("a", "#")
+        self.assertIsInstance(builder.create(), MultiTapeTuringMachine)
+
+    def test_parse_errors(self):
+        parser = TuringMachineParser()
+        with self.assertRaisesRegex(Exception, "Line 2, Transition tuples"):
+            parser.parse_string("HALT H\na, (1, 1) -> H, (1), (>, >)\n")
+
+        parser = TuringMachineParser()
+        parser.update_lines(0, 0, ["HALT H", "a, (1, 1) -> H, (1, 1), (>, ^)"])
+        self.assertEqual(parser.get_errors(), [(2, "Invalid tuple movement '^'")])
+
+    def test_definition(self):
+        tm = load_compare()
+        definition = tm.get_definition()
+        self.assertIsInstance(definition, MultiTapeDefinition)
+        self.assertEqual(definition.num_tapes, 2)
+        with self.assertRaises(AttributeError):
+            definition.num_tapes = 3
+
+        # Machines share the definition, pickling compiles it again
+        other = MultiTapeTuringMachine.from_definition(definition)
+        self.assertIs(other.get_definition(), definition)
+        copy = pickle.loads(pickle.dumps(definition))
+        self.assertEqual(str(copy), str(definition))
+        other = MultiTapeTuringMachine.from_definition(copy)
+        self.assertTrue(other.is_word_accepted("0110#0110"))
+        self.assertFalse(other.is_word_accepted("0110#0111"))
+
+        with self.assertRaisesRegex(Exception, "Invalid format"):
+            MultiTapeDefinition(
+                {"a", "H"},
+                set(),
+                {"#"},
+                {("a", ("#",)): ("H", ("#",), (3,))},
+                "a",
+                set(),
+                "H",
+                "#",
+                num_tapes=2,
+            )
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from utm.tm import (
+    NondeterministicTuringMachine,
+    TuringMachine,
+    TuringMachineParser,
+)
+
+
+# Accepts the words over {0, 1} that contain "11", guessing where it starts
+CONTAINS_11 = """
+INITIAL s
+BLANK #
+HALT h
+FINAL f
+s, 0 -> s, 0, >
+s, 1 -> s, 1, >
+s, 1 -> a, 1, >
+a, 1 -> f, 1, _
+"""
+
+# Writes any binary string, it never stops
+GENERATOR = """
+INITIAL s
+BLANK #
+HALT h
+s, # -> s, 0, >
+s, # -> s, 1, >
+"""
+
+
+def _parse(source):
+    parser = TuringMachineParser(nondeterministic=True)
+    parser.parse_string(source)
+    return parser.create()
+
+
+class TestNondeterministicTuringMachine(TestCase):
+    def test_accept(self):
+        ntm = _parse(CONTAINS_11)
+        self.assertIsInstance(ntm, NondeterministicTuringMachine)
+        for word in ("11", "0110", "10101011"):
+            self.assertTrue(ntm.is_word_accepted(word), word)
+        for word in ("", "1", "0101", "10101"):
+            self.assertFalse(ntm.is_word_accepted(word), word)
+
+        result = ntm.explore("0110")
+        self.assertEqual(result.exit_code, NondeterministicTuringMachine.EXIT_HALT)
+        self.assertEqual((result.steps, result.state), (3, "f"))
+        self.assertEqual(result.tape, list("0110"))
+
+    def test_limits(self):
+        ntm = _parse(GENERATOR)
+        result = ntm.explore("", max_steps=8)
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.exit_code, NondeterministicTuringMachine.EXIT_MAX_STEPS)
+        self.assertEqual(result.configurations, 2**9 - 1)
+
+        result = ntm.explore("", memory_limit=1 << 16)
+        self.assertEqual(
+            result.exit_code, NondeterministicTuringMachine.EXIT_MEMORY_LIMIT
+        )
+
+        # 0 is no limit, as in TuringMachine.run()
+        result = ntm.explore("", max_steps=0, memory_limit=1 << 16)
+        self.assertEqual(
+            result.exit_code, NondeterministicTuringMachine.EXIT_MEMORY_LIMIT
+        )
+        self.assertTrue(_parse(CONTAINS_11).is_word_accepted("0110", max_steps=0))
+
+    def test_duplicated_configurations(self):
+        # Both branches reach the same configuration and the loop is dropped
+        ntm = NondeterministicTuringMachine(
+            ["a", "b", "H"],
+            ["1"],
+            ["1", "#"],
+            {
+                ("a", "1"): [
+                    ("b", "1", TuringMachine.MOVE_LEFT),
+                    ("b", "1", TuringMachine.NON_MOVEMENT),
+                ],
+                ("b", "1"): [("a", "1", TuringMachine.NON_MOVEMENT)],
+            },
+            "a",
+            [],
+            "H",
+            "#",
+        )
+        result = ntm.explore("111")
+        self.assertEqual(result.exit_code, NondeterministicTuringMachine.EXIT_HALT)
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.configurations, 3)
+
+    def test_workers(self):
+        ntm = _parse(GENERATOR)
+        min_configurations = NondeterministicTuringMachine.PARALLEL_MIN_CONFIGURATIONS
+        NondeterministicTuringMachine.PARALLEL_MIN_CONFIGURATIONS = 16
+        try:
+            result = ntm.explore("", max_steps=10, workers=2)
+        finally:
+            NondeterministicTuringMachine.PARALLEL_MIN_CONFIGURATIONS = (
+                min_configurations
+            )
+        self.assertEqual(result, ntm.explore("", max_steps=10))
+
+    def test_update_lines(self):
+        parser = TuringMachineParser(nondeterministic=True)
+        lines = CONTAINS_11.splitlines()
+        parser.update_lines(0, 0, lines + ["s, 1 -> a, 1, >"])
+        self.assertTrue(parser.create().is_word_accepted("011"))
+
+        # The duplicated line still adds the transition
+        parser.update_lines(len(lines) - 2, 1, [])
+        self.assertTrue(parser.create().is_word_accepted("011"))
+        parser.update_lines(len(lines) - 1, 1, [])
+        self.assertFalse(parser.create().is_word_accepted("011"))
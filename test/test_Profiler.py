@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from unittest import TestCase
+
+from utm.tm import Profiler, TuringMachineParser
+
+from test_TuringMachine import NullObserver, StepsObserver
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
+
+def load_example(name):
+    parser = TuringMachineParser()
+    parser.parse_file(os.path.join(EXAMPLES_DIR, name))
+    return parser.create()
+
+
+def profile(tm, tape, observer=None, sample_every=1):
+    profiler = Profiler(sample_every)
+    tm.set_profiler(profiler)
+    if observer is not None:
+        tm.attach_observer(observer)
+    tm.set_tape(tape)
+    tm.run()
+    return profiler
+
+
+class TestProfiler(TestCase):
+    def test_hits(self):
+        tm = load_example("tm_multiplication.txt")
+        profiler = profile(tm, "#1111#111")
+        hits = profiler.get_transition_hits()
+        self.assertEqual(profiler.get_steps(), tm.get_executed_steps_counter())
+        self.assertEqual(sum(h for _, _, h in hits), profiler.get_steps())
+        self.assertEqual(hits, sorted(hits, key=lambda t: -t[2]))
+        self.assertEqual(
+            sum(h for _, h in profiler.get_state_hits()), profiler.get_steps()
+        )
+        self.assertEqual(profiler.get_head_range(), (0, 21))
+        self.assertEqual(
+            profiler.get_tape_growths(), [(9, "right", 18), (150, "right", 36)]
+        )
+
+        # The observed runs, step by step or in batches, count the same
+        for observer in (NullObserver(), StepsObserver()):
+            tm = load_example("tm_multiplication.txt")
+            other = profile(tm, "#1111#111", observer)
+            self.assertEqual(other.get_transition_hits(), hits)
+            self.assertEqual(other.get_head_range(), profiler.get_head_range())
+
+    def test_sampling(self):
+        chunk_steps = Profiler.CHUNK_STEPS
+        Profiler.CHUNK_STEPS = 16
+        try:
+            tm = load_example("tm_multiplication.txt")
+            profiler = profile(tm, "#1111#111", sample_every=4)
+        finally:
+            Profiler.CHUNK_STEPS = chunk_steps
+
+        self.assertEqual(profiler.get_steps(), tm.get_executed_steps_counter())
+        self.assertLess(profiler.get_sampled_steps(), profiler.get_steps() / 2)
+        self.assertEqual(
+            sum(h for _, _, h in profiler.get_transition_hits()),
+            profiler.get_sampled_steps(),
+        )
+
+    def test_report(self):
+        tm = load_example("tm_addition.txt")
+        profiler = profile(tm, "#111#11")
+        report = json.loads(profiler.to_json(top=2))
+        self.assertEqual(report["steps"], 15)
+        self.assertEqual(len(report["transitions"]), 2)
+        self.assertEqual(report["transitions"][0]["estimated_hits"], 5)
+        self.assertIn("Steps: 15", profiler.format_report())
+
+        other = load_example("tm_multiplication.txt")
+        other.set_profiler(profiler)
+        other.set_tape("#1#1")
+        with self.assertRaises(ValueError):
+            other.run()
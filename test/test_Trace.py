@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+from unittest import TestCase
+
+from utm.tm import TraceRecorder, TraceReplayer, TuringMachineParser
+
+from test_TuringMachine import NullObserver
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
+
+def load_example(name):
+    parser = TuringMachineParser()
+    parser.parse_file(os.path.join(EXAMPLES_DIR, name))
+    return parser.create()
+
+
+def configuration(tm):
+    tape = "".join(tm.get_tape_iterator())
+    # Head position relative to the first non-blank cell
+    head = tm.get_head_position() - (len(tape) - len(tape.lstrip("#")))
+    return tm.get_current_state(), tape.strip("#"), head
+
+
+class TestTrace(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "run.trace")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_seek(self):
+        tm = load_example("tm_multiplication.txt")
+        tm.set_tape("#111111#11111")
+        with TraceRecorder(tm, self.path, keyframe_interval=100) as recorder:
+            tm.run()
+        self.assertEqual(recorder.get_num_steps(), tm.get_executed_steps_counter())
+
+        # Reference configurations of a machine run step by step
+        ref = load_example("tm_multiplication.txt")
+        ref.set_tape("#111111#11111")
+        expected = [configuration(ref)]
+        while ref.run(1) == ref.EXIT_MAX_STEPS:
+            expected.append(configuration(ref))
+        expected.append(configuration(ref))
+
+        other = load_example("tm_multiplication.txt")
+        with TraceReplayer(self.path, tm.get_definition()) as replayer:
+            self.assertEqual(replayer.get_num_steps(), len(expected) - 1)
+            self.assertGreater(len(replayer.get_keyframe_steps()), 2)
+            for step in (0, 1, 99, 100, 101, 345, len(expected) - 1):
+                other.restore(replayer.seek(step))
+                self.assertEqual(configuration(other), expected[step], step)
+                self.assertEqual(other.get_executed_steps_counter(), step)
+            steps = list(replayer.iter_steps(0, 2))
+            self.assertEqual(steps, [("0", "#", "#", 1), ("0", "1", "#", 1)])
+            with self.assertRaises(IndexError):
+                replayer.seek(len(expected))
+
+    def test_observed_run_and_tape_changes(self):
+        tm = load_example("tm_addition.txt")
+        tm.attach_observer(NullObserver())
+        recorder = TraceRecorder(tm, self.path, keyframe_interval=4)
+        tm.set_tape("#111#11")
+        tm.run()
+        tm.set_at_initial_state()
+        tm.set_tape("#1#1")
+        tm.run()
+        recorder.close()
+
+        replayer = TraceReplayer(self.path, tm.get_definition())
+        self.assertEqual(replayer.get_num_steps(), 15 + 9)
+        tm.restore(replayer.seek(15))
+        self.assertEqual(configuration(tm), ("0", "1#1", -1))
+        tm.restore(replayer.seek(24))
+        self.assertEqual(configuration(tm), ("HALT", "11", 0))
+        replayer.close()
+
+        # A truncated trace is read up to its last complete chunk
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        with TraceReplayer(self.path, tm.get_definition()) as replayer:
+            self.assertLess(replayer.get_num_steps(), 24)
+            tm.restore(replayer.seek(10))
@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+
+from utm.tm import (
+    BaseTuringMachineObserver,
+    MachineDefinition,
+    TuringMachine,
+    TuringMachineParser,
+)
+from utm.tm.compiled import CompiledFormatError
+from utm.tm.exceptions import UndoJournalEmptyException
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
+TEST_STR = """
+HALT HALT
+BLANK #
+INITIAL 1
+FINAL 2
+1, 0 -> 2, 1, >
+1, 1 -> 2, 0, >
+2, 0 -> 1, 0, _
+2, 1 -> 3, 1, >
+3, 0 -> HALT, 0, _
+3, 1 -> HALT, 1, _
+3, # -> HALT, #, _
+"""
+
+
+def load_example(name):
+    parser = TuringMachineParser()
+    with open(os.path.join(EXAMPLES_DIR, name)) as f:
+        parser.parse_string(f.read())
+    return parser.create()
+
+
+class NullObserver(BaseTuringMachineObserver):
+    def on_step_start(self, state, symbol):
+        pass
+
+    def on_step_end(self, state, symbol, movement):
+        pass
+
+    def on_tape_changed(self, head_pos):
+        pass
+
+    def on_head_moved(self, head_pos, old_head_pos):
+        pass
+
+
+class StepsObserver(BaseTuringMachineObserver):
+    EVENTS = frozenset((BaseTuringMachineObserver.STEPS,))
+    STEPS_BATCH_SIZE = 10
+
+    def __init__(self):
+        self.batches = []
+
+    def on_steps(self, batch):
+        self.batches.append(batch)
+
+
+class TraceObserver(BaseTuringMachineObserver):
+    EVENTS = frozenset(
+        (BaseTuringMachineObserver.STEP_START, BaseTuringMachineObserver.STEP_END)
+    )
+
+    def __init__(self):
+        self.steps = []
+
+    def on_step_start(self, state, symbol):
+        self.steps.append((state, symbol))
+
+    def on_step_end(self, state, symbol, movement):
+        self.steps[-1] += (symbol, movement)
+
+
+def run_machine(tm, tape, max_steps=None, observed=False):
+    if observed:
+        tm.attach_observer(NullObserver())
+    tm.set_tape(tape)
+    exit_code = tm.run(max_steps)
+    return (
+        exit_code,
+        tm.get_current_state(),
+        tm.get_head_position(),
+        tm.get_executed_steps_counter(),
+        "".join(tm.get_tape_iterator()),
+    )
+
+
+class TestTuringMachine(TestCase):
+    def test_compiled_run_matches_step_run(self):
+        for name, tape in (
+            ("tm_addition.txt", "#111#11"),
+            ("tm_multiplication.txt", "#1111#111"),
+        ):
+            fast = run_machine(load_example(name), tape)
+            slow = run_machine(load_example(name), tape, observed=True)
+            self.assertEqual(fast, slow)
+            self.assertEqual(fast[0], 0)
+
+    def test_compiled_run_max_steps(self):
+        tm = load_example("tm_addition.txt")
+        tm.set_tape("#111#11")
+        self.assertEqual(tm.run(5), 1)
+        self.assertEqual(tm.get_executed_steps_counter(), 5)
+        self.assertEqual(tm.run(), 0)
+        self.assertEqual("".join(tm.get_tape_iterator()), "#11111##")
+
+    def test_compiled_run_unknown_transition(self):
+        parser = TuringMachineParser()
+        parser.parse_string("HALT H\nBLANK #\nINITIAL a\na, 1 -> a, 1, <\n")
+        tm = parser.create()
+        tm.set_tape("111", head_pos=2)
+        self.assertEqual(tm.run(), 2)
+        self.assertEqual(tm.get_current_state(), "a")
+        self.assertEqual(tm.get_executed_steps_counter(), 3)
+        self.assertEqual(tm.get_head_position(), 0)
+        self.assertEqual(tm.get_internal_tape_size(), 4)
+
+    def test_left_growth(self):
+        parser = TuringMachineParser()
+        parser.parse_string("HALT H\nBLANK #\nINITIAL a\na, # -> a, 1, <\n")
+        for observed in (False, True):
+            tm = parser.create()
+            exit_code, _, head, steps, tape = run_machine(tm, "", 1000, observed)
+            self.assertEqual((exit_code, head, steps), (1, 0, 1000))
+            self.assertEqual(tape, "#" + "1" * 1000)
+            self.assertEqual(tm.get_internal_tape_size(), 1001)
+            self.assertEqual(tm.get_symbol_at(1000), "1")
+            self.assertEqual(tm.get_symbol_at(1001), "#")
+            self.assertEqual(tm.get_symbol_at(-1), "#")
+
+    def test_compact_tape(self):
+        tm = load_example("tm_multiplication.txt")
+        tm.set_tape("#1111#111", compact=True)
+        self.assertIsInstance(tm._tape.cells, bytearray)
+        self.assertEqual(tm.run(), 0)
+        self.assertEqual(
+            "".join(tm.get_tape_iterator()),
+            run_machine(load_example("tm_multiplication.txt"), "#1111#111")[4],
+        )
+
+        # Alphabets over 256 symbols use a wider array
+        symbols = [chr(0x4E00 + i) for i in range(300)]
+        src = ["HALT H", "BLANK #", "INITIAL a"]
+        src.extend("a, %s -> a, %s, >" % (s, s) for s in symbols)
+        src.append("a, # -> H, #, _")
+        parser = TuringMachineParser()
+        parser.parse_string("\n".join(src))
+        tm = parser.create()
+        tm.set_tape(symbols, compact=True)
+        self.assertEqual(tm._tape.cells.typecode, "H")
+        self.assertEqual(tm.run(), 0)
+        self.assertEqual(tm.get_executed_steps_counter(), 301)
+        self.assertEqual(list(tm.get_tape_iterator()), symbols + ["#"])
+
+    def test_accept_many(self):
+        parser = TuringMachineParser()
+        parser.parse_string(TEST_STR)
+        tm = parser.create()
+        words = ["0000", "1011", "0101", "", "1111"] * 20
+        expected = [tm.is_word_accepted(w) for w in words]
+
+        for workers in (1, 2):
+            results = list(tm.accept_many(words, workers=workers, chunksize=7))
+            self.assertEqual([r.word for r in results], words)
+            self.assertEqual([r.accepted for r in results], expected)
+
+        results = list(tm.accept_many(["0000", "0"], max_steps=2, workers=1))
+        self.assertEqual(results[0].exit_code, TuringMachine.EXIT_MAX_STEPS)
+        self.assertEqual(results[0].steps, 2)
+        self.assertEqual(results[1].exit_code, TuringMachine.EXIT_UNKNOWN_TRANSITION)
+        self.assertIsNone(results[0].error)
+
+        # Invalid words do not stop the batch
+        words = ["0000", "0x0", "1111"]
+        for workers in (1, 2):
+            results = list(tm.accept_many(words, workers=workers, chunksize=1))
+            self.assertEqual([r.word for r in results], words)
+            self.assertEqual(
+                [r.accepted for r in results], [expected[0], None, expected[4]]
+            )
+            self.assertIn("x", results[1].error)
+
+    def test_macro_steps(self):
+        tape = "#11111#111"
+        expected = run_machine(load_example("tm_multiplication.txt"), tape, None, True)
+        for block_size in (None, 2, 3, 8):
+            for compact in (False, True):
+                tm = load_example("tm_multiplication.txt")
+                tm.set_tape(tape, compact=compact)
+                for max_steps in (1, 17, 100):
+                    self.assertEqual(tm.run(max_steps, block_size), 1)
+                self.assertEqual(tm.get_executed_steps_counter(), 118)
+                self.assertEqual(tm.run(block_size=block_size), 0)
+                self.assertEqual(
+                    (
+                        tm.get_current_state(),
+                        tm.get_head_position(),
+                        tm.get_executed_steps_counter(),
+                        "".join(tm.get_tape_iterator()),
+                    ),
+                    expected[1:],
+                )
+
+    def test_scan_loop_sweep(self):
+        tm = load_example("tm_addition.txt")
+        tm.set_tape("#" + "1" * 5000 + "#" + "1" * 3000, compact=True)
+        self.assertEqual(tm.run(4000), 1)
+        self.assertEqual(tm.get_head_position(), 4000)
+        self.assertEqual(tm.run(), 0)
+        self.assertEqual(tm.get_executed_steps_counter(), 16005)
+        self.assertEqual("".join(tm.get_tape_iterator()), "#" + "1" * 8000 + "##")
+
+    def test_detect_loops(self):
+        parser = TuringMachineParser()
+        parser.parse_string(
+            "HALT H\nBLANK #\nINITIAL a\n"
+            "a, # -> b, 1, >\nb, # -> c, #, <\nc, 1 -> b, 1, >\nb, 1 -> H, 1, _\n"
+        )
+        tm = parser.create()
+        tm.set_tape("")
+        self.assertEqual(tm.run(detect_loops=True), TuringMachine.EXIT_LOOP)
+
+        # Endless sweep over blanks
+        parser = TuringMachineParser()
+        parser.parse_string(
+            "HALT H\nBLANK #\nINITIAL a\na, 1 -> a, 0, >\na, # -> a, #, >\n"
+        )
+        tm = parser.create()
+        tm.set_tape("111")
+        self.assertEqual(tm.run(detect_loops=True), TuringMachine.EXIT_LOOP)
+
+        # Binary counter, never halts but never repeats a configuration
+        source = (
+            "HALT H\nBLANK #\nINITIAL a\n"
+            "a, # -> b, 1, >\na, 0 -> b, 1, >\na, 1 -> a, 0, <\n"
+            "b, 0 -> b, 0, >\nb, 1 -> b, 1, >\nb, # -> a, #, <\n"
+        )
+        parser = TuringMachineParser()
+        parser.parse_string(source)
+        tm = parser.create()
+        tm.set_tape("", head_pos=0)
+        # Every state has a transition for every symbol and H is unreachable
+        self.assertEqual(tm.run(100000, detect_loops=True), TuringMachine.EXIT_LOOP)
+        self.assertEqual(tm.get_executed_steps_counter(), 0)
+
+        # The same counter with a transition to H that the tape never triggers
+        parser = TuringMachineParser()
+        parser.parse_string(source + "b, x -> H, x, _\n")
+        tm = parser.create()
+        tm.set_tape("", head_pos=0)
+        self.assertEqual(
+            tm.run(100000, detect_loops=True), TuringMachine.EXIT_MAX_STEPS
+        )
+        self.assertEqual(tm.get_executed_steps_counter(), 100000)
+
+        tape = "#11111#111"
+        expected = run_machine(load_example("tm_multiplication.txt"), tape)
+        tm = load_example("tm_multiplication.txt")
+        tm.set_tape(tape)
+        self.assertEqual(tm.run(detect_loops=True), TuringMachine.EXIT_HALT)
+        self.assertEqual(tm.get_executed_steps_counter(), expected[3])
+
+    def test_observer_events(self):
+        tape = "#111#11"
+        tm = load_example("tm_addition.txt")
+        trace = TraceObserver()
+        tm.attach_observer(trace)
+        tm.set_tape(tape)
+        tm.run()
+
+        tm = load_example("tm_addition.txt")
+        batched = StepsObserver()
+        tm.attach_observer(batched)
+        tm.set_tape(tape)
+        tm.run(3)
+        tm.run_step()
+        self.assertEqual(tm.run(), TuringMachine.EXIT_HALT)
+
+        self.assertTrue(all(len(b) <= 40 for b in batched.batches))
+        steps = [s for b in batched.batches for s in tm.decode_steps(b)]
+        self.assertEqual(steps, trace.steps)
+        self.assertEqual(len(steps), tm.get_executed_steps_counter())
+
+    def test_compiled_file(self):
+        tape = "#11111#111"
+        expected = run_machine(load_example("tm_multiplication.txt"), tape)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "tm.utmc")
+            load_example("tm_multiplication.txt").save_compiled(path)
+
+            tm = TuringMachine.load_compiled(path)
+            self.assertIsInstance(tm._table.loop_next, memoryview)
+            self.assertEqual(run_machine(tm, tape), expected)
+            tm = TuringMachine.load_compiled(path)
+            self.assertEqual(run_machine(tm, tape, observed=True), expected)
+            tm = TuringMachine.load_compiled(path)
+            tm.set_tape(tape, compact=True)
+            self.assertEqual(tm.run(block_size=4), TuringMachine.EXIT_HALT)
+            self.assertEqual(tm.get_executed_steps_counter(), expected[3])
+            results = list(tm.accept_many([tape, "#1#1"], workers=2, chunksize=1))
+            self.assertEqual(results[0].steps, expected[3])
+
+            with open(path, "r+b") as f:
+                f.truncate(100)
+            with self.assertRaises(CompiledFormatError):
+                TuringMachine.load_compiled(path)
+
+            # Cache keyed by the source hash
+            cache_dir = os.path.join(tmp_dir, "cache")
+            source = os.path.join(EXAMPLES_DIR, "tm_multiplication.txt")
+            tm = TuringMachine.load_source(source, cache_dir)
+            self.assertIsInstance(tm._table.loop_next, list)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            tm = TuringMachine.load_source(source, cache_dir)
+            self.assertIsInstance(tm._table.loop_next, memoryview)
+            self.assertEqual(run_machine(tm, tape), expected)
+
+    def test_corrupt_compiled_file(self):
+        source = os.path.join(EXAMPLES_DIR, "tm_addition.txt")
+        expected = run_machine(load_example("tm_addition.txt"), "#111#11")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            TuringMachine.load_source(source, cache_dir)
+            (name,) = os.listdir(cache_dir)
+            path = os.path.join(cache_dir, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            table_start = data.rindex(b"}") + 1
+
+            # Every byte of the header and the metadata
+            for i in range(table_start):
+                for value in (data[i] ^ 0x80, 0xFF):
+                    with open(path, "wb") as f:
+                        f.write(data[:i] + bytes([value]) + data[i + 1 :])
+                    try:
+                        TuringMachine.load_compiled(path)
+                    except CompiledFormatError:
+                        pass
+                    tm = TuringMachine.load_source(source, cache_dir)
+                    self.assertIsInstance(tm, TuringMachine)
+
+            # A table entry out of range, only found when the table is checked
+            for i in range(table_start + -table_start % 8, len(data), 4):
+                with open(path, "wb") as f:
+                    f.write(data[:i] + b"\xff\xff\xff\x7f" + data[i + 4 :])
+                with self.assertRaises(CompiledFormatError):
+                    TuringMachine.load_compiled(path, check_table=True)
+                TuringMachine.load_compiled(path)
+
+            with open(path, "wb") as f:
+                f.write(data)
+            tm = TuringMachine.load_compiled(path, check_table=True)
+            self.assertEqual(run_machine(tm, "#111#11"), expected)
+
+    def test_shared_definition(self):
+        definition = load_example("tm_addition.txt").get_definition()
+        self.assertIsInstance(definition, MachineDefinition)
+        with self.assertRaises(AttributeError):
+            definition.init_state = "1"
+        with self.assertRaises(TypeError):
+            definition.trans_function[("0", "#")] = ("0", "#", TuringMachine.MOVE_LEFT)
+
+        tm1 = TuringMachine.from_definition(definition)
+        tm2 = TuringMachine.from_definition(definition)
+        self.assertIs(tm1.get_definition(), tm2.get_definition())
+        with self.assertRaises(AttributeError):
+            tm1.extra = None
+        tm1.set_tape("#111#11")
+        tm2.set_tape("#1#1")
+        self.assertEqual(tm1.run(), tm2.run())
+        self.assertEqual("".join(tm1.get_tape_iterator()), "#11111##")
+        self.assertEqual("".join(tm2.get_tape_iterator()), "#11##")
+
+        copy = pickle.loads(pickle.dumps(definition))
+        self.assertEqual(dict(copy.trans_function), dict(definition.trans_function))
+        for name in ("states", "tape_alphabet", "final_states", "halt_state"):
+            self.assertEqual(getattr(copy, name), getattr(definition, name))
+
+    def test_snapshot(self):
+        tape = "#11111#111"
+        expected = run_machine(load_example("tm_multiplication.txt"), tape)
+        for compact in (False, True):
+            tm = load_example("tm_multiplication.txt")
+            tm.set_tape(tape, compact=compact)
+            tm.run(50)
+            first = tm.snapshot()
+            tm.run(50)
+            fork = tm.fork()
+            second = pickle.loads(pickle.dumps(tm.snapshot()))
+            self.assertEqual(tm.run(), TuringMachine.EXIT_HALT)
+
+            for snapshot in (first, second, first):
+                tm.restore(snapshot)
+                self.assertEqual(tm.get_executed_steps_counter(), snapshot.steps)
+                self.assertEqual(tm.run(), TuringMachine.EXIT_HALT)
+                self.assertEqual(
+                    (
+                        tm.get_current_state(),
+                        tm.get_head_position(),
+                        tm.get_executed_steps_counter(),
+                        "".join(tm.get_tape_iterator()),
+                    ),
+                    expected[1:],
+                )
+
+            self.assertEqual(fork.get_executed_steps_counter(), 100)
+            self.assertEqual(run_machine(fork, tape)[0], TuringMachine.EXIT_HALT)
+
+    def test_snapshot_shares_pages(self):
+        page_size = 4096
+        tm = load_example("tm_addition.txt")
+        tm.set_tape("#" + "1" * (10 * page_size) + "#11", compact=True)
+        first = tm.snapshot()
+        tm.run(2 * page_size)
+        second = tm.snapshot()
+        shared = [
+            p for p in first.tape.pages if first.tape.pages[p] is second.tape.pages[p]
+        ]
+        self.assertEqual(len(shared), len(first.tape.pages) - 3)
+
+        tm.run()
+        result = "".join(tm.get_tape_iterator())
+        tm.restore(second)
+        tm.run()
+        self.assertEqual("".join(tm.get_tape_iterator()), result)
+
+    def test_step_back(self):
+        def configuration(tm):
+            tape = "".join(tm.get_tape_iterator())
+            head = tm.get_head_position() - (len(tape) - len(tape.lstrip("#")))
+            return tm.get_current_state(), tape.strip("#"), head
+
+        tape = "#1111#111"
+        ref = load_example("tm_multiplication.txt")
+        ref.set_tape(tape)
+        expected = [configuration(ref)]
+        while ref.run(1) == TuringMachine.EXIT_MAX_STEPS:
+            expected.append(configuration(ref))
+        expected.append(configuration(ref))
+
+        # Steps of run_step(), the compiled engine and batch observers
+        for observer in (None, NullObserver(), StepsObserver()):
+            tm = load_example("tm_multiplication.txt")
+            if observer is not None:
+                tm.attach_observer(observer)
+            tm.set_undo_limit(100)
+            tm.set_tape(tape)
+            self.assertEqual(tm.run(), TuringMachine.EXIT_HALT)
+            self.assertEqual(tm.get_undo_steps(), 100)
+            for _ in range(60):
+                tm.step_back()
+            steps = tm.get_executed_steps_counter()
+            self.assertEqual(steps, len(expected) - 61)
+            self.assertEqual(configuration(tm), expected[steps])
+            tm.run(30)
+            for _ in range(70):
+                tm.step_back()
+            self.assertEqual(configuration(tm), expected[steps - 40])
+            with self.assertRaises(UndoJournalEmptyException):
+                tm.step_back()
+
+        tm.set_tape(tape)
+        self.assertEqual(tm.get_undo_steps(), 0)
+
+    def test_step_back_after_is_word_accepted(self):
+        tm = load_example("tm_addition.txt")
+        tm.set_undo_limit(1000)
+        tm.set_tape("#111#11")
+        tm.run(3)
+        expected = (
+            tm.get_current_state(),
+            tm.get_head_position(),
+            "".join(tm.get_tape_iterator()),
+        )
+        tm.is_word_accepted("#1#1")
+        self.assertEqual(tm.get_executed_steps_counter(), 3)
+        self.assertEqual(tm.get_undo_steps(), 3)
+        self.assertEqual(
+            (
+                tm.get_current_state(),
+                tm.get_head_position(),
+                "".join(tm.get_tape_iterator()),
+            ),
+            expected,
+        )
+
+        tm.step_back()
+        tm.run(1)
+        self.assertEqual(tm.get_executed_steps_counter(), 3)
+        self.assertEqual(
+            (
+                tm.get_current_state(),
+                tm.get_head_position(),
+                "".join(tm.get_tape_iterator()),
+            ),
+            expected,
+        )
+
+    def test_breakpoints(self):
+        def stops(tm, tape, max_steps=None):
+            tm.set_at_initial_state()
+            tm.reset_executed_steps_counter()
+            tm.set_tape(tape)
+            result = []
+            exit_code = TuringMachine.EXIT_BREAKPOINT
+            while exit_code in (tm.EXIT_BREAKPOINT, tm.EXIT_MAX_STEPS):
+                exit_code = tm.run(max_steps)
+                symbol = tm.get_symbol_at(tm.get_head_position())
+                result.append(
+                    (
+                        exit_code,
+                        tm.get_executed_steps_counter(),
+                        tm.get_current_state(),
+                        symbol,
+                        tm.get_head_position(),
+                    )
+                )
+            return result
+
+        tm = load_example("tm_multiplication.txt")
+        tm.set_breakpoints(
+            states=["5"], transitions=[("2", "1")], head_positions=[9], steps=[40]
+        )
+        expected = stops(tm, "#111#11")
+        self.assertEqual(expected[-1][0], TuringMachine.EXIT_HALT)
+        for exit_code, steps, state, symbol, head in expected[:-1]:
+            self.assertEqual(exit_code, TuringMachine.EXIT_BREAKPOINT)
+            self.assertTrue(
+                state == "5"
+                or (state, symbol) == ("2", "1")
+                or head == 9
+                or steps == 40
+            )
+        self.assertIn(40, [stop[1] for stop in expected])
+        self.assertIn(9, [stop[4] for stop in expected])
+
+        # Observed runs and runs split by max_steps stop at the same places
+        breakpoints = tm.get_breakpoints()
+        tm = load_example("tm_multiplication.txt")
+        tm.set_breakpoints(*breakpoints)
+        tm.attach_observer(NullObserver())
+        self.assertEqual(stops(tm, "#111#11"), expected)
+        tm = load_example("tm_multiplication.txt")
+        tm.set_breakpoints(*breakpoints)
+        self.assertEqual(
+            [s for s in stops(tm, "#111#11", 3) if s[0] != tm.EXIT_MAX_STEPS],
+            expected,
+        )
+
+        tm.clear_breakpoints()
+        self.assertEqual(stops(tm, "#111#11"), expected[-1:])
+        with self.assertRaises(ValueError):
+            tm.set_breakpoints(states=["unknown"])
+
+        # is_word_accepted() ignores them
+        parser = TuringMachineParser()
+        parser.parse_string(TEST_STR)
+        tm = parser.create()
+        tm.set_breakpoints(states=["1"])
+        self.assertTrue(tm.is_word_accepted("00"))
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import os
 from unittest import TestCase
 
 from utm.tm import TuringMachineParser, TuringMachine
 
 
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
 TEST_STR = """
 % Start with a comment line
   % Another comment line
@@ -59,3 +62,76 @@ class TestTuringMachineParser(TestCase):
         parser = TuringMachineParser()
         parser.parse_string(TEST_STR)
         self.assertIsInstance(parser.create(), TuringMachine)
+
+    def test_parse_file(self):
+        path = os.path.join(EXAMPLES_DIR, "tm_addition.txt")
+        parser = TuringMachineParser()
+        parser.parse_file(path)
+        tm = parser.create()
+
+        parser = TuringMachineParser()
+        with open(path) as f:
+            parser.parse_string(f.read())
+        self.assertEqual(str(tm), str(parser.create()))
+
+    def test_parse_errors(self):
+        parser = TuringMachineParser()
+        with self.assertRaisesRegex(Exception, "Line 3, Unrecognized pattern"):
+            parser.parse_string("HALT HALT\n\n1, 0 -> 2, 1, ^\n")
+
+        parser = TuringMachineParser()
+        with self.assertRaisesRegex(Exception, "Line 2, Halt state can only"):
+            parser.parse_string("HALT HALT\nHALT H2\n")
+
+    def test_update_lines(self):
+        lines = TEST_STR.splitlines()
+        parser = TuringMachineParser()
+        parser.update_lines(0, 0, lines)
+        self.assertEqual(parser.get_line_count(), len(lines))
+        self.assertTrue(parser.create().is_word_accepted("0000"))
+
+        # Replace '1, 0 -> 2, 1, >' so that 0000 is not accepted anymore
+        i = lines.index("1, 0 -> 2, 1, >")
+        parser.update_lines(i, 1, ["1, 0 -> 3, 1, >", "% new line"])
+        self.assertFalse(parser.create().is_word_accepted("0000"))
+        parser.update_lines(i, 2, ["1, 0 -> 2, 1, >"])
+        self.assertTrue(parser.create().is_word_accepted("0000"))
+
+        # The last transition of a pair wins
+        parser.update_lines(i + 1, 0, ["1, 0 -> 3, 1, >"])
+        self.assertFalse(parser.create().is_word_accepted("0000"))
+        parser.update_lines(i + 1, 1, [])
+
+        # Errors are reported until the lines are fixed
+        parser.update_lines(1, 0, ["BLANK 0", "1, 0 -> 2, 1, ^"])
+        self.assertEqual([n for n, _ in parser.get_errors()], [3, 7])
+        with self.assertRaisesRegex(Exception, "Line 3, Unrecognized pattern"):
+            parser.create()
+        parser.update_lines(1, 2, [])
+        self.assertEqual(parser.get_errors(), [])
+
+        tm = parser.create()
+        self.assertTrue(tm.is_word_accepted("0000"))
+        self.assertFalse(tm.is_word_accepted("1011"))
+
+    def test_replaced_transition_symbols(self):
+        # The symbols of a replaced transition remain in the alphabet
+        text = "HALT H\nBLANK #\nINITIAL 1\n1, a -> 2, b, >\n1, a -> H, #, _\n"
+        parser = TuringMachineParser()
+        parser.parse_string(text)
+        tm = parser.create()
+        tm.set_tape("ab")
+        self.assertEqual(tm.get_definition().tape_alphabet, {"a", "b", "#"})
+
+        lines = text.splitlines()
+        parser = TuringMachineParser()
+        parser.update_lines(0, 0, lines)
+        self.assertEqual(str(parser.create()), str(tm))
+
+        # Until the lines of the pair are edited
+        parser.update_lines(3, 1, ["1, a -> 2, c, >"])
+        self.assertEqual(
+            parser.create().get_definition().tape_alphabet, {"a", "c", "#"}
+        )
+        parser.update_lines(3, 2, ["1, a -> H, #, _"])
+        self.assertEqual(parser.create().get_definition().tape_alphabet, {"a", "#"})
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from benchmarks import suite
+
+
+class TestBenchmarks(TestCase):
+    def test_generated_source(self):
+        parser = suite.TuringMachineParser()
+        parser.parse_string(suite.generated_source(101))
+        tm = parser.create()
+        tm.set_tape("0" * 60)
+        tm.run()
+        self.assertEqual(tm.get_executed_steps_counter(), 51)
+
+    def test_run_and_compare(self):
+        self.assertEqual(
+            suite.select(["growth_left"]),
+            ["tape_growth_left_100000", "tape_growth_left_1000000"],
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            argv = ["-k", "parse_1000", "--quick", "--repeat", "1", "-o", path]
+            self.assertEqual(suite.main(argv), 0)
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+        self.assertEqual(sorted(baseline["results"]), ["parse_1000", "parse_10000"])
+        self.assertEqual(baseline["results"]["parse_1000"]["repeat"], 1)
+
+        results = {"parse_1000": {"best": 2.0}, "other": {"best": 1.0}}
+        rows = suite.compare({"parse_1000": {"best": 1.0}}, results, 0.5)
+        self.assertEqual(rows, [("parse_1000", 1.0, 2.0, 2.0, True)])
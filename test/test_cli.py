@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from utm import cli
+
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tm_examples")
+
+
+class TestCli(TestCase):
+    def test_run(self):
+        machine = os.path.join(EXAMPLES_DIR, "tm_addition.txt")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_path = os.path.join(tmp_dir, "in.txt")
+            out_path = os.path.join(tmp_dir, "out.jsonl")
+            with open(in_path, "w") as f:
+                f.write("#111#11\n#1#1\n#\n#1x1\n#1\n")
+
+            for jobs in ("1", "2"):
+                argv = ["run", machine, "-i", in_path, "-o", out_path]
+                argv += ["--max-steps", "100", "--jobs", jobs]
+                self.assertEqual(cli.main(argv), 0)
+
+                with open(out_path) as f:
+                    results = [json.loads(line) for line in f]
+                self.assertEqual(len(results), 5)
+                self.assertEqual(results[0]["tape"], "#11111##")
+                self.assertEqual(results[0]["exit"], "halt")
+                self.assertEqual(results[0]["steps"], 15)
+                self.assertEqual(results[2]["exit"], "max-steps")
+                self.assertEqual(results[2]["state"], "0")
+                self.assertEqual(results[3]["input"], "#1x1")
+                self.assertIn("x", results[3]["error"])
+                self.assertEqual(results[4]["exit"], "halt")
+
+    def test_profile(self):
+        machine = os.path.join(EXAMPLES_DIR, "tm_addition.txt")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_path = os.path.join(tmp_dir, "in.txt")
+            out_path = os.path.join(tmp_dir, "profile.json")
+            with open(in_path, "w") as f:
+                f.write("#111#11\nx\n#1#1\n")
+
+            argv = ["profile", machine, "-i", in_path, "-o", out_path, "--json"]
+            self.assertEqual(cli.main(argv + ["--top", "3"]), 0)
+            with open(out_path) as f:
+                report = json.load(f)
+            self.assertEqual(report["steps"], 24)
+            self.assertEqual(len(report["transitions"]), 3)
+            self.assertEqual(report["transitions"][0]["state"], "4")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def import_times(module):
+    """Imports module in a new interpreter with -X importtime.
+
+    :return: Dictionary with the cumulative import time, in microseconds, of
+        each imported module.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        env=env,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(TestCase):
+    # Budget of the cumulative import time of the headless modules
+    BUDGET_US = 100000
+
+    def check_module(self, module):
+        # Best of a few runs to leave out the noise of the machine
+        best = None
+        for _ in range(3):
+            times = import_times(module)
+            qt_modules = [m for m in times if m.split(".")[0] == "PySide2"]
+            self.assertEqual(qt_modules, [], "%s imports Qt" % module)
+            best = times[module] if best is None else min(best, times[module])
+
+        self.assertLess(
+            best,
+            TestImportTime.BUDGET_US,
+            "import %s takes %d us, the budget is %d us"
+            % (module, best, TestImportTime.BUDGET_US),
+        )
+
+    def test_import_tm(self):
+        self.check_module("utm.tm")
+
+    def test_import_cli(self):
+        self.check_module("utm.cli")
@@ -1,5 +1,13 @@
-
-from utm.utm import main
+import sys
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Any argument selects the headless command line interface, which must
+    # not import the GUI
+    if len(sys.argv) > 1:
+        from utm.cli import main
+
+        sys.exit(main())
+    else:
+        from utm.utm import main
+
+        main()
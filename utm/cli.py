@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import sys
+
+import utm
+from utm.tm import Profiler, TuringMachine
+from utm.tm.exceptions import InvalidSymbolException
+
+
+# Command line interface
+##############################################################################
+
+_EXIT_NAMES = {
+    TuringMachine.EXIT_HALT: "halt",
+    TuringMachine.EXIT_MAX_STEPS: "max-steps",
+    TuringMachine.EXIT_UNKNOWN_TRANSITION: "unknown-transition",
+    TuringMachine.EXIT_LOOP: "loop",
+}
+
+
+def main(argv=None):
+    """Headless entry point, it never imports the GUI (nor PySide2)."""
+    args = _build_arg_parser().parse_args(argv)
+    try:
+        return args.command(args)
+    except (OSError, InvalidSymbolException) as e:
+        print("Error: %s" % str(e), file=sys.stderr)
+        return 1
+
+
+def run_command(args):
+    """Runs every input tape through the machine, writing JSON lines."""
+    try:
+        tm = TuringMachine.load_source(args.machine, args.cache_dir)
+    except OSError:
+        raise
+    except Exception as e:
+        print("Error: %s: %s" % (args.machine, str(e)), file=sys.stderr)
+        return 1
+
+    in_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out_file = (
+        sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    )
+    try:
+        tapes = (line.rstrip("\r\n") for line in in_file)
+        results = tm.accept_many(
+            tapes,
+            max_steps=args.max_steps,
+            workers=args.jobs or None,
+            chunksize=args.chunk_size,
+            with_tape=True,
+        )
+        for result in results:
+            if result.error is not None:
+                record = {"input": result.word, "error": result.error}
+            else:
+                record = {
+                    "input": result.word,
+                    "state": str(result.state),
+                    "accepted": result.accepted,
+                    "exit": _EXIT_NAMES[result.exit_code],
+                    "steps": result.steps,
+                    "tape": "".join(map(str, result.tape)),
+                }
+            json.dump(record, out_file, ensure_ascii=False)
+            out_file.write("\n")
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+
+    return 0
+
+
+def profile_command(args):
+    """Runs every input tape through a profiled machine and writes the
+    accumulated profile report.
+    """
+    try:
+        tm = TuringMachine.load_source(args.machine, args.cache_dir)
+    except OSError:
+        raise
+    except Exception as e:
+        print("Error: %s: %s" % (args.machine, str(e)), file=sys.stderr)
+        return 1
+
+    profiler = Profiler(args.sample_every)
+    in_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(in_file, 1):
+            machine = tm.clone()
+            machine.set_profiler(profiler)
+            try:
+                machine.set_tape(line.rstrip("\r\n"))
+            except InvalidSymbolException as e:
+                print("Warning: line %d: %s" % (line_number, e), file=sys.stderr)
+                continue
+            machine.run(args.max_steps)
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+
+    out_file = (
+        sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    )
+    try:
+        if args.json:
+            out_file.write(profiler.to_json(args.top, indent=2))
+        else:
+            out_file.write(profiler.format_report(args.top))
+        out_file.write("\n")
+    finally:
+        if out_file is not sys.stdout:
+            out_file.close()
+
+    return 0
+
+
+def _build_arg_parser():
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m utm",
+        description="Universal Turing Machine Simulator. Without a command the "
+        "graphical interface is started.",
+    )
+    arg_parser.add_argument(
+        "--version", action="version", version="%(prog)s " + utm.__version__
+    )
+    commands = arg_parser.add_subparsers(title="commands", dest="command_name")
+    commands.required = True
+
+    run_parser = commands.add_parser(
+        "run",
+        help="run input tapes through a machine",
+        description="Runs each line of the input as a tape through the "
+        "machine and writes the results as JSON lines with the keys: input, "
+        "state, accepted, exit, steps and tape. Tapes that can not be run, "
+        "e.g. with a symbol out of the alphabet, get a line with the keys "
+        "input and error.",
+    )
+    run_parser.set_defaults(command=run_command)
+    run_parser.add_argument("machine", help="turing machine source file")
+    run_parser.add_argument(
+        "-i",
+        "--input",
+        default="-",
+        help="file with one input tape per line (default: stdin)",
+    )
+    run_parser.add_argument(
+        "-o", "--output", default="-", help="results file (default: stdout)"
+    )
+    run_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="directory where the compiled machine is cached, so later runs "
+        "of the same machine skip parsing it",
+    )
+    run_parser.add_argument(
+        "--max-steps",
+        type=int,
+        default=None,
+        help="limit of steps for each tape (default: no limit)",
+    )
+    run_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes, 0 to use all CPUs (default: 1)",
+    )
+    run_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=256,
+        help="tapes sent to a worker process at once (default: 256)",
+    )
+
+    profile_parser = commands.add_parser(
+        "profile",
+        help="report where a machine spends its steps",
+        description="Runs each line of the input as a tape through the "
+        "machine and reports the most executed transitions and states, the "
+        "head range, the tape growths and the steps per second of all the "
+        "runs together.",
+    )
+    profile_parser.set_defaults(command=profile_command)
+    profile_parser.add_argument("machine", help="turing machine source file")
+    profile_parser.add_argument(
+        "-i",
+        "--input",
+        default="-",
+        help="file with one input tape per line (default: stdin)",
+    )
+    profile_parser.add_argument(
+        "-o", "--output", default="-", help="report file (default: stdout)"
+    )
+    profile_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="directory where the compiled machine is cached",
+    )
+    profile_parser.add_argument(
+        "--max-steps",
+        type=int,
+        default=None,
+        help="limit of steps for each tape (default: no limit)",
+    )
+    profile_parser.add_argument(
+        "--sample-every",
+        type=int,
+        default=1,
+        help="profile one of every N chunks of steps (default: 1, all)",
+    )
+    profile_parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="number of transitions and states in the report (default: 20)",
+    )
+    profile_parser.add_argument(
+        "--json", action="store_true", help="write the report as JSON"
+    )
+
+    return arg_parser
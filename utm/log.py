@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+
+class ActivityLog:
+    """
+    Streams the messages of the activity log to a file.
+
+    The log area of the GUI only keeps its last lines, the complete history
+    can be written to a file with start_export(), the exported lines are not
+    kept in memory.
+    """
+
+    INFO = 0
+    STRIKING_INFO = 1
+    ERROR = 2
+
+    _LEVEL_PREFIXES = {INFO: "", STRIKING_INFO: "", ERROR: "ERROR: "}
+
+    def __init__(self):
+        self._export_file = None
+
+    def append(self, level, msg):
+        """Adds a message with the given level (INFO, STRIKING_INFO, ERROR)"""
+        if self._export_file is not None:
+            self._export(level, msg)
+
+    def append_many(self, level, msgs):
+        """Adds several messages with the same level"""
+        if self._export_file is not None:
+            prefix = ActivityLog._LEVEL_PREFIXES[level]
+            self._export_file.writelines("%s%s\n" % (prefix, msg) for msg in msgs)
+
+    def is_exporting(self):
+        """Returns true only if the messages are being exported to a file"""
+        return self._export_file is not None
+
+    def start_export(self, path, lines=()):
+        """Writes lines, an iterable of (level, message) tuples such as the
+        messages already shown, to the given file and then every new message
+        as it is added, until stop_export() is called.
+        """
+        self.stop_export()
+        self._export_file = open(path, "w", encoding="utf-8")
+        for level, msg in lines:
+            self._export(level, msg)
+
+    def stop_export(self):
+        """Stops exporting the messages and closes the file"""
+        if self._export_file is not None:
+            self._export_file.close()
+            self._export_file = None
+
+    def _export(self, level, msg):
+        self._export_file.write(ActivityLog._LEVEL_PREFIXES[level])
+        self._export_file.write(msg)
+        self._export_file.write("\n")
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from .tm import BaseTuringMachineObserver, TuringMachine
+from .tm import BaseTuringMachineObserver, MachineDefinition, TuringMachine
+from .ntm import NondeterministicTuringMachine
+from .multitape import MultiTapeDefinition, MultiTapeTuringMachine
+from .profiler import Profiler
+from .trace import TraceRecorder, TraceReplayer
 
 from .parser import TuringMachineParser
+from .cache import MachineCache
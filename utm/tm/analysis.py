@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+from utm.tm import engine
+
+
+Analysis = namedtuple(
+    "Analysis",
+    (
+        "unreachable_states",
+        "missing_transitions",
+        "non_halting_states",
+        "endless_states",
+        "dead_end_states",
+        "scan_loop_states",
+        "unread_symbols",
+    ),
+)
+Analysis.__doc__ = """Static analysis of a transition function, see analyze().
+
+    - unreachable_states: States that no run from the initial state enters
+    - missing_transitions: (state, symbol) pairs of the reachable states,
+      but the halt and final states, without a transition, reading that
+      symbol there stops the run with an unknown transition
+    - non_halting_states: States from which the halt state can not be
+      reached
+    - endless_states: States from which the machine never stops, they can
+      not reach the halt state nor a missing transition
+    - dead_end_states: States without transitions, but the halt state, the
+      run stops as soon as it enters them
+    - scan_loop_states: States whose transitions are all scan loops, they
+      keep the state, rewrite the read symbol and move the head
+    - unread_symbols: Tape symbols that no reachable state reads
+
+All the fields are frozensets.
+"""
+
+
+def analyze(table, init_state, final_states=()):
+    """Analyzes the state graph of a compiled transition table.
+
+    The graph has an edge from each state to the next state of each of its
+    transitions, so the results hold for any tape: a state that can not
+    reach the halt state in the graph never halts, whatever the symbols it
+    reads.
+
+    :param table: utm.tm.engine.TransitionTable of the machine.
+    :param init_state: Initial state.
+    :param final_states: Final states, their missing transitions are not
+        reported since stopping there accepts the input.
+
+    :return: Analysis of the table.
+    """
+    n = table.num_symbols
+    next_state = table.next_state
+    num_states = len(table.states)
+    halt = table.halt_base // n
+
+    # Successors and predecessors of each state id
+    successors = [set() for _ in range(num_states)]
+    predecessors = [set() for _ in range(num_states)]
+    undefined = [[] for _ in range(num_states)]
+    for i, nxt in enumerate(next_state):
+        state = i // n
+        if nxt >= 0:
+            successors[state].add(nxt // n)
+            predecessors[nxt // n].add(state)
+        elif state != halt:
+            undefined[state].append(i % n)
+
+    reachable = _closure(successors, [table.state_ids[init_state]])
+    halting = _closure(predecessors, [halt])
+    stopping = _closure(
+        predecessors, [halt] + [s for s in range(num_states) if undefined[s]]
+    )
+
+    states = table.states
+    symbols = table.symbols
+    finals = frozenset(table.state_ids[s] for s in final_states)
+    read = set()
+    for state in reachable:
+        if state != halt:
+            base = state * n
+            read.update(a for a in range(n) if next_state[base + a] >= 0)
+
+    def pure_scan_loop(state):
+        base = state * n
+        loops = [
+            table.loop_next[base + a] for a in range(n) if next_state[base + a] >= 0
+        ]
+        return bool(loops) and all(nxt == engine.SCAN_LOOP for nxt in loops)
+
+    return Analysis(
+        unreachable_states=frozenset(
+            states[s] for s in range(num_states) if s not in reachable
+        ),
+        missing_transitions=frozenset(
+            (states[s], symbols[a])
+            for s in reachable
+            if s not in finals
+            for a in undefined[s]
+        ),
+        non_halting_states=frozenset(
+            states[s] for s in range(num_states) if s not in halting
+        ),
+        endless_states=frozenset(
+            states[s] for s in range(num_states) if s not in stopping
+        ),
+        dead_end_states=frozenset(
+            states[s] for s in range(num_states) if len(undefined[s]) == n
+        ),
+        scan_loop_states=frozenset(
+            states[s] for s in range(num_states) if pure_scan_loop(s)
+        ),
+        unread_symbols=frozenset(symbols[a] for a in range(n) if a not in read),
+    )
+
+
+def warnings(analysis, limit=10):
+    """Returns a list with a message for each kind of issue of an Analysis.
+
+    :param limit: Maximum number of states, transitions or symbols listed
+        in each message.
+    """
+    messages = []
+    for items, text in (
+        (analysis.unreachable_states, "Unreachable states"),
+        (analysis.missing_transitions, "Missing transitions"),
+        (analysis.non_halting_states, "States that can not reach the halt state"),
+        (analysis.endless_states, "States from which the machine never stops"),
+        (analysis.dead_end_states, "States without transitions"),
+        (analysis.unread_symbols, "Symbols never read"),
+    ):
+        if items:
+            names = sorted(map(_format_item, items))
+            more = len(names) - limit
+            messages.append(
+                "%s: %s%s"
+                % (
+                    text,
+                    ", ".join(names[:limit]),
+                    " and %d more" % more if more > 0 else "",
+                )
+            )
+    return messages
+
+
+def _format_item(item):
+    if isinstance(item, tuple):
+        return "(%s)" % ", ".join(map(str, item))
+    return str(item)
+
+
+def _closure(edges, start):
+    """Returns the set of nodes reachable from start following edges"""
+    seen = set(start)
+    pending = list(start)
+    while pending:
+        for nxt in edges[pending.pop()]:
+            if nxt not in seen:
+                seen.add(nxt)
+                pending.append(nxt)
+    return seen
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import os
+from collections import namedtuple
+
+from utm.tm.exceptions import InvalidSymbolException
+
+
+WordResult = namedtuple(
+    "WordResult",
+    ("word", "accepted", "exit_code", "steps", "state", "tape", "error"),
+    defaults=(None,),
+)
+WordResult.__doc__ = """Result of running a turing machine on a single word.
+
+    - word: The input word
+    - accepted: True if the machine ended at a final state
+    - exit_code: TuringMachine.run() return value (halt, max steps or
+      unknown transition)
+    - steps: Number of executed steps
+    - state: State at the end of the run
+    - tape: List with the final tape symbols if requested, None otherwise
+    - error: Message of the error that prevented running the word (e.g. it
+      has a symbol that is not in the tape alphabet), None otherwise. The
+      rest of the fields but word are None then.
+"""
+
+# Chunks per worker process fed to the pool at once, see accept_many()
+_WINDOW_CHUNKS = 4
+
+
+def accept_many(
+    machine_type, definition, words, max_steps, workers, chunksize, with_tape=False
+):
+    """Runs every word on a fresh machine and yields a WordResult for each.
+
+    :param machine_type: Class used to build the machines from definition.
+    :param definition: MachineDefinition of the machines, it is sent once to
+        each worker process.
+    :param words: Iterable of words, it is consumed lazily so it can be a
+        stream of any length.
+    :param max_steps: Limit of steps for each word.
+    :param workers: Number of worker processes, os.cpu_count() if None.
+        When it is 1 the words are run on the calling process.
+    :param chunksize: Number of words sent to a worker at once.
+    :param with_tape: If True the results include the final tape.
+
+    :return: Iterator of WordResult in the same order as words.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        tm = machine_type.from_definition(definition)
+        for word in words:
+            yield _run(tm, word, max_steps, with_tape)
+        return
+
+    import multiprocessing
+
+    # Pool.imap reads its whole input at once, feed it in bounded windows
+    words = iter(words)
+    window_size = workers * chunksize * _WINDOW_CHUNKS
+    with multiprocessing.Pool(
+        workers, _init_worker, (machine_type, definition, max_steps, with_tape)
+    ) as pool:
+        while True:
+            window = list(itertools.islice(words, window_size))
+            if not window:
+                break
+            yield from pool.imap(_run_word, window, chunksize)
+
+
+# Worker process state
+##############################################################################
+
+_worker_tm = None
+_worker_max_steps = None
+_worker_with_tape = False
+
+
+def _init_worker(machine_type, definition, max_steps, with_tape):
+    global _worker_tm, _worker_max_steps, _worker_with_tape
+    _worker_tm = machine_type.from_definition(definition)
+    _worker_max_steps = max_steps
+    _worker_with_tape = with_tape
+
+
+def _run_word(word):
+    return _run(_worker_tm, word, _worker_max_steps, _worker_with_tape)
+
+
+def _run(tm, word, max_steps, with_tape):
+    tm.set_at_initial_state()
+    tm.reset_executed_steps_counter()
+    try:
+        tm.set_tape(word)
+    except InvalidSymbolException as e:
+        return WordResult(word, None, None, None, None, None, str(e))
+    exit_code = tm.run(max_steps)
+    return WordResult(
+        word,
+        tm.is_at_final_state(),
+        exit_code,
+        tm.get_executed_steps_counter(),
+        tm.get_current_state(),
+        list(tm.get_tape_iterator()) if with_tape else None,
+    )
@@ -1,35 +1,56 @@
 # -*- coding: utf-8 -*-
 
 from utm.tm import TuringMachine
+from utm.tm.multitape import MultiTapeTuringMachine
+from utm.tm.ntm import NondeterministicTuringMachine
 
 
 class TuringMachineBuilder:
-    """Incremental creation of a turing machine."""
+    """Incremental creation of a turing machine.
 
-    def __init__(self):
-        """Initialize a new TuringMachineBuilder."""
-        self._states = set()
-        self._in_alphabet = set()
-        self._trans_function = {}
-        self._init_state = None
-        self._final_states = set()
+    The builder keeps how many transitions and directives reference each
+    state and symbol, so everything added can also be removed: a state or
+    symbol is part of the machine while something references it.
 
-        self._blank = None
-        self._halt_state = None
+    In nondeterministic mode each (state, symbol) can have any number of
+    transitions and create() returns a NondeterministicTuringMachine.
+
+    The transitions of a multi-tape machine have tuples with a symbol or
+    movement for each tape, create() returns a MultiTapeTuringMachine if
+    they have more than one.
+    """
+
+    def __init__(self, nondeterministic=False):
+        """Initialize a new TuringMachineBuilder.
+
+        :param nondeterministic: If True add_transition() adds the transition
+            to the ones of (state, symbol) instead of replacing them.
+        """
+        self._nondeterministic = nondeterministic
+        self.clean()
 
     def clean(self):
         """Clear all the previous stored data."""
-        self._states = set()
-        self._in_alphabet = set()
+        self._state_refs = {}
+        self._symbol_refs = {}
         self._trans_function = {}
+        # Transitions replaced by the current one of each (state, symbol)
+        self._replaced = {}
         self._init_state = None
-        self._final_states = set()
+        self._final_states = {}
+        # Number of transitions with each number of tapes
+        self._tape_refs = {}
 
         self._blank = None
         self._halt_state = None
 
     def add_transition(self, state, symbol, new_state, new_symbol, movement):
-        """Adds the transition.
+        """Adds the transition, replacing the previous one of (state, symbol)
+        unless the builder is nondeterministic.
+
+        The states and symbols of a replaced transition remain part of the
+        machine, as if it was still there, until remove_transition() removes
+        (state, symbol).
 
         :param state: State from which the transition starts.
         :param symbol: Symbol that triggers the transition.
@@ -37,43 +58,148 @@ class TuringMachineBuilder:
         :param new_symbol: Symbol to write on the tape.
         :param movement: Direction in which the tape has to be moved.
 
-        :raise Exception: if symbols are longer than one character.
-        """
-        if movement not in TuringMachine.HEAD_MOVEMENTS:
-            raise Exception("Invalid movement")
+        For multi-tape machines symbol, new_symbol and movement are tuples
+        with an item for each tape.
 
-        if (hasattr(symbol, "len") and len(symbol) > 1) or (
-            hasattr(new_symbol, "len") and len(new_symbol) > 1
+        :raise Exception: if symbols are longer than one character or the
+            tuples have different lengths.
+        """
+        if (
+            type(symbol) is not tuple
+            and type(new_symbol) is not tuple
+            and type(movement) is not tuple
         ):
-            raise Exception("Symbol length > 1")
-
-        if state not in self._states:
-            self._states.add(state)
-
-        if symbol != self._blank and symbol not in self._in_alphabet:
-            self._in_alphabet.add(symbol)
-
-        if new_state not in self._states:
-            self._states.add(new_state)
-
-        if new_symbol != self._blank and new_symbol not in self._in_alphabet:
-            self._in_alphabet.add(new_symbol)
-
-        self._trans_function[(state, symbol)] = (new_state, new_symbol, movement)
+            # Single tape transition
+            if movement not in TuringMachine.HEAD_MOVEMENTS:
+                raise Exception("Invalid movement")
+            if (type(symbol) is str and len(symbol) > 1) or (
+                type(new_symbol) is str and len(new_symbol) > 1
+            ):
+                raise Exception("Symbol length > 1")
+
+            key = (state, symbol)
+            value = (new_state, new_symbol, movement)
+            trans_function = self._trans_function
+            if self._nondeterministic:
+                if not self._add_value(key, value):
+                    return
+            elif key in trans_function:
+                self._add_value(key, value)
+            else:
+                trans_function[key] = value
+
+            refs = self._symbol_refs
+            refs[symbol] = refs.get(symbol, 0) + 1
+            refs[new_symbol] = refs.get(new_symbol, 0) + 1
+            num_tapes = 1
+        else:
+            symbols = _items(symbol)
+            new_symbols = _items(new_symbol)
+            movements = _items(movement)
+            if not len(symbols) == len(new_symbols) == len(movements) > 0:
+                raise Exception("Transition tuples must have one item per tape")
+            if not TuringMachine.HEAD_MOVEMENTS.issuperset(movements):
+                raise Exception("Invalid movement")
+            if any(isinstance(s, str) and len(s) > 1 for s in symbols + new_symbols):
+                raise Exception("Symbol length > 1")
+
+            value = (new_state, _single(new_symbol), _single(movement))
+            if not self._add_value((state, _single(symbol)), value):
+                return
+            for s in symbols + new_symbols:
+                _ref(self._symbol_refs, s)
+            num_tapes = len(symbols)
+
+        refs = self._state_refs
+        refs[state] = refs.get(state, 0) + 1
+        refs[new_state] = refs.get(new_state, 0) + 1
+        refs = self._tape_refs
+        refs[num_tapes] = refs.get(num_tapes, 0) + 1
+
+    def remove_transition(
+        self, state, symbol, new_state=None, new_symbol=None, movement=None
+    ):
+        """Removes the transitions of (state, symbol) if there are any, along
+        with the ones they replaced.
+
+        In nondeterministic mode, if new_state, new_symbol and movement are
+        given only that transition is removed.
+        """
+        if isinstance(symbol, tuple):
+            symbol = _single(symbol)
+        key = (state, symbol)
+        if not self._nondeterministic:
+            value = self._trans_function.pop(key, None)
+            if value is None:
+                return
+            values = self._replaced.pop(key, [])
+            values.append(value)
+        elif new_state is None:
+            values = self._trans_function.pop(key, ())
+        else:
+            values = [(new_state, _single(new_symbol), _single(movement))]
+            targets = self._trans_function.get(key, ())
+            if values[0] not in targets:
+                return
+            targets.remove(values[0])
+            if not targets:
+                del self._trans_function[key]
+
+        for value in values:
+            _unref(self._state_refs, state)
+            _unref(self._state_refs, value[0])
+            if isinstance(symbol, tuple) or isinstance(value[1], tuple):
+                symbols = _items(symbol) + _items(value[1])
+            else:
+                symbols = (symbol, value[1])
+            for s in symbols:
+                _unref(self._symbol_refs, s)
+            _unref(self._tape_refs, len(symbols) // 2)
+
+    def _add_value(self, key, value):
+        """Sets the transition of the (state, symbol) key, returns False if
+        it was already there in nondeterministic mode.
+        """
+        if self._nondeterministic:
+            targets = self._trans_function.setdefault(key, set())
+            if value in targets:
+                return False
+            targets.add(value)
+            return True
+
+        old = self._trans_function.get(key)
+        if old is not None:
+            # The replaced transition keeps its states and symbols in the
+            # machine until (state, symbol) is removed
+            self._replaced.setdefault(key, []).append(old)
+        self._trans_function[key] = value
+        return True
 
     def add_final_state(self, state):
         """Adds the give state to the set of final states."""
-        if state not in self._states:
-            self._states.add(state)
-        if state not in self._final_states:
-            self._final_states.add(state)
+        _ref(self._state_refs, state)
+        _ref(self._final_states, state)
+
+    def remove_final_state(self, state):
+        """Undoes one add_final_state() of the given state, it is not final
+        anymore once all of them have been undone.
+        """
+        if state in self._final_states:
+            _unref(self._final_states, state)
+            _unref(self._state_refs, state)
 
     def set_initial_state(self, state):
         """Sets the given state as the initial."""
-        if state not in self._states:
-            self._states.add(state)
+        self.unset_initial_state()
+        _ref(self._state_refs, state)
         self._init_state = state
 
+    def unset_initial_state(self):
+        """Removes the initial state."""
+        if self.has_initial_state():
+            _unref(self._state_refs, self._init_state)
+            self._init_state = None
+
     def has_initial_state(self):
         """Tests if the initial state has been set.
 
@@ -102,30 +228,32 @@ class TuringMachineBuilder:
 
         self._blank = blank_sym
 
+    def unset_blank_symbol(self):
+        """Removes the blank symbol."""
+        self._blank = None
+
     def set_halt_state(self, halt_state):
         """Sets the halt state."""
-        # If there is a previous halt state. Check if it appears in some
-        # transition otherwise delete it from the list of states
-        if self.has_halt_state():
-            old_remains = False
-            for k, v in self._trans_function.items():
-                if k[0] == self._halt_state or v[0] == self._halt_state:
-                    old_remains = True
-                    break
-
-            if not old_remains:
-                self._states.remove(self._halt_state)
-
+        # The previous halt state remains if some transition uses it
+        self.unset_halt_state()
+        _ref(self._state_refs, halt_state)
         self._halt_state = halt_state
-        self._states.add(self._halt_state)
+
+    def unset_halt_state(self):
+        """Removes the halt state."""
+        if self.has_halt_state():
+            _unref(self._state_refs, self._halt_state)
+            self._halt_state = None
 
     def create(self):
         """Creates a new turing machine instance using the previously set data
 
-        The input alphabet is automatically set from the specified transitions
-        plus the blank symbol.
+        The input alphabet is automatically set from the symbols of the
+        specified transitions but the blank symbol, which is added to them to
+        form the tape alphabet.
 
-        :raise Exception: If necessary elements are not set.
+        :raise Exception: If necessary elements are not set or the
+            transitions have different numbers of tapes.
         """
         if not self.has_initial_state():
             raise Exception("It is necessary to specify an initial state")
@@ -136,23 +264,67 @@ class TuringMachineBuilder:
         if not self.has_halt_state():
             raise Exception("It is necessary to specify the halt state")
 
-        tape_alphabet = set(self._in_alphabet)
+        if len(self._tape_refs) > 1:
+            raise Exception("All the transitions must have the same number of tapes")
+        num_tapes = next(iter(self._tape_refs), 1)
+
+        in_alphabet = set(self._symbol_refs)
+        in_alphabet.discard(self._blank)
+        tape_alphabet = set(in_alphabet)
         tape_alphabet.add(self._blank)
 
-        return TuringMachine(
-            self._states,
-            self._in_alphabet,
+        args = (
+            self._state_refs.keys(),
+            in_alphabet,
             tape_alphabet,
             self._trans_function,
             self._init_state,
-            self._final_states,
+            self._final_states.keys(),
             self._halt_state,
             self._blank,
         )
+        if num_tapes > 1:
+            if self._nondeterministic:
+                raise Exception(
+                    "Nondeterministic multi-tape machines are not supported"
+                )
+            return MultiTapeTuringMachine(*args, num_tapes=num_tapes)
+        if self._nondeterministic:
+            return NondeterministicTuringMachine(*args)
+        return TuringMachine(*args)
 
     def get_halt_state(self):
         return self._halt_state
 
+    def is_nondeterministic(self):
+        """Tests if (state, symbol) pairs can have several transitions."""
+        return self._nondeterministic
+
+
+def _items(value):
+    """Returns the items of a multi-tape tuple, or value alone in a tuple"""
+    return value if isinstance(value, tuple) else (value,)
+
+
+def _single(value):
+    """Unwraps single item tuples, single tape transitions have no tuples"""
+    if isinstance(value, tuple) and len(value) == 1:
+        return value[0]
+    return value
+
+
+def _ref(refs, key):
+    """Adds one reference to key"""
+    refs[key] = refs.get(key, 0) + 1
+
+
+def _unref(refs, key):
+    """Removes one reference to key, deleting it with the last one"""
+    if refs[key] > 1:
+        refs[key] -= 1
+    else:
+        del refs[key]
+
 
 if __name__ == "__main__":
     tmb = TuringMachineBuilder()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+from utm.tm.parser import TuringMachineParser
+from utm.tm.tm import TuringMachine
+
+
+class MachineCache:
+    """
+    Least recently used cache of parsed turing machines, keyed by the hash
+    of their source.
+
+    A source is parsed and validated only the first time it is seen (or
+    after it has been evicted), the cache keeps its MachineDefinition and
+    every get() returns a new machine at its initial state that runs it, see
+    TuringMachine.from_definition().
+    """
+
+    def __init__(self, max_size=32):
+        """
+        MachineCache(max_size=32)
+
+            - max_size:
+                Maximum number of machines kept, when it is exceeded the
+                least recently used machine is evicted
+        """
+        self._definitions = OrderedDict()
+        self._max_size = max_size
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, source, create=None):
+        """Returns a new machine built from the given source string.
+
+        Parse errors are raised as TuringMachineParser.parse_string() and
+        TuringMachineParser.create() do, failed sources are not cached.
+
+        :param create: Function that returns the machine of source when it is
+            not cached, e.g. the create() method of a parser that already
+            holds it. By default the source is parsed.
+
+        Only single tape machines are cached, other machines (e.g. a
+        MultiTapeTuringMachine) are created on every call.
+        """
+        key = MachineCache.source_key(source)
+        definition = self._definitions.get(key)
+        if definition is None:
+            self._misses += 1
+            if create is None:
+                parser = TuringMachineParser()
+                parser.parse_string(source)
+                create = parser.create
+            tm = create()
+            if isinstance(tm, TuringMachine):
+                self._definitions[key] = tm.get_definition()
+                self._evict()
+            return tm
+
+        self._hits += 1
+        self._definitions.move_to_end(key)
+        return TuringMachine.from_definition(definition)
+
+    def clear(self):
+        """Removes all the cached machines"""
+        self._definitions.clear()
+
+    def get_hits(self):
+        """Returns the number of get() calls that did not parse the source"""
+        return self._hits
+
+    def get_misses(self):
+        """Returns the number of get() calls that parsed the source"""
+        return self._misses
+
+    def get_max_size(self):
+        """Returns the maximum number of cached machines"""
+        return self._max_size
+
+    def set_max_size(self, max_size):
+        """Changes the maximum number of cached machines, evicting the least
+        recently used ones if needed.
+        """
+        self._max_size = max_size
+        self._evict()
+
+    def __len__(self):
+        return len(self._definitions)
+
+    def __contains__(self, source):
+        return MachineCache.source_key(source) in self._definitions
+
+    @staticmethod
+    def source_key(source):
+        """Returns the cache key of a source string, its SHA-256 digest"""
+        import hashlib
+
+        return hashlib.sha256(source.encode("utf-8")).digest()
+
+    def _evict(self):
+        while len(self._definitions) > max(self._max_size, 0):
+            self._definitions.popitem(last=False)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from utm.tm import engine
+
+
+# Compiled machine file format
+##############################################################################
+#
+# A compiled file stores the interned states and symbols and the transition
+# table of a machine, so it can be loaded without parsing nor compiling:
+#
+#   - header: magic, format version, byte order of the table (0 little
+#     endian, 1 big endian), metadata length and table size
+#   - metadata: UTF-8 JSON object with the interned states and symbols in id
+#     order, the halt state base and the ids of the initial state, the final
+#     states and the input alphabet
+#   - padding up to a multiple of 8 bytes
+#   - the table arrays next_state, loop_next, write and move, each one with
+#     table size int32 items in the byte order given by the header
+#
+# Loading memory-maps the file and the table arrays are used in place, only
+# the header, the metadata and the lengths are checked unless the caller asks
+# to check the table too.
+
+MAGIC = b"UTMC"
+VERSION = 1
+EXTENSION = ".utmc"
+
+_HEADER = struct.Struct("<4sHBxII")
+_BYTE_ORDERS = ("little", "big")
+_TABLE_ARRAYS = ("next_state", "loop_next", "write", "move")
+
+
+class CompiledFormatError(Exception):
+    """Exception raised when a file is not a valid compiled machine"""
+
+
+def save(path, table, in_alphabet, init_state, final_states):
+    """Writes a compiled machine to path.
+
+    The file is written to a temporary file first and then renamed, so
+    concurrent readers never see a partially written file.
+
+    :raise TypeError: if some state or symbol is not a string.
+    """
+    if not all(isinstance(s, str) for s in table.states + table.symbols):
+        raise TypeError("Only machines with string states and symbols can be saved")
+
+    metadata = json.dumps(
+        {
+            "states": table.states,
+            "symbols": table.symbols,
+            "halt_base": table.halt_base,
+            "initial_state": table.state_ids[init_state],
+            "final_states": sorted(table.state_ids[s] for s in final_states),
+            "input_alphabet": sorted(table.symbol_ids[s] for s in in_alphabet),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    size = len(table.next_state)
+    header = _HEADER.pack(
+        MAGIC, VERSION, _BYTE_ORDERS.index(sys.byteorder), len(metadata), size
+    )
+
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(metadata)
+            f.write(bytes(-(len(header) + len(metadata)) % 8))
+            for name in _TABLE_ARRAYS:
+                array("i", getattr(table, name)).tofile(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load(path, check_table=False):
+    """Memory-maps a compiled machine.
+
+    :param check_table: If True the values of the table are checked to be in
+        range, which takes time proportional to its size. Otherwise a
+        corrupt table is only detected, if at all, when the machine runs.
+
+    :return: Tuple (table, input alphabet, initial state, final states), the
+        table arrays are views of the mapped file.
+
+    :raise CompiledFormatError: if the file is not a compiled machine of
+        this version and byte order, or it is corrupt.
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            raise CompiledFormatError("%s is not a compiled machine" % path)
+
+    if len(data) < _HEADER.size:
+        raise CompiledFormatError("%s is not a compiled machine" % path)
+    magic, version, byte_order, metadata_len, size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CompiledFormatError("%s is not a compiled machine" % path)
+    if version != VERSION:
+        raise CompiledFormatError(
+            "%s has format version %d, expected %d" % (path, version, VERSION)
+        )
+    if byte_order >= len(_BYTE_ORDERS):
+        raise CompiledFormatError("%s has an unknown byte order" % path)
+    if _BYTE_ORDERS[byte_order] != sys.byteorder:
+        raise CompiledFormatError(
+            "%s was compiled on a %s endian machine" % (path, _BYTE_ORDERS[byte_order])
+        )
+
+    start = _HEADER.size + metadata_len
+    start += -start % 8
+    itemsize = array("i").itemsize
+    if len(data) != start + len(_TABLE_ARRAYS) * size * itemsize:
+        raise CompiledFormatError("%s is truncated" % path)
+
+    try:
+        metadata = json.loads(
+            data[_HEADER.size : _HEADER.size + metadata_len].decode("utf-8")
+        )
+        states = metadata["states"]
+        symbols = metadata["symbols"]
+        halt_base = metadata["halt_base"]
+        num_symbols = len(symbols)
+        in_alphabet = [
+            symbols[_index(i, num_symbols)] for i in metadata["input_alphabet"]
+        ]
+        init_state = states[_index(metadata["initial_state"], len(states))]
+        final_states = [
+            states[_index(i, len(states))] for i in metadata["final_states"]
+        ]
+        if (
+            not all(isinstance(s, str) for s in states + symbols)
+            or size != len(states) * num_symbols
+            or halt_base % num_symbols
+            or not 0 <= halt_base < size
+        ):
+            raise ValueError("inconsistent metadata")
+    except (ValueError, KeyError, IndexError, TypeError, ZeroDivisionError):
+        raise CompiledFormatError("%s has corrupt metadata" % path)
+
+    view = memoryview(data)
+    arrays = []
+    for _ in _TABLE_ARRAYS:
+        arrays.append(view[start : start + size * itemsize].cast("i"))
+        start += size * itemsize
+
+    if check_table and not _is_table_valid(size, num_symbols, *arrays):
+        raise CompiledFormatError("%s has an invalid transition table" % path)
+
+    table = engine.TransitionTable.from_arrays(states, symbols, halt_base, *arrays)
+    return table, in_alphabet, init_state, final_states
+
+
+def _is_table_valid(size, num_symbols, next_state, loop_next, write, move):
+    """Tests if the values of the table arrays are in range.
+
+    The engine indexes the table with these values, an out of range one
+    would crash the run or jump to the row of another state.
+    """
+    last_base = size - num_symbols
+    return not size or not (
+        min(next_state) < engine.UNDEFINED
+        or max(next_state) > last_base
+        or min(loop_next) < engine.SCAN_LOOP
+        or max(loop_next) > last_base
+        or min(write) < 0
+        or max(write) >= num_symbols
+        or min(move) < -1
+        or max(move) > 1
+    )
+
+
+def _index(value, length):
+    """Returns value if it is an index of a sequence of the given length"""
+    if not isinstance(value, int) or not 0 <= value < length:
+        raise IndexError(value)
+    return value
+
+
+def cache_path(source_path, cache_dir):
+    """Returns the path of the compiled file of a source file in cache_dir.
+
+    The name is the hash of the source contents and the format version, so
+    an edited source never matches the compiled file of an old version.
+    """
+    digest = hashlib.sha256(b"%d:" % VERSION)
+    with open(source_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return os.path.join(cache_dir, digest.hexdigest() + EXTENSION)
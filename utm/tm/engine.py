@@ -0,0 +1,787 @@
+# -*- coding: utf-8 -*-
+
+# Exit codes shared by the execution loops and TuringMachine.run
+##############################################################################
+
+EXIT_HALT = 0
+EXIT_MAX_STEPS = 1
+EXIT_UNKNOWN_TRANSITION = 2
+EXIT_LOOP = 3
+# 4 is the memory limit of the nondeterministic search
+EXIT_BREAKPOINT = 5
+
+# Special values of TransitionTable.loop_next
+UNDEFINED = -1
+SCAN_LOOP = -2
+BREAKPOINT = -3
+
+# Entries kept in a block macro-step cache before it is cleared
+MACRO_CACHE_LIMIT = 1 << 20
+
+
+# Compiled transition table
+##############################################################################
+
+
+class TransitionTable:
+    """Dense integer representation of a transition function.
+
+    States and symbols are interned to small integers, the blank symbol is
+    always interned as 0. The transition for (state_id, symbol_id) lives at
+    index ``state_id * num_symbols + symbol_id`` of three parallel lists:
+
+        - next_state: base index (next_state_id * num_symbols) of the next
+          state or -1 if the transition is not defined
+        - write: symbol id to write on the tape
+        - move: head displacement (-1, 0 or 1)
+
+    The execution loops read loop_next, a copy of next_state in which the
+    scan loops, transitions that keep the state, rewrite the read symbol and
+    move the head, are marked as SCAN_LOOP. Those loops sweep whole runs of
+    a symbol in one operation. Transitions marked as BREAKPOINT, see
+    with_breakpoints(), stop the execution loops.
+    """
+
+    def __init__(
+        self, states, tape_alphabet, trans_function, halt_state, blank_sym, moves
+    ):
+        """
+        Compiles the given transition function.
+
+            - moves:
+                Dictionary mapping each head movement to its displacement
+        """
+        others = sorted((s for s in tape_alphabet if s != blank_sym), key=str)
+        self._intern(sorted(states, key=str), (blank_sym,) + tuple(others))
+        self.halt_base = self.state_base(halt_state)
+
+        num_symbols = self.num_symbols
+        size = len(self.states) * num_symbols
+        self.next_state = [-1] * size
+        self.write = [0] * size
+        self.move = [0] * size
+
+        for (state, symbol), (
+            new_state,
+            new_symbol,
+            movement,
+        ) in trans_function.items():
+            i = self.state_ids[state] * num_symbols + self.symbol_ids[symbol]
+            self.next_state[i] = self.state_ids[new_state] * num_symbols
+            self.write[i] = self.symbol_ids[new_symbol]
+            self.move[i] = moves[movement]
+
+        self._step_records = None
+
+        self.loop_next = list(self.next_state)
+        for i, nxt in enumerate(self.next_state):
+            if (
+                nxt == i - i % num_symbols
+                and self.write[i] == i % num_symbols
+                and self.move[i] != 0
+            ):
+                self.loop_next[i] = SCAN_LOOP
+
+    @classmethod
+    def from_arrays(
+        cls, states, symbols, halt_base, next_state, loop_next, write, move
+    ):
+        """Builds a table from already compiled arrays, which are not copied.
+
+        The arrays can be any sequence of integers with the layout described
+        above (e.g. memoryview of a compiled file), states and symbols give
+        the interned ids by position and symbols[0] is the blank symbol.
+        """
+        table = cls.__new__(cls)
+        table._intern(states, symbols)
+        table.halt_base = halt_base
+        table.next_state = next_state
+        table.loop_next = loop_next
+        table.write = write
+        table.move = move
+        table._step_records = None
+        return table
+
+    def with_breakpoints(self, indexes):
+        """Returns a copy of the table in which the transitions at the given
+        indexes are marked as BREAKPOINT in loop_next, the execution loops
+        stop before executing them. The rest of the table is shared.
+        """
+        table = self.from_arrays(
+            self.states,
+            self.symbols,
+            self.halt_base,
+            self.next_state,
+            list(self.loop_next),
+            self.write,
+            self.move,
+        )
+        for i in indexes:
+            table.loop_next[i] = BREAKPOINT
+        return table
+
+    def step_records(self):
+        """Returns the step record of each transition.
+
+        The record of the transition at index i is the tuple (state id,
+        read symbol id, written symbol id, displacement). They are computed
+        the first time they are needed.
+        """
+        if self._step_records is None:
+            n = self.num_symbols
+            self._step_records = [
+                (i // n, i % n, self.write[i], self.move[i])
+                for i in range(len(self.next_state))
+            ]
+        return self._step_records
+
+    def _intern(self, states, symbols):
+        self.states = tuple(states)
+        self.state_ids = {s: i for i, s in enumerate(self.states)}
+        self.symbols = tuple(symbols)
+        self.symbol_ids = {s: i for i, s in enumerate(self.symbols)}
+        self.num_symbols = len(self.symbols)
+
+    def state_base(self, state):
+        """Returns the table base index of the given state"""
+        return self.state_ids[state] * self.num_symbols
+
+    def state_at(self, base):
+        """Returns the state whose table base index is base"""
+        return self.states[base // self.num_symbols]
+
+
+class MultiTapeTable:
+    """Integer representation of the transition function of a k-tape machine.
+
+    States and symbols are interned as in TransitionTable. The symbols under
+    the k heads are combined in a single index
+
+        state_id * num_symbols ** k + sum(symbol_id_j * num_symbols ** j)
+
+    and transitions maps each defined index to the tuple (next state base,
+    written symbol ids, head displacements). It is a dictionary because the
+    dense table would grow exponentially with k.
+    """
+
+    def __init__(
+        self,
+        states,
+        tape_alphabet,
+        trans_function,
+        halt_state,
+        blank_sym,
+        moves,
+        num_tapes,
+    ):
+        """
+        Compiles the given transition function.
+
+            - moves:
+                Dictionary mapping each head movement to its displacement
+        """
+        others = sorted((s for s in tape_alphabet if s != blank_sym), key=str)
+        self.states = tuple(sorted(states, key=str))
+        self.state_ids = {s: i for i, s in enumerate(self.states)}
+        self.symbols = (blank_sym,) + tuple(others)
+        self.symbol_ids = {s: i for i, s in enumerate(self.symbols)}
+        self.num_symbols = len(self.symbols)
+        self.num_tapes = num_tapes
+        self.stride = self.num_symbols**num_tapes
+        self.weights = tuple(self.num_symbols**j for j in range(num_tapes))
+        self.halt_base = self.state_base(halt_state)
+
+        self.transitions = {}
+        for (state, symbols), (
+            new_state,
+            new_symbols,
+            movements,
+        ) in trans_function.items():
+            i = self.state_base(state) + self.index(self.symbol_ids[s] for s in symbols)
+            self.transitions[i] = (
+                self.state_base(new_state),
+                tuple(self.symbol_ids[s] for s in new_symbols),
+                tuple(moves[m] for m in movements),
+            )
+
+    def index(self, symbol_ids):
+        """Returns the offset of the given symbol ids from a state base"""
+        return sum(s * w for s, w in zip(symbol_ids, self.weights))
+
+    def state_base(self, state):
+        """Returns the table base index of the given state"""
+        return self.state_ids[state] * self.stride
+
+    def state_at(self, base):
+        """Returns the state whose table base index is base"""
+        return self.states[base // self.stride]
+
+
+# Execution loops
+##############################################################################
+
+
+def run(table, tape, base, max_steps=None):
+    """Executes steps on the given tape until halt or max steps.
+
+    Scan loops are executed a whole run of cells at a time, the returned
+    number of steps is still the exact number of executed transitions.
+
+    :param table: TransitionTable of the machine.
+    :param tape: Tape to execute on, modified in place.
+    :param base: Table base index of the current state.
+    :param max_steps: Limit of steps, no limit if None or 0.
+
+    :return: Tuple (exit code, state base, executed steps).
+    """
+    loop_next = table.loop_next
+    write = table.write
+    move = table.move
+    halt = table.halt_base
+
+    if base == halt:
+        return EXIT_HALT, base, 0
+
+    cells = tape.cells
+    head, lo, hi = tape.head, tape.lo, tape.hi
+    size = len(cells)
+    limit = max_steps if max_steps else -1
+    steps = 0
+    exit_code = EXIT_MAX_STEPS
+
+    while steps != limit:
+        i = base + cells[head]
+        nxt = loop_next[i]
+        if nxt >= 0:
+            cells[head] = write[i]
+            base = nxt
+            head += move[i]
+            steps += 1
+        elif nxt == SCAN_LOOP:
+            n = limit - steps if limit > 0 else size
+            if move[i] > 0:
+                end = _scan_right(cells, head, min(size, head + n), cells[head])
+                steps += end - head
+            else:
+                end = _scan_left(cells, head, max(-1, head - n), cells[head])
+                steps += head - end
+            head = end
+        elif nxt == BREAKPOINT:
+            exit_code = EXIT_BREAKPOINT
+            break
+        else:
+            exit_code = EXIT_UNKNOWN_TRANSITION
+            break
+
+        if head < lo:
+            if head < 0:
+                n = tape.grow_left()
+                head, lo, hi, size = head + n, lo + n, hi + n, size + n
+            lo = head
+        elif head >= hi:
+            if head == size:
+                size += tape.grow_right()
+            hi = head + 1
+
+        if base == halt:
+            exit_code = EXIT_HALT
+            break
+
+    tape.head, tape.lo, tape.hi = head, lo, hi
+    return exit_code, base, steps
+
+
+def run_recording(table, tape, base, records, max_steps=None):
+    """Same as run() but appends the record of every step to records.
+
+    :param records: array('i') that receives 4 integers per step, see
+        TransitionTable.step_records().
+
+    :return: Tuple (exit code, state base, executed steps).
+    """
+    loop_next = table.loop_next
+    write = table.write
+    move = table.move
+    step_records = table.step_records()
+    extend = records.extend
+    halt = table.halt_base
+
+    if base == halt:
+        return EXIT_HALT, base, 0
+
+    cells = tape.cells
+    head, lo, hi = tape.head, tape.lo, tape.hi
+    size = len(cells)
+    limit = max_steps if max_steps else -1
+    steps = 0
+    exit_code = EXIT_MAX_STEPS
+
+    while steps != limit:
+        i = base + cells[head]
+        nxt = loop_next[i]
+        if nxt >= 0:
+            extend(step_records[i])
+            cells[head] = write[i]
+            base = nxt
+            head += move[i]
+            steps += 1
+        elif nxt == SCAN_LOOP:
+            n = limit - steps if limit > 0 else size
+            if move[i] > 0:
+                end = _scan_right(cells, head, min(size, head + n), cells[head])
+                n = end - head
+            else:
+                end = _scan_left(cells, head, max(-1, head - n), cells[head])
+                n = head - end
+            extend(step_records[i] * n)
+            steps += n
+            head = end
+        elif nxt == BREAKPOINT:
+            exit_code = EXIT_BREAKPOINT
+            break
+        else:
+            exit_code = EXIT_UNKNOWN_TRANSITION
+            break
+
+        if head < lo:
+            if head < 0:
+                n = tape.grow_left()
+                head, lo, hi, size = head + n, lo + n, hi + n, size + n
+            lo = head
+        elif head >= hi:
+            if head == size:
+                size += tape.grow_right()
+            hi = head + 1
+
+        if base == halt:
+            exit_code = EXIT_HALT
+            break
+
+    tape.head, tape.lo, tape.hi = head, lo, hi
+    return exit_code, base, steps
+
+
+def run_journaled(table, tape, base, journal, max_steps=None):
+    """Same as run() but appends the table index of every executed
+    transition to journal.
+
+    :param journal: array('i') that receives an integer per step, the index
+        gives the previous state and the overwritten symbol and the
+        transition gives the head displacement.
+
+    :return: Tuple (exit code, state base, executed steps).
+    """
+    loop_next = table.loop_next
+    write = table.write
+    move = table.move
+    append = journal.append
+    extend = journal.extend
+    halt = table.halt_base
+
+    if base == halt:
+        return EXIT_HALT, base, 0
+
+    cells = tape.cells
+    head, lo, hi = tape.head, tape.lo, tape.hi
+    size = len(cells)
+    limit = max_steps if max_steps else -1
+    steps = 0
+    exit_code = EXIT_MAX_STEPS
+
+    while steps != limit:
+        i = base + cells[head]
+        nxt = loop_next[i]
+        if nxt >= 0:
+            append(i)
+            cells[head] = write[i]
+            base = nxt
+            head += move[i]
+            steps += 1
+        elif nxt == SCAN_LOOP:
+            n = limit - steps if limit > 0 else size
+            if move[i] > 0:
+                end = _scan_right(cells, head, min(size, head + n), cells[head])
+                n = end - head
+            else:
+                end = _scan_left(cells, head, max(-1, head - n), cells[head])
+                n = head - end
+            extend((i,) * n)
+            steps += n
+            head = end
+        elif nxt == BREAKPOINT:
+            exit_code = EXIT_BREAKPOINT
+            break
+        else:
+            exit_code = EXIT_UNKNOWN_TRANSITION
+            break
+
+        if head < lo:
+            if head < 0:
+                n = tape.grow_left()
+                head, lo, hi, size = head + n, lo + n, hi + n, size + n
+            lo = head
+        elif head >= hi:
+            if head == size:
+                size += tape.grow_right()
+            hi = head + 1
+
+        if base == halt:
+            exit_code = EXIT_HALT
+            break
+
+    tape.head, tape.lo, tape.hi = head, lo, hi
+    return exit_code, base, steps
+
+
+def run_profiled(table, tape, base, hits, growths, max_steps=None):
+    """Same as run() but counts the steps of each transition.
+
+    :param hits: List with a counter for each table index, the counter of a
+        transition is increased every time it is executed.
+    :param growths: List that receives a tuple (steps executed before, side,
+        new buffer size) every time the tape buffer grows, side is -1 for the
+        left and 1 for the right.
+
+    :return: Tuple (exit code, state base, executed steps, lowest and
+        highest buffer index reached by the head).
+    """
+    loop_next = table.loop_next
+    write = table.write
+    move = table.move
+    halt = table.halt_base
+
+    cells = tape.cells
+    head, lo, hi = tape.head, tape.lo, tape.hi
+    head_lo = head_hi = head
+    if base == halt:
+        return EXIT_HALT, base, 0, head_lo, head_hi
+
+    size = len(cells)
+    limit = max_steps if max_steps else -1
+    steps = 0
+    exit_code = EXIT_MAX_STEPS
+
+    while steps != limit:
+        i = base + cells[head]
+        nxt = loop_next[i]
+        if nxt >= 0:
+            cells[head] = write[i]
+            base = nxt
+            head += move[i]
+            steps += 1
+            hits[i] += 1
+        elif nxt == SCAN_LOOP:
+            n = limit - steps if limit > 0 else size
+            if move[i] > 0:
+                end = _scan_right(cells, head, min(size, head + n), cells[head])
+                n = end - head
+            else:
+                end = _scan_left(cells, head, max(-1, head - n), cells[head])
+                n = head - end
+            head = end
+            steps += n
+            hits[i] += n
+        elif nxt == BREAKPOINT:
+            exit_code = EXIT_BREAKPOINT
+            break
+        else:
+            exit_code = EXIT_UNKNOWN_TRANSITION
+            break
+
+        if head < head_lo:
+            head_lo = head
+        elif head > head_hi:
+            head_hi = head
+
+        if head < lo:
+            if head < 0:
+                n = tape.grow_left()
+                head, lo, hi, size = head + n, lo + n, hi + n, size + n
+                head_lo, head_hi = head_lo + n, head_hi + n
+                growths.append((steps, -1, size))
+            lo = head
+        elif head >= hi:
+            if head == size:
+                size += tape.grow_right()
+                growths.append((steps, 1, size))
+            hi = head + 1
+
+        if base == halt:
+            exit_code = EXIT_HALT
+            break
+
+    tape.head, tape.lo, tape.hi = head, lo, hi
+    return exit_code, base, steps, head_lo, head_hi
+
+
+def run_blocks(table, tape, base, block_size, cache, max_steps=None):
+    """Executes steps using block macro-steps of block_size cells.
+
+    The tape is seen as a sequence of aligned blocks. Everything the machine
+    does from entering a block until the head leaves it depends only on the
+    state, the entry offset and the block contents, so it is computed once,
+    stored in cache and then applied in a single operation. Scan loops are
+    still swept as in run(). Step counts are exact, when a macro-step would
+    exceed max_steps the remaining steps are executed one by one.
+
+    :param cache: Dictionary with the macro-steps computed so far, it must
+        only be shared between runs of the same table and block size.
+
+    :return: Tuple (exit code, state base, executed steps).
+    """
+    loop_next = table.loop_next
+    move = table.move
+    halt = table.halt_base
+
+    if base == halt:
+        return EXIT_HALT, base, 0
+
+    compact = tape.typecode == "B"
+    limit = max_steps if max_steps else -1
+    steps = 0
+
+    while steps != limit:
+        if len(cache) > MACRO_CACHE_LIMIT:
+            cache.clear()
+
+        cells = tape.cells
+        head = tape.head
+        i = base + cells[head]
+        if loop_next[i] == SCAN_LOOP:
+            n = limit - steps if limit > 0 else len(cells)
+            if move[i] > 0:
+                end = _scan_right(cells, head, min(len(cells), head + n), cells[head])
+                steps += end - head
+            else:
+                end = _scan_left(cells, head, max(-1, head - n), cells[head])
+                steps += head - end
+            tape.head = end
+            tape.move(0)  # update the bounds and grow the tape if needed
+            continue
+
+        start = head - head % block_size
+        while start + block_size > len(cells):
+            tape.grow_right()
+
+        block = cells[start : start + block_size]
+        key = (base, head - start, bytes(block) if compact else tuple(block))
+        macro = cache.get(key)
+        if macro is None:
+            macro = cache[key] = _macro_step(table, base, head - start, block)
+
+        new_base, new_block, offset, lo_off, hi_off, n = macro
+        if n is None or (limit > 0 and steps + n > limit):
+            # Loops forever inside the block or goes over the steps limit
+            exit_code, base, n = run(
+                table, tape, base, limit - steps if limit > 0 else None
+            )
+            return exit_code, base, steps + n
+
+        cells[start : start + block_size] = new_block
+        base = new_base
+        steps += n
+        tape.head = start + offset
+        tape.lo = min(tape.lo, start + lo_off)
+        tape.hi = max(tape.hi, start + hi_off)
+        if 0 <= offset < block_size:
+            # Stopped inside the block, halt or undefined transition
+            if base == halt:
+                return EXIT_HALT, base, steps
+            if steps == limit:
+                return EXIT_MAX_STEPS, base, steps
+            return EXIT_UNKNOWN_TRANSITION, base, steps
+
+        tape.move(0)  # grow the tape if the head left the buffer
+        if base == halt:
+            return EXIT_HALT, base, steps
+
+    return EXIT_MAX_STEPS, base, steps
+
+
+def run_multitape(table, tapes, base, max_steps=None):
+    """Executes steps of a multi-tape machine until halt or max steps.
+
+    :param table: MultiTapeTable of the machine.
+    :param tapes: List with a Tape for each head, modified in place.
+    :param base: Table base index of the current state.
+    :param max_steps: Limit of steps, no limit if None or 0.
+
+    :return: Tuple (exit code, state base, executed steps).
+    """
+    transitions = table.transitions
+    weights = table.weights
+    halt = table.halt_base
+
+    if base == halt:
+        return EXIT_HALT, base, 0
+
+    k = range(len(tapes))
+    cells = [t.cells for t in tapes]
+    heads = [t.head for t in tapes]
+    los = [t.lo for t in tapes]
+    his = [t.hi for t in tapes]
+    limit = max_steps if max_steps else -1
+    steps = 0
+    exit_code = EXIT_MAX_STEPS
+
+    while steps != limit:
+        i = base
+        for j in k:
+            i += cells[j][heads[j]] * weights[j]
+        entry = transitions.get(i)
+        if entry is None:
+            exit_code = EXIT_UNKNOWN_TRANSITION
+            break
+
+        base, writes, moves = entry
+        for j in k:
+            head = heads[j]
+            cells[j][head] = writes[j]
+            head += moves[j]
+            if head < los[j]:
+                if head < 0:
+                    n = tapes[j].grow_left()
+                    head += n
+                    his[j] += n
+                los[j] = head
+            elif head >= his[j]:
+                if head == len(cells[j]):
+                    tapes[j].grow_right()
+                his[j] = head + 1
+            heads[j] = head
+        steps += 1
+
+        if base == halt:
+            exit_code = EXIT_HALT
+            break
+
+    for j in k:
+        tapes[j].head, tapes[j].lo, tapes[j].hi = heads[j], los[j], his[j]
+    return exit_code, base, steps
+
+
+def configuration(table, tape, base):
+    """Returns a hashable fingerprint of the machine configuration.
+
+    The fingerprint is (hash, state base, head offset, cells) where cells is
+    the non-blank part of the tape and the head offset is relative to its
+    first cell. The hash of cells goes first so that most different
+    fingerprints are told apart without comparing the cells. Two equal
+    fingerprints mean the machine behaves the same from both configurations,
+    maybe translated along the tape, so a repeated fingerprint proves that
+    the machine never halts.
+
+    Returns None if the machine is sweeping blanks endlessly, that is, it is
+    in a scan loop over the blank symbol heading away from all non-blank
+    cells.
+    """
+    lo, hi = tape.bounds()
+    cells = tape.cells[lo:hi]
+    if tape.typecode == "B":
+        first = len(cells) - len(cells.lstrip(b"\0"))
+        cells = bytes(cells.strip(b"\0"))
+    else:
+        first, last = 0, len(cells)
+        while first < last and cells[first] == 0:
+            first += 1
+        while last > first and cells[last - 1] == 0:
+            last -= 1
+        cells = tuple(cells[first:last])
+
+    offset = tape.head - lo - first if cells else 0
+    if table.loop_next[base] == SCAN_LOOP and tape.cells[tape.head] == 0:
+        move = table.move[base]
+        if (
+            not cells
+            or (move > 0 and offset >= len(cells))
+            or (move < 0 and offset < 0)
+        ):
+            return None
+
+    return hash(cells), base, offset, cells
+
+
+def _macro_step(table, base, offset, block):
+    """Simulates the machine inside a block until the head leaves it.
+
+    :return: Tuple (state base, block contents, head offset, lowest and
+        highest + 1 offsets visited inside the block, steps). Steps is None
+        if the machine never leaves the block.
+    """
+    next_state = table.next_state
+    write = table.write
+    move = table.move
+    halt = table.halt_base
+    size = len(block)
+
+    steps = 0
+    lo_off = hi_off = offset
+    seen = None
+    while 0 <= offset < size and base != halt:
+        i = base + block[offset]
+        nxt = next_state[i]
+        if nxt < 0:
+            break
+        block[offset] = write[i]
+        base = nxt
+        offset += move[i]
+        steps += 1
+        if offset < lo_off:
+            lo_off = max(offset, 0)
+        elif offset > hi_off:
+            hi_off = min(offset, size - 1)
+
+        # A configuration repeated inside the block means it never leaves it
+        if steps > size * 4:
+            seen = set() if seen is None else seen
+            conf = (base, offset, tuple(block))
+            if conf in seen:
+                return base, block, offset, lo_off, hi_off + 1, None
+            seen.add(conf)
+
+    return base, block, offset, lo_off, hi_off + 1, steps
+
+
+def _scan_right(cells, start, stop, sym):
+    """Returns the first index in [start, stop) whose cell is not sym.
+
+    If all cells in the range are sym returns stop.
+    """
+    if type(cells) is bytearray:
+        strip = bytes((sym,))
+        chunk = 64
+        while start < stop:
+            end = min(stop, start + chunk)
+            rest = len(cells[start:end].lstrip(strip))
+            if rest:
+                return end - rest
+            start = end
+            chunk *= 2
+        return stop
+
+    while start < stop and cells[start] == sym:
+        start += 1
+    return start
+
+
+def _scan_left(cells, start, stop, sym):
+    """Returns the last index in (stop, start] whose cell is not sym.
+
+    If all cells in the range are sym returns stop.
+    """
+    if type(cells) is bytearray:
+        strip = bytes((sym,))
+        chunk = 64
+        end = start + 1
+        while end > stop + 1:
+            begin = max(stop + 1, end - chunk)
+            rest = len(cells[begin:end].rstrip(strip))
+            if rest:
+                return begin + rest - 1
+            end = begin
+            chunk *= 2
+        return stop
+
+    while start > stop and cells[start] == sym:
+        start -= 1
+    return start
@@ -17,3 +17,7 @@ class UnknownTransitionException(Exception):
     """Exception raised when there is no specified transition
     with a given (state, symbol) tuple
     """
+
+
+class UndoJournalEmptyException(Exception):
+    """Exception raised when stepping back with no recorded steps to undo"""
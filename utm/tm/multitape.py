@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+from utm.tm import engine
+from utm.tm.exceptions import (
+    HaltStateException,
+    InvalidSymbolException,
+    UnknownTransitionException,
+    TapeNotSetException,
+)
+from utm.tm.tape import Tape
+from utm.tm.tm import MachineDefinition, TuringMachine
+
+
+class MultiTapeTuringMachine:
+    """
+    Turing machine with several tapes, each one with its own head.
+
+        - transition function must be a dictionary with the following format:
+            (state, (symbol_1, ..., symbol_k)) :
+                (state, (symbol_1, ..., symbol_k), (movement_1, ..., movement_k))
+
+          where symbol_j is read from / written to tape j and movement_j
+          moves its head, with the movements of TuringMachine.
+
+    The input word is written on the first tape, the rest of them start
+    blank. Each tape is stored in its own buffer that grows independently,
+    see utm.tm.tape.Tape.
+    """
+
+    # run() return values
+    EXIT_HALT = engine.EXIT_HALT
+    EXIT_MAX_STEPS = engine.EXIT_MAX_STEPS
+    EXIT_UNKNOWN_TRANSITION = engine.EXIT_UNKNOWN_TRANSITION
+
+    def __init__(
+        self,
+        states,
+        in_alphabet,
+        tape_alphabet,
+        trans_function,
+        init_state,
+        final_states,
+        halt_state,
+        blank_sym,
+        num_tapes=None,
+    ):
+        """
+        MultiTapeTuringMachine(states, in_alphabet, tape_alphabet,
+                               trans_function, istate, fstates, hstate, blank,
+                               num_tapes=None)
+
+        The arguments are the same as the ones of TuringMachine, with the
+        transition function described above, and
+            - num_tapes:
+                Number of tapes, by default the one of the transitions. It
+                is required if there are no transitions
+        """
+        self._init_runtime(
+            MultiTapeDefinition(
+                states,
+                in_alphabet,
+                tape_alphabet,
+                trans_function,
+                init_state,
+                final_states,
+                halt_state,
+                blank_sym,
+                num_tapes,
+            )
+        )
+
+    @classmethod
+    def from_definition(cls, definition):
+        """Returns a new machine that runs the given MultiTapeDefinition, see
+        TuringMachine.from_definition().
+        """
+        tm = cls.__new__(cls)
+        tm._init_runtime(definition)
+        return tm
+
+    def _init_runtime(self, definition):
+        """Initializes the execution state of a new machine."""
+        self._definition = definition
+        self._table = definition.table
+
+        self._tapes = None
+        self._cur_state = definition.init_state
+        self._num_executed_steps = 0
+
+    def run_step(self):
+        """
+        Performs one execution step.
+
+            - If it's at Halt state raises HaltStateException
+            - If tape is unset raises UnsetTapeException
+            - If there are no specified transition for the current state and
+              symbols, raises UnknownTransitionException
+        """
+        if self.is_at_halt_state():
+            raise HaltStateException("Current state is halt state")
+        if self._tapes is None:
+            raise TapeNotSetException("Tape must be set before perform an step")
+
+        if self._run_compiled(1) == engine.EXIT_UNKNOWN_TRANSITION:
+            symbols = tuple(self._table.symbols[tape.read()] for tape in self._tapes)
+            raise UnknownTransitionException(
+                "There are no transition for %s" % str((self._cur_state, symbols))
+            )
+
+    def run(self, max_steps=None):
+        """
+        run(max_steps=None): int
+
+        Perform steps until 'halt' or 'max steps'
+
+        Return values:
+            0 - Ends by halt state (EXIT_HALT)
+            1 - Ends by max steps limit (EXIT_MAX_STEPS)
+            2 - Ends by unknown transition (EXIT_UNKNOWN_TRANSITION)
+        """
+        return self._run_compiled(max_steps)
+
+    def get_current_state(self):
+        """
+        Returns the current state
+        """
+        return self._cur_state
+
+    def get_blank_symbol(self):
+        """
+        Returns the blank symbol
+        """
+        return self._definition.blank_sym
+
+    def get_halt_state(self):
+        """
+        Returns the halt state
+        """
+        return self._definition.halt_state
+
+    def get_initial_state(self):
+        """
+        Returns the initial state
+        """
+        return self._definition.init_state
+
+    def get_num_tapes(self):
+        """
+        Returns the number of tapes
+        """
+        return self._definition.num_tapes
+
+    def get_definition(self):
+        """Returns the MultiTapeDefinition run by this machine"""
+        return self._definition
+
+    def get_symbol_at(self, pos, tape=0):
+        """
+        Returns the symbol at the specified position of the given tape
+        """
+        return self._table.symbols[self._get_tape(tape).get(pos)]
+
+    def get_head_position(self, tape=0):
+        """
+        Returns the current head position of the given tape
+        """
+        return self._get_tape(tape).position()
+
+    def get_tape_iterator(self, tape=0):
+        """Returns an iterator of the given tape"""
+        return map(self._table.symbols.__getitem__, self._get_tape(tape))
+
+    def get_executed_steps_counter(self):
+        """
+        Return the amount of steps executed until the creation of the machine
+        or the last call to reset_executed_steps_counter()
+        """
+        return self._num_executed_steps
+
+    def is_at_halt_state(self):
+        """
+        Returns true only if current state is the halt state
+        """
+        return self._cur_state == self._definition.halt_state
+
+    def is_at_final_state(self):
+        """
+        Returns true only if current state is a final state
+        """
+        return self._cur_state in self._definition.final_states
+
+    def is_tape_set(self):
+        """
+        Returns true only if the tapes are set
+        """
+        return self._tapes is not None
+
+    def is_word_accepted(self, word, max_steps=None):
+        """Tests if the given word is accepted by this turing machine.
+
+        :param word: An iterable str/list/tuple/... of symbols.
+        :param max_steps: Limit of steps to test if the word is accepted.
+
+        :return: True if accepted, False otherwise.
+        """
+        old_tapes = self._tapes
+        old_state = self._cur_state
+
+        self.set_tape(word)
+        self.run(max_steps)
+        accepted = self.is_at_final_state()
+
+        self._tapes = old_tapes
+        self._cur_state = old_state
+
+        return accepted
+
+    def set_tape(self, tape, head_pos=0):
+        """Sets the contents of the first tape and blanks the others.
+
+        :raise InvalidSymbolException: if tape contains an invalid symbol.
+        """
+        num_tapes = self._definition.num_tapes
+        self.set_tapes([tape] + [()] * (num_tapes - 1), [head_pos])
+
+    def set_tapes(self, tapes, head_positions=()):
+        """Sets the contents of all the tapes.
+
+        :param tapes: Iterable with the symbols of each tape.
+        :param head_positions: Head position of each tape, 0 for the missing
+            ones.
+
+        :raise InvalidSymbolException: if a tape contains an invalid symbol.
+        """
+        num_tapes = self._definition.num_tapes
+        tapes = list(tapes)
+        if len(tapes) != num_tapes:
+            raise Exception("Expected %d tapes, got %d" % (num_tapes, len(tapes)))
+        head_positions = list(head_positions)
+        head_positions += [0] * (num_tapes - len(head_positions))
+
+        symbol_ids = self._table.symbol_ids
+        try:
+            self._tapes = [
+                Tape(map(symbol_ids.__getitem__, tape), head_pos)
+                for tape, head_pos in zip(tapes, head_positions)
+            ]
+        except KeyError as e:
+            raise InvalidSymbolException("Invalid tape symbol " + str(e.args[0]))
+
+    def set_at_initial_state(self):
+        """Forces the machine state to be the initial state."""
+        self._cur_state = self._definition.init_state
+
+    def reset_executed_steps_counter(self):
+        """Set the executed steps counter to 0"""
+        self._num_executed_steps = 0
+
+    def _get_tape(self, tape):
+        if self._tapes is None:
+            raise TapeNotSetException("Tape must be set before reading it")
+        return self._tapes[tape]
+
+    def _run_compiled(self, max_steps):
+        """Runs the machine on the integer transition table."""
+        if self.is_at_halt_state():
+            return engine.EXIT_HALT
+        if self._tapes is None:
+            raise TapeNotSetException("Tape must be set before perform an step")
+
+        table = self._table
+        exit_code, base, steps = engine.run_multitape(
+            table, self._tapes, table.state_base(self._cur_state), max_steps
+        )
+        self._cur_state = table.state_at(base)
+        self._num_executed_steps += steps
+        return exit_code
+
+    def __str__(self):
+        return str(self._definition)
+
+
+class MultiTapeDefinition(MachineDefinition):
+    """
+    Immutable definition of a multi-tape turing machine, a MachineDefinition
+    whose transitions have a symbol and a movement for each one of its
+    num_tapes tapes and whose table is a utm.tm.engine.MultiTapeTable.
+
+    The analysis and from_table() of MachineDefinition are only available for
+    single tape definitions.
+    """
+
+    __slots__ = ("num_tapes",)
+
+    def __init__(
+        self,
+        states,
+        in_alphabet,
+        tape_alphabet,
+        trans_function,
+        init_state,
+        final_states,
+        halt_state,
+        blank_sym,
+        num_tapes=None,
+    ):
+        """
+        MultiTapeDefinition(states, in_alphabet, tape_alphabet,
+                            trans_function, istate, fstates, hstate, blank,
+                            num_tapes=None)
+
+        The arguments are the same as the ones of MultiTapeTuringMachine.
+        """
+        trans_function = dict(trans_function)
+        if num_tapes is None:
+            if not trans_function:
+                raise Exception("The number of tapes is required without transitions")
+            num_tapes = len(next(iter(trans_function))[1])
+        object.__setattr__(self, "num_tapes", num_tapes)
+
+        super().__init__(
+            states,
+            in_alphabet,
+            tape_alphabet,
+            trans_function,
+            init_state,
+            final_states,
+            halt_state,
+            blank_sym,
+        )
+
+    def __reduce__(self):
+        _, args = super().__reduce__()
+        return MultiTapeDefinition, args + (self.num_tapes,)
+
+    def _compile(self, trans_function):
+        return engine.MultiTapeTable(
+            self.states,
+            self.tape_alphabet,
+            trans_function,
+            self.halt_state,
+            self.blank_sym,
+            TuringMachine.HEAD_DISPLACEMENTS,
+            self.num_tapes,
+        )
+
+    def _check_data(self):
+        """
+        Checks the same conditions as MachineDefinition and that the halt
+        state is a valid state, raising an exception if one of them fails
+        """
+        if self.halt_state not in self.states:
+            raise Exception("Halt state is not a valid state")
+        super()._check_data()
+
+    def _check_transitions(self):
+        """
+        Checks that every transition has the format described in
+        MultiTapeTuringMachine, raising an exception if one of them fails
+        """
+        k = self.num_tapes
+        for key, v in self._trans_function.items():
+            if (
+                len(key) != 2
+                or len(v) != 3
+                or len(key[1]) != k
+                or len(v[1]) != k
+                or len(v[2]) != k
+            ):
+                raise Exception(
+                    "Invalid format in transition %s -> %s" % (str(key), str(v))
+                )
+            if key[0] not in self.states or v[0] not in self.states:
+                raise Exception("Invalid state in transition %s -> %s" % (key, v))
+            if not self.tape_alphabet.issuperset(key[1] + v[1]):
+                raise Exception("Invalid symbol in transition %s -> %s" % (key, v))
+            if not TuringMachine.HEAD_MOVEMENTS.issuperset(v[2]):
+                raise Exception("Invalid movement in transition %s -> %s" % (key, v))
+
+    def __str__(self):
+        return "Tapes: %d\n%s" % (self.num_tapes, super().__str__())
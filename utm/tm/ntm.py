@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+
+import os
+from collections import namedtuple
+
+from utm.tm import engine
+from utm.tm.exceptions import InvalidSymbolException
+from utm.tm.tm import TuringMachine
+
+
+SearchResult = namedtuple(
+    "SearchResult",
+    ("accepted", "exit_code", "steps", "configurations", "state", "tape"),
+)
+SearchResult.__doc__ = """Result of exploring the configurations of a word.
+
+    - accepted: True if some branch stops at a final state
+    - exit_code: EXIT_HALT if the search ended (a branch was accepted or all
+      of them stopped), EXIT_MAX_STEPS or EXIT_MEMORY_LIMIT otherwise
+    - steps: Depth reached, the steps of the accepting branch if accepted
+    - configurations: Number of distinct configurations found
+    - state: State of the accepting branch, None if not accepted
+    - tape: List with the tape symbols of the accepting branch, None if not
+      accepted
+"""
+
+
+class NondeterministicTuringMachine:
+    """
+    Turing machine with any number of transitions for each (state, symbol).
+
+    The transition function is a dictionary with the following format:
+                (state, symbol) : iterable of (state, symbol, movement)
+
+    A word is accepted if some branch of computation stops at a final state,
+    that is, it reaches the halt state or a (state, symbol) pair without
+    transitions while at a final state, as TuringMachine.is_word_accepted()
+    does for a single branch.
+
+    The configuration tree is explored breadth-first. Configurations are
+    deduplicated, two branches that reach the same state and tape contents
+    (maybe translated along the tape) continue as one, so branches that
+    loop are dropped as soon as they repeat a configuration.
+    """
+
+    # explore() return values
+    EXIT_HALT = engine.EXIT_HALT
+    EXIT_MAX_STEPS = engine.EXIT_MAX_STEPS
+    EXIT_MEMORY_LIMIT = 4
+
+    # Default memory budget of explore() and estimated bytes used by each
+    # configuration besides its tape cells
+    DEFAULT_MEMORY_LIMIT = 1 << 30
+    CONFIGURATION_BYTES = 200
+
+    # Minimum number of configurations of a level to spread its expansion
+    # over the process pool
+    PARALLEL_MIN_CONFIGURATIONS = 4096
+
+    def __init__(
+        self,
+        states,
+        in_alphabet,
+        tape_alphabet,
+        trans_function,
+        init_state,
+        final_states,
+        halt_state,
+        blank_sym,
+    ):
+        """
+        NondeterministicTuringMachine(states, in_alphabet, tape_alphabet,
+                                      trans_function, istate, fstates, hstate,
+                                      blank)
+
+        The arguments are the same as the ones of TuringMachine but every
+        value of trans_function is an iterable of (state, symbol, movement).
+        """
+        self._states = frozenset(states)
+        self._in_alphabet = frozenset(in_alphabet)
+        self._tape_alphabet = frozenset(tape_alphabet)
+        self._trans_function = {k: frozenset(v) for k, v in trans_function.items()}
+        self._init_state = init_state
+        self._final_states = frozenset(final_states)
+        self._halt_state = halt_state
+        self._blank_sym = blank_sym
+
+        self._check_data()
+
+        # The table interns the states and symbols, the transitions of each
+        # table index are kept apart as tuples (state base, write, move)
+        self._table = table = engine.TransitionTable(
+            self._states,
+            self._tape_alphabet,
+            {},
+            halt_state,
+            blank_sym,
+            TuringMachine.HEAD_DISPLACEMENTS,
+        )
+        self._options = [()] * len(table.next_state)
+        for (state, symbol), targets in self._trans_function.items():
+            i = table.state_base(state) + table.symbol_ids[symbol]
+            self._options[i] = tuple(
+                sorted(
+                    (
+                        table.state_base(new_state),
+                        table.symbol_ids[new_symbol],
+                        TuringMachine.HEAD_DISPLACEMENTS[movement],
+                    )
+                    for new_state, new_symbol, movement in targets
+                )
+            )
+        self._final_bases = frozenset(table.state_base(s) for s in self._final_states)
+
+    def explore(self, word, head_pos=0, max_steps=None, memory_limit=None, workers=1):
+        """Explores breadth-first the configurations reachable from word.
+
+        :param word: Iterable of symbols with the initial tape contents.
+        :param head_pos: Initial head position.
+        :param max_steps: Maximum depth of the exploration, no limit if None
+            or 0 (as in TuringMachine.run()).
+        :param memory_limit: Approximate number of bytes that the explored
+            configurations can take, DEFAULT_MEMORY_LIMIT if None.
+        :param workers: Number of worker processes that expand the big levels
+            of the tree, os.cpu_count() if None. With 1 the whole exploration
+            runs on the calling process.
+
+        :return: SearchResult
+
+        :raise InvalidSymbolException: if word contains an invalid symbol.
+        """
+        table = self._table
+        try:
+            cells = [table.symbol_ids[s] for s in word]
+        except KeyError as e:
+            raise InvalidSymbolException("Invalid tape symbol " + str(e.args[0]))
+
+        cells = bytes(cells) if table.num_symbols <= 0x100 else tuple(cells)
+        start = len(cells) - len(_lstrip(cells))
+        cells = _rstrip(cells[start:])
+        head = head_pos - start if cells else 0
+        conf = (table.state_base(self._init_state), head, cells)
+
+        if memory_limit is None:
+            memory_limit = NondeterministicTuringMachine.DEFAULT_MEMORY_LIMIT
+        if workers is None:
+            workers = os.cpu_count() or 1
+        conf_bytes = NondeterministicTuringMachine.CONFIGURATION_BYTES
+        min_parallel = NondeterministicTuringMachine.PARALLEL_MIN_CONFIGURATIONS
+        expansion = (self._options, table.halt_base, self._final_bases)
+
+        frontier = [conf]
+        seen = {conf}
+        used = len(cells) + conf_bytes
+        steps = 0
+        pool = None
+        try:
+            while True:
+                if workers > 1 and len(frontier) >= min_parallel:
+                    if pool is None:
+                        import multiprocessing
+
+                        pool = multiprocessing.Pool(workers, _init_worker, (expansion,))
+                    n = -(-len(frontier) // (workers * 4))
+                    parts = pool.map(
+                        _expand_chunk,
+                        [frontier[i : i + n] for i in range(0, len(frontier), n)],
+                    )
+                else:
+                    parts = [_expand(expansion, frontier)]
+
+                successors = []
+                for accepted, confs in parts:
+                    if accepted is not None:
+                        return self._result(True, steps, len(seen), accepted)
+                    successors.extend(confs)
+
+                if not successors:
+                    return self._result(False, steps, len(seen), None)
+                if max_steps and steps == max_steps:
+                    return self._result(
+                        False, steps, len(seen), None, engine.EXIT_MAX_STEPS
+                    )
+
+                frontier = []
+                for conf in successors:
+                    if conf not in seen:
+                        seen.add(conf)
+                        frontier.append(conf)
+                        used += len(conf[2]) + conf_bytes
+                steps += 1
+
+                if not frontier:
+                    return self._result(False, steps, len(seen), None)
+                if used > memory_limit:
+                    return self._result(
+                        False,
+                        steps,
+                        len(seen),
+                        None,
+                        NondeterministicTuringMachine.EXIT_MEMORY_LIMIT,
+                    )
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    def is_word_accepted(self, word, max_steps=None):
+        """Tests if some branch of computation accepts the given word.
+
+        :param word: An iterable str/list/tuple/... of symbols.
+        :param max_steps: Maximum depth of the exploration, no limit if None
+            or 0.
+
+        :return: True if accepted, False otherwise (also when max_steps or the
+            memory budget is reached before finding an accepting branch).
+        """
+        return self.explore(word, max_steps=max_steps).accepted
+
+    def get_blank_symbol(self):
+        """
+        Returns the blank symbol
+        """
+        return self._blank_sym
+
+    def get_halt_state(self):
+        """
+        Returns the halt state
+        """
+        return self._halt_state
+
+    def get_initial_state(self):
+        """
+        Returns the initial state
+        """
+        return self._init_state
+
+    def _result(self, accepted, steps, configurations, conf, exit_code=EXIT_HALT):
+        state = tape = None
+        if conf is not None:
+            table = self._table
+            state = table.state_at(conf[0])
+            tape = [table.symbols[c] for c in conf[2]]
+        return SearchResult(accepted, exit_code, steps, configurations, state, tape)
+
+    def _check_data(self):
+        """
+        Checks the same conditions as MachineDefinition does for a
+        deterministic machine, raising an exception if one of them fails
+        """
+        if not self._in_alphabet.issubset(self._tape_alphabet):
+            raise Exception("Input alphabet is not subset of tape alphabet")
+
+        if self._blank_sym not in self._tape_alphabet:
+            raise Exception("Blank symbol is not into the tape alphabet")
+
+        if self._init_state not in self._states:
+            raise Exception("Initial state is not a valid state")
+
+        if not self._final_states.issubset(self._states):
+            raise Exception("Final states are not a subset of states")
+
+        if self._halt_state not in self._states:
+            raise Exception("Halt state is not a valid state")
+
+        for k, targets in self._trans_function.items():
+            for v in targets:
+                if len(k) != 2 or len(v) != 3:
+                    raise Exception(
+                        "Invalid format in transition %s -> %s" % (str(k), str(v))
+                    )
+                if k[0] not in self._states or v[0] not in self._states:
+                    raise Exception("Invalid state in transition %s -> %s" % (k, v))
+                if k[1] not in self._tape_alphabet or v[1] not in self._tape_alphabet:
+                    raise Exception("Invalid symbol in transition %s -> %s" % (k, v))
+                if v[2] not in TuringMachine.HEAD_MOVEMENTS:
+                    raise Exception(
+                        "Invalid movement %s in transition %s -> %s" % (v[2], k, v)
+                    )
+
+    def __str__(self):
+        return (
+            "States: %s\n"
+            "Input alphabet: %s\n"
+            "Tape alphabet: %s\n"
+            "Blank symbol: %s\n"
+            "Initial state: %s\n"
+            "Final states: %s\n"
+            "Halt state: %s\n\n"
+            "Transition Function:\n%s"
+            % (
+                str(self._states),
+                str(self._in_alphabet),
+                str(self._tape_alphabet),
+                str(self._blank_sym),
+                str(self._init_state),
+                str(self._final_states),
+                str(self._halt_state),
+                str(self._trans_function),
+            )
+        )
+
+
+# Configurations
+##############################################################################
+#
+# A configuration is a tuple (state base, head, cells) where cells are the
+# tape cells between the first and the last non-blank ones (bytes, or a
+# tuple for alphabets of more than 256 symbols) and head is relative to the
+# first of them, it can be out of cells when the head is on a blank. The
+# head of an all-blank tape is always 0. Equal tuples are equal
+# configurations, even if they are translated along the tape.
+
+
+def _expand(expansion, configurations):
+    """Returns the successors of the given configurations.
+
+    :return: Tuple (accepting configuration or None, list of successors).
+    """
+    options, halt, final_bases = expansion
+    successors = []
+    append = successors.append
+    for conf in configurations:
+        base, head, cells = conf
+        if base == halt:
+            targets = ()
+        else:
+            targets = options[base + (cells[head] if 0 <= head < len(cells) else 0)]
+
+        if not targets:
+            # The branch stops here
+            if base in final_bases:
+                return conf, successors
+            continue
+
+        for target in targets:
+            append(_successor(conf, target))
+    return None, successors
+
+
+def _successor(conf, target):
+    """Returns the configuration after applying a transition"""
+    _, head, cells = conf
+    new_base, write, move = target
+    n = len(cells)
+    if 0 <= head < n:
+        cells = cells[:head] + _cells(cells, write, 1) + cells[head + 1 :]
+        if write == 0 and (head == 0 or head == n - 1):
+            stripped = _lstrip(cells)
+            head -= len(cells) - len(stripped)
+            cells = _rstrip(stripped)
+    elif write != 0:
+        if not cells:
+            cells = _cells(cells, write, 1)
+            head = 0
+        elif head < 0:
+            cells = _cells(cells, write, 1) + _cells(cells, 0, -head - 1) + cells
+            head = 0
+        else:
+            cells = cells + _cells(cells, 0, head - n) + _cells(cells, write, 1)
+    return new_base, head + move if cells else 0, cells
+
+
+def _cells(like, sym, n):
+    """Returns n cells with the given symbol of the same type as like"""
+    if type(like) is bytes:
+        return bytes((sym,)) * n
+    return (sym,) * n
+
+
+def _lstrip(cells):
+    """Removes the leading blank cells"""
+    if type(cells) is bytes:
+        return cells.lstrip(b"\0")
+    i = 0
+    while i < len(cells) and cells[i] == 0:
+        i += 1
+    return cells[i:]
+
+
+def _rstrip(cells):
+    """Removes the trailing blank cells"""
+    if type(cells) is bytes:
+        return cells.rstrip(b"\0")
+    i = len(cells)
+    while i > 0 and cells[i - 1] == 0:
+        i -= 1
+    return cells[:i]
+
+
+# Worker process state
+##############################################################################
+
+_worker_expansion = None
+
+
+def _init_worker(expansion):
+    global _worker_expansion
+    _worker_expansion = expansion
+
+
+def _expand_chunk(configurations):
+    return _expand(_worker_expansion, configurations)
@@ -13,17 +13,25 @@ _MOVE_RIGHT = ">"
 _MOVE_LEFT = "<"
 _NON_MOVEMENT = "_"
 
-_COMMENT_RE = re.compile(r"[ ]*%\s*")
-_HALT_RE = re.compile(r"[ ]*HALT[ ]+(?P<state>\w+)\s*$")
-_INIT_RE = re.compile(r"[ ]*INITIAL[ ]+(?P<state>\w)\s*$")
-_FINAL_RE = re.compile(r"[ ]*FINAL[ ]+(?P<state>\w+)\s*$")
-
-_BLANK_SYM_RE = re.compile(r"[\s]*BLANK[\s]+(?P<symbol>.)\s*$")
-
-_TRANSITION_RE = re.compile(
+_MOVEMENTS = {
+    _MOVE_LEFT: TuringMachine.MOVE_LEFT,
+    _MOVE_RIGHT: TuringMachine.MOVE_RIGHT,
+    _NON_MOVEMENT: TuringMachine.NON_MOVEMENT,
+}
+
+# All the line patterns in a single regular expression, the alternatives are
+# tried in order and the last group of each one tells which one matched
+_LINE_RE = re.compile(
     r"\s*(?P<state>\w+)\s*,\s*(?P<symbol>.)\s*->\s*(?P<new_state>\w+)\s*"
     r",\s*(?P<new_symbol>.)\s*,\s*(?P<movement>[%s%s%s])\s*$"
-    % (_MOVE_LEFT, _MOVE_RIGHT, _NON_MOVEMENT)
+    r"|\s*(?P<mt_state>\w+)\s*,\s*\((?P<symbols>[^()]*)\)\s*->\s*"
+    r"(?P<mt_new_state>\w+)\s*,\s*\((?P<new_symbols>[^()]*)\)\s*"
+    r",\s*\((?P<movements>[^()]*)\)\s*$"
+    r"|(?P<comment>[ ]*%%)"
+    r"|[ ]*FINAL[ ]+(?P<final_state>\w+)\s*$"
+    r"|[ ]*INITIAL[ ]+(?P<initial_state>\w)\s*$"
+    r"|[\s]*BLANK[\s]+(?P<blank_symbol>.)\s*$"
+    r"|[ ]*HALT[ ]+(?P<halt_state>\w+)\s*$" % (_MOVE_LEFT, _MOVE_RIGHT, _NON_MOVEMENT)
 )
 
 
@@ -43,17 +51,41 @@ class TuringMachineParser:
         -   final state: 'FINAL <state>'
         -    halt state: 'HALT <state>'
         -    transition: '<state>, <symbol> -> <new_state>, <new_symbol>, <movement>
+        - multi-tape transition:
+            '<state>, (<symbol>, ...) -> <new_state>, (<new_symbol>, ...),
+             (<movement>, ...)'
+          with a symbol and a movement for each tape, in tape order. The
+          symbols of the tuples can not be ',', '(' nor ')'
 
     It is not possible to add comments at the end of any line, comments must
     be on a standalone line
+
+    Besides parsing whole strings and files the parser can keep a document
+    up to date line by line, see update_lines(). It remembers what each line
+    added to the builder so changing a line only undoes that and applies the
+    new contents.
+
+    A nondeterministic parser keeps every transition of a (state, symbol)
+    pair and creates a NondeterministicTuringMachine.
     """
 
-    def __init__(self):
-        self._builder = TuringMachineBuilder()
+    def __init__(self, nondeterministic=False):
+        self._builder = TuringMachineBuilder(nondeterministic)
+        # Lines given to update_lines() and the entry parsed from each one
+        self._lines = []
+        self._entries = []
+        # Number of lines with each transition key or unique directive and
+        # number of lines with errors
+        self._key_lines = {}
+        self._num_errors = 0
 
     def clean(self):
         """Cleans all the previous parsed data"""
         self._builder.clean()
+        self._lines = []
+        self._entries = []
+        self._key_lines = {}
+        self._num_errors = 0
 
     def parse_string(self, text):
         """Parses the given string an adds the information to the Turing
@@ -67,115 +99,323 @@ class TuringMachineParser:
 
         self._parse(text.splitlines())
 
+    def parse_file(self, path):
+        """Parses the given file, reading it line by line, and adds the
+        information to the Turing Machine builder
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            self._parse(f)
+
     def parse_line(self, line):
         """Parse the given line"""
-        parsers = map(lambda f: f(self._builder, line), _PARSE_FUNCTIONS)
-        if not any(parsers):
+        m = _LINE_RE.match(line)
+        if m is None:
             raise Exception("Unrecognized pattern: %s" % line)
+        _PARSE_FUNCTIONS[m.lastgroup](self._builder, m)
+
+    def update_lines(self, first, removed, lines):
+        """Replaces lines of the document kept by the parser.
+
+        The removed lines starting at index first (0 based) are replaced by
+        the given ones, only the lines that actually differ are parsed and
+        applied to the builder. Lines with errors do not raise, they are
+        reported by get_errors() and create().
+
+        e.g. after update_lines(0, 0, text.splitlines()) the parser holds the
+        same machine as after parse_string(text)
+        """
+        if first < 0 or removed < 0 or first + removed > len(self._lines):
+            raise IndexError("Lines out of range")
+
+        # Skip the lines that did not change at both ends
+        lines = list(lines)
+        old = self._lines
+        n = 0
+        while n < min(removed, len(lines)) and old[first + n] == lines[n]:
+            n += 1
+        first, removed, lines = first + n, removed - n, lines[n:]
+        n = 0
+        while (
+            n < min(removed, len(lines))
+            and old[first + removed - n - 1] == lines[-n - 1]
+        ):
+            n += 1
+        removed, lines = removed - n, lines[: len(lines) - n]
+
+        new_entries = [_parse_entry(line.strip()) for line in lines]
+        old_entries = self._entries[first : first + removed]
+        self._lines[first : first + removed] = lines
+        self._entries[first : first + removed] = new_entries
+
+        # Transition keys and unique directives whose lines changed, with the
+        # value of their last new line if there is one
+        changed = {}
+        for entry in old_entries:
+            if entry is not None:
+                self._count(entry, -1, changed)
+        for entry in new_entries:
+            if entry is not None:
+                self._count(entry, 1, changed)
+        for key, value in changed.items():
+            self._update_key(key, value)
+
+    def get_line_count(self):
+        """Returns the number of lines given to update_lines()"""
+        return len(self._lines)
+
+    def get_errors(self):
+        """Returns the errors of the lines given to update_lines().
+
+        :return: List of tuples (line number, message), sorted by line. Line
+            numbers start at 1.
+        """
+        duplicated = any(self._key_lines.get(k, 0) > 1 for k in _UNIQUE_DIRECTIVES)
+        if not self._num_errors and not duplicated:
+            return []
+
+        errors = []
+        seen = set()
+        for i, entry in enumerate(self._entries, start=1):
+            if entry is None:
+                continue
+            kind, value = entry
+            if kind is _ERROR:
+                errors.append((i, value))
+            elif kind in _UNIQUE_DIRECTIVES:
+                if kind in seen:
+                    errors.append((i, _UNIQUE_DIRECTIVES[kind][2]))
+                seen.add(kind)
+        return errors
 
     def create(self):
         """Attempts to create a Turing Machine with the data parsed before the
         call to this function
 
         Can raise any of the TuringMachineBuilder an TuringMachine exceptions
+        and the first error of the lines given to update_lines()
         """
+        errors = self.get_errors()
+        if errors:
+            raise Exception("Line %d, %s" % errors[0])
         return self._builder.create()
 
-    def _parse(self, parse_data):
-        reader = ((i, l.strip()) for i, l in enumerate(parse_data, start=1))
-        reader = ((i, l) for i, l in reader if l)
+    def _parse(self, lines):
+        parse_line = self.parse_line
+        for i, line in enumerate(lines, start=1):
+            line = line.strip()
+            if line:
+                try:
+                    parse_line(line)
+                except Exception as e:
+                    raise Exception("Line %d, %s" % (i, str(e)))
+
+    def _count(self, entry, delta, changed):
+        """Adds (delta 1) or removes (delta -1) the line entry.
+
+        Final states and errors are updated right away, the changed keys are
+        updated by _update_key() once all the lines have been counted.
+        """
+        kind, value = entry
+        if kind is _TRANSITION:
+            key = value if self._builder.is_nondeterministic() else value[:2]
+        elif kind is _ERROR:
+            self._num_errors += delta
+            return
+        elif kind == "final_state":
+            if delta > 0:
+                self._builder.add_final_state(value)
+            else:
+                self._builder.remove_final_state(value)
+            return
+        else:
+            key = kind
+
+        self._key_lines[key] = self._key_lines.get(key, 0) + delta
+        changed[key] = value if delta > 0 else changed.get(key)
+
+    def _update_key(self, key, value):
+        """Applies to the builder the lines with the given key."""
+        num_lines = self._key_lines.get(key, 0)
+        if not num_lines:
+            self._key_lines.pop(key, None)
+            if key in _UNIQUE_DIRECTIVES:
+                _UNIQUE_DIRECTIVES[key][1](self._builder)
+            else:
+                self._builder.remove_transition(*key)
+            return
+
+        if key in _UNIQUE_DIRECTIVES:
+            if num_lines > 1 or value is None:
+                value = self._find_winner(key)
+            _UNIQUE_DIRECTIVES[key][0](self._builder, value)
+        elif self._builder.is_nondeterministic():
+            self._builder.add_transition(*key)
+        else:
+            # The builder keeps the symbols of replaced transitions, so every
+            # line of the pair is added again in order, as parse_string() does
+            self._builder.remove_transition(*key)
+            if num_lines > 1 or value is None:
+                values = self._key_values(key)
+            else:
+                values = (value,)
+            for value in values:
+                self._builder.add_transition(*value)
+
+    def _find_winner(self, key):
+        """Returns the value of the first line of the given unique directive,
+        the rest of its lines are errors.
+        """
+        return next(e[1] for e in self._entries if e is not None and e[0] == key)
 
-        for i, l in reader:
-            try:
-                self.parse_line(l)
-            except Exception as e:
-                raise Exception("Line %d, %s" % (i, str(e)))
+    def _key_values(self, key):
+        """Returns the transitions of the lines with the given (state, symbol)
+        key in document order, the last one wins as when it is parsed from a
+        string.
+        """
+        return [
+            e[1]
+            for e in self._entries
+            if e is not None and e[0] is _TRANSITION and e[1][:2] == key
+        ]
 
 
 # Parsing utilities
 ##############################################################################
 
 
-def _parse_comment(_, line):
-    return True if _COMMENT_RE.match(line) else False
+# Each function receives the builder and the match of a line pattern
 
 
-def _parse_blank_symbol(builder, line):
-    m = _BLANK_SYM_RE.match(line)
-    if m:
-        if builder.has_blank_symbol():
-            raise Exception("Blank symbol can only be defined once")
+def _parse_comment(_, m):
+    pass
 
-        builder.set_blank_symbol(m.group("symbol"))
-        return True
 
-    return False
+def _parse_blank_symbol(builder, m):
+    if builder.has_blank_symbol():
+        raise Exception(_UNIQUE_DIRECTIVES["blank_symbol"][2])
 
+    builder.set_blank_symbol(m.group("blank_symbol"))
 
-def _parse_halt_state(builder, line):
-    m = _HALT_RE.match(line)
-    if m:
-        if builder.has_halt_state():
-            raise Exception("Halt state can only be defined once")
 
-        builder.set_halt_state(m.group("state"))
-        return True
+def _parse_halt_state(builder, m):
+    if builder.has_halt_state():
+        raise Exception(_UNIQUE_DIRECTIVES["halt_state"][2])
 
-    return False
+    builder.set_halt_state(m.group("halt_state"))
 
 
-def _parse_final_state(builder, line):
-    m = _FINAL_RE.match(line)
-    if m:
-        builder.add_final_state(m.group("state"))
-        return True
+def _parse_final_state(builder, m):
+    builder.add_final_state(m.group("final_state"))
 
-    return False
 
+def _parse_initial_state(builder, m):
+    if builder.has_initial_state():
+        raise Exception(_UNIQUE_DIRECTIVES["initial_state"][2])
 
-def _parse_initial_state(builder, line):
-    m = _INIT_RE.match(line)
-    if m:
-        if builder.has_initial_state():
-            raise Exception("Initial state can only be defined once")
+    builder.set_initial_state(m.group("initial_state"))
 
-        builder.set_initial_state(m.group("state"))
-        return True
 
-    return False
+def _parse_multitape_transition(builder, m):
+    builder.add_transition(*_multitape_transition(m))
 
 
-def _parse_transition(builder, line):
-    m = _TRANSITION_RE.match(line)
-    if m:
-        move_sym, move = m.group("movement"), None
-        if move_sym == _MOVE_LEFT:
-            move = TuringMachine.MOVE_LEFT
-        elif move_sym == _MOVE_RIGHT:
-            move = TuringMachine.MOVE_RIGHT
-        elif move_sym == _NON_MOVEMENT:
-            move = TuringMachine.NON_MOVEMENT
+def _multitape_transition(m):
+    """Returns the add_transition() arguments of a multi-tape transition.
 
-        if move is None:
-            raise Exception("Unknown movement %s" % move_sym)
+    Single item tuples are unwrapped, so a transition of a single tape has
+    the same arguments whether it is written with tuples or not.
+    """
+    symbols, new_symbols, movements = (
+        tuple(item.strip() for item in m.group(name).split(","))
+        for name in ("symbols", "new_symbols", "movements")
+    )
+    if not len(symbols) == len(new_symbols) == len(movements):
+        raise Exception("Transition tuples must have one item per tape")
+    for item in symbols + new_symbols:
+        if len(item) != 1:
+            raise Exception("Invalid tuple symbol '%s'" % item)
+    for item in movements:
+        if item not in _MOVEMENTS:
+            raise Exception("Invalid tuple movement '%s'" % item)
+
+    movements = tuple(_MOVEMENTS[item] for item in movements)
+    if len(symbols) == 1:
+        symbols, new_symbols, movements = symbols[0], new_symbols[0], movements[0]
+    return m.group("mt_state"), symbols, m.group("mt_new_state"), new_symbols, movements
+
+
+def _parse_transition(builder, m):
+    state, symbol, new_state, new_symbol, move_sym = m.group(
+        "state", "symbol", "new_state", "new_symbol", "movement"
+    )
+    builder.add_transition(state, symbol, new_state, new_symbol, _MOVEMENTS[move_sym])
+
+
+# Parse function of each line pattern, by the name of its last group
+_PARSE_FUNCTIONS = {
+    "movement": _parse_transition,
+    "movements": _parse_multitape_transition,
+    "comment": _parse_comment,
+    "final_state": _parse_final_state,
+    "initial_state": _parse_initial_state,
+    "blank_symbol": _parse_blank_symbol,
+    "halt_state": _parse_halt_state,
+}
+
+
+# Incremental parsing
+##############################################################################
 
-        builder.add_transition(
-            m.group("state"),
-            m.group("symbol"),
-            m.group("new_state"),
-            m.group("new_symbol"),
-            move,
+# Kinds of line entries besides the names of the directive groups
+_TRANSITION = "transition"
+_ERROR = "error"
+
+# Builder setter, builder unsetter and duplicate error of each directive
+# that can only appear once
+_UNIQUE_DIRECTIVES = {
+    "blank_symbol": (
+        TuringMachineBuilder.set_blank_symbol,
+        TuringMachineBuilder.unset_blank_symbol,
+        "Blank symbol can only be defined once",
+    ),
+    "halt_state": (
+        TuringMachineBuilder.set_halt_state,
+        TuringMachineBuilder.unset_halt_state,
+        "Halt state can only be defined once",
+    ),
+    "initial_state": (
+        TuringMachineBuilder.set_initial_state,
+        TuringMachineBuilder.unset_initial_state,
+        "Initial state can only be defined once",
+    ),
+}
+
+
+def _parse_entry(line):
+    """Returns the entry (kind, value) of a stripped line.
+
+    The value of a transition is the tuple of arguments of
+    TuringMachineBuilder.add_transition(), empty and comment lines have no
+    entry (None) and lines that do not match any pattern have an error entry
+    whose value is the message.
+    """
+    if not line:
+        return None
+    m = _LINE_RE.match(line)
+    if m is None:
+        return _ERROR, "Unrecognized pattern: %s" % line
+
+    kind = m.lastgroup
+    if kind == "movement":
+        state, symbol, new_state, new_symbol, move_sym = m.group(
+            "state", "symbol", "new_state", "new_symbol", "movement"
         )
-        return True
-
-    return False
-
-
-_PARSE_FUNCTIONS = (
-    _parse_transition,
-    _parse_comment,
-    _parse_final_state,
-    _parse_initial_state,
-    _parse_blank_symbol,
-    _parse_halt_state,
-)
+        return _TRANSITION, (state, symbol, new_state, new_symbol, _MOVEMENTS[move_sym])
+    if kind == "movements":
+        try:
+            return _TRANSITION, _multitape_transition(m)
+        except Exception as e:
+            return _ERROR, str(e)
+    if kind == "comment":
+        return None
+    return kind, m.group(kind)
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from utm.tm import engine
+
+
+class Profiler:
+    """
+    Collects where a turing machine spends its steps, see
+    TuringMachine.set_profiler().
+
+    While it is set, the runs of the machine count the steps of every
+    (state, symbol) transition, the range of positions reached by the head
+    and the growth events of the tape buffer, and measure the steps per
+    second. The data is accumulated over all the runs until reset().
+
+    Runs are split in chunks of CHUNK_STEPS steps and with sample_every=N
+    only one of every N chunks is profiled, the rest run at full speed. The
+    hits and head range then come from the sampled chunks only and the
+    report estimates the total hits of each transition from its share of
+    the sampled steps. The growth events of the chunks that are not sampled,
+    and of every chunk while the machine has STEPS observers, are recorded
+    at the end of the chunk.
+
+    Positions are relative to the first cell of the tape when it was set.
+    """
+
+    # Steps of each profiling chunk
+    CHUNK_STEPS = 1 << 16
+
+    def __init__(self, sample_every=1):
+        """
+        Profiler(sample_every=1)
+
+            - sample_every:
+                Profile one of every sample_every chunks of steps
+        """
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self._sample_every = sample_every
+        self.reset()
+
+    def reset(self):
+        """Discards all the collected data"""
+        self._table = None
+        self._hits = None
+        self._head_range = None
+        self._growths = []
+        self._chunks = 0
+        self._steps = 0
+        self._sampled_steps = 0
+        self._timed_steps = 0
+        self._elapsed = 0.0
+
+    def get_sample_every(self):
+        """Returns how many chunks there are for each profiled chunk"""
+        return self._sample_every
+
+    def get_steps(self):
+        """Returns the number of steps executed while profiling"""
+        return self._steps
+
+    def get_sampled_steps(self):
+        """Returns the number of steps whose transitions were counted"""
+        return self._sampled_steps
+
+    def get_steps_per_second(self):
+        """Returns the speed of the profiled runs, None if nothing ran"""
+        if not self._elapsed:
+            return None
+        return self._timed_steps / self._elapsed
+
+    def get_head_range(self):
+        """Returns the (lowest, highest) head positions, None if nothing
+        ran
+        """
+        return self._head_range
+
+    def get_tape_growths(self):
+        """Returns a list of tuples (step, side, size) with the growth events
+        of the tape buffer. Side is "left" or "right" and size the new size
+        of the buffer.
+        """
+        return [
+            (step, "left" if side < 0 else "right", size)
+            for step, side, size in self._growths
+        ]
+
+    def get_transition_hits(self):
+        """Returns a list of tuples (state, symbol, hits) of the executed
+        transitions, sorted from the most executed one.
+        """
+        if self._hits is None:
+            return []
+        table = self._table
+        n = table.num_symbols
+        hot = sorted(
+            ((h, i) for i, h in enumerate(self._hits) if h),
+            key=lambda item: (-item[0], item[1]),
+        )
+        return [(table.state_at(i - i % n), table.symbols[i % n], h) for h, i in hot]
+
+    def get_state_hits(self):
+        """Returns a list of tuples (state, hits) of the states that executed
+        some transition, sorted from the most executed one.
+        """
+        hits = {}
+        for state, _, h in self.get_transition_hits():
+            hits[state] = hits.get(state, 0) + h
+        return sorted(hits.items(), key=lambda item: -item[1])
+
+    def report(self, top=None):
+        """Returns the collected data as a dictionary that can be serialized
+        as JSON, with the top transitions and states (all if None).
+
+        States and symbols are converted to strings. The share of a
+        transition is its fraction of the sampled steps and its estimated
+        hits that share of all the steps.
+        """
+        sampled = self._sampled_steps or 1
+
+        def hot(hits, **keys):
+            return dict(
+                keys,
+                hits=hits,
+                share=hits / sampled,
+                estimated_hits=round(hits * self._steps / sampled),
+            )
+
+        return {
+            "steps": self._steps,
+            "sampled_steps": self._sampled_steps,
+            "sample_every": self._sample_every,
+            "elapsed": self._elapsed,
+            "steps_per_second": self.get_steps_per_second(),
+            "head_range": self._head_range,
+            "tape_growths": [
+                {"step": step, "side": side, "size": size}
+                for step, side, size in self.get_tape_growths()
+            ],
+            "transitions": [
+                hot(h, state=str(state), symbol=str(symbol))
+                for state, symbol, h in self.get_transition_hits()[:top]
+            ],
+            "states": [
+                hot(h, state=str(state)) for state, h in self.get_state_hits()[:top]
+            ],
+        }
+
+    def to_json(self, top=None, **kwargs):
+        """Returns report() as a JSON string, kwargs are passed to
+        json.dumps()
+        """
+        import json
+
+        return json.dumps(self.report(top), **kwargs)
+
+    def format_report(self, top=20):
+        """Returns a text report with the top hot transitions and states"""
+        report = self.report(top)
+        speed = report["steps_per_second"]
+        lines = [
+            "Steps: %d (%d sampled)" % (report["steps"], report["sampled_steps"]),
+            "Steps/s: %s" % ("-" if speed is None else "%.0f" % speed),
+            "Head range: %s" % (report["head_range"],),
+            "Tape growths: %d" % len(report["tape_growths"]),
+            "",
+            "%-16s %-8s %12s %8s" % ("State", "Symbol", "Hits", "Share"),
+        ]
+        for t in report["transitions"]:
+            lines.append(
+                "%-16s %-8s %12d %7.2f%%"
+                % (t["state"], t["symbol"], t["estimated_hits"], 100 * t["share"])
+            )
+        lines += ["", "%-25s %12s %8s" % ("State", "Hits", "Share")]
+        for s in report["states"]:
+            lines.append(
+                "%-25s %12d %7.2f%%"
+                % (s["state"], s["estimated_hits"], 100 * s["share"])
+            )
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.format_report()
+
+    # Collection, called by the machines
+    #
+
+    def _run(self, table, tape, base, max_steps, records=None):
+        """Runs the compiled engine in chunks, profiling the sampled ones.
+
+        :param records: If given, the step records are appended to it as
+            engine.run_recording() does.
+
+        :return: Tuple (exit code, state base, executed steps).
+        """
+        self._bind(table)
+        start_time = time.perf_counter()
+        limit = max_steps if max_steps else -1
+        steps = 0
+        exit_code = engine.EXIT_MAX_STEPS
+
+        while steps != limit:
+            chunk = Profiler.CHUNK_STEPS
+            if limit > 0:
+                chunk = min(chunk, limit - steps)
+            sampled = self._chunks % self._sample_every == 0
+            self._chunks += 1
+            size, origin = len(tape.cells), tape.origin
+
+            if records is not None:
+                first = len(records)
+                pos = tape.head - tape.origin
+                exit_code, base, n = engine.run_recording(
+                    table, tape, base, records, chunk
+                )
+                if sampled and n:
+                    self._add_records(records, first, pos)
+            elif sampled:
+                growths = []
+                exit_code, base, n, head_lo, head_hi = engine.run_profiled(
+                    table, tape, base, self._hits, growths, chunk
+                )
+                if n:
+                    self._add_head_range(head_lo - tape.origin, head_hi - tape.origin)
+                for step, side, new_size in growths:
+                    self._growths.append((self._steps + steps + step, side, new_size))
+                size, origin = len(tape.cells), tape.origin
+            else:
+                exit_code, base, n = engine.run(table, tape, base, chunk)
+
+            steps += n
+            if sampled:
+                self._sampled_steps += n
+            self._add_growths(tape, size, origin, self._steps + steps)
+            if exit_code != engine.EXIT_MAX_STEPS:
+                break
+
+        self._steps += steps
+        self._timed_steps += steps
+        self._elapsed += time.perf_counter() - start_time
+        return exit_code, base, steps
+
+    def _add_step(self, table, i, tape, size, origin, head):
+        """Counts a step executed one at a time, size, origin and head are
+        the ones of the tape before the step.
+        """
+        self._bind(table)
+        self._hits[i] += 1
+        self._steps += 1
+        self._sampled_steps += 1
+        pos = tape.head - tape.origin
+        self._add_head_range(min(pos, head - origin), max(pos, head - origin))
+        self._add_growths(tape, size, origin, self._steps)
+
+    def _bind(self, table):
+        if self._table is None:
+            self._table = table
+            self._hits = [0] * len(table.next_state)
+        elif self._table.next_state is not table.next_state:
+            # Tables with breakpoints share next_state with their definition
+            raise ValueError("The profiler is collecting data of another machine")
+
+    def _add_records(self, records, first, pos):
+        """Counts the steps of records[first:], pos is the head position
+        before them.
+        """
+        hits = self._hits
+        n = self._table.num_symbols
+        lo = hi = pos
+        for k in range(first, len(records), 4):
+            hits[records[k] * n + records[k + 1]] += 1
+            pos += records[k + 3]
+            if pos < lo:
+                lo = pos
+            elif pos > hi:
+                hi = pos
+        self._add_head_range(lo, hi)
+
+    def _add_head_range(self, lo, hi):
+        if self._head_range is not None:
+            lo = min(lo, self._head_range[0])
+            hi = max(hi, self._head_range[1])
+        self._head_range = (lo, hi)
+
+    def _add_growths(self, tape, size, origin, step):
+        """Records the growths of the tape since it had the given size and
+        origin.
+        """
+        if tape.origin != origin:
+            size += tape.origin - origin
+            self._growths.append((step, -1, size))
+        if len(tape.cells) != size:
+            self._growths.append((step, 1, len(tape.cells)))
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+from collections import namedtuple
+
+
+def compact_typecode(num_symbols):
+    """Returns the smallest array typecode able to store num_symbols ids"""
+    if num_symbols <= 0x100:
+        return "B"
+    if num_symbols <= 0x10000:
+        return "H"
+    return "I"
+
+
+TapeSnapshot = namedtuple("TapeSnapshot", ("pages", "start", "end", "head", "typecode"))
+TapeSnapshot.__doc__ = """Persistent copy of a tape, see Tape.snapshot().
+
+    - pages: Dictionary page number -> (position of the first cell, cells)
+    - start, end: Range of used positions
+    - head: Head position
+    - typecode: Typecode of the tape buffer
+
+    Positions are relative to the origin of the tape, which does not move
+    when the buffer grows.
+"""
+
+
+class Tape:
+    """
+    Two-way infinite tape of interned symbol ids (0 is the blank symbol).
+
+    The cells are stored in a buffer with spare blank room on both sides and
+    the head is at cells[head]. cells[lo:hi] is the range visited by the
+    head since the last snapshot (or since the tape was created), which
+    always contains the head, and cells[base_lo:base_hi] is the range used
+    before that snapshot. The used part of the tape is the union of both,
+    all the cells outside of it are blank.
+
+    Moving past the visited range on either side only needs to move a bound.
+    When the buffer itself is exhausted it doubles its size, which makes
+    moves in both directions amortized O(1).
+
+    Positions in the public methods are relative to the first used cell,
+    that is, position 0 is the leftmost used cell.
+
+    By default the buffer is a list, a compact buffer (bytearray or array)
+    can be used instead by giving its typecode, see compact_typecode().
+    """
+
+    __slots__ = (
+        "cells",
+        "head",
+        "lo",
+        "hi",
+        "base_lo",
+        "base_hi",
+        "origin",
+        "pages",
+        "typecode",
+    )
+
+    # Number of cells of each snapshot page
+    SNAPSHOT_PAGE_SIZE = 4096
+
+    def __init__(self, cells, head_pos=0, typecode=None):
+        """
+        Tape(cells, head_pos=0, typecode=None)
+
+            - cells:
+                Iterable with the initial symbol ids
+            - head_pos:
+                Head position relative to the first cell. If it is outside
+                of the given cells the tape is filled with blanks up to it
+            - typecode:
+                None to store the cells in a list, 'B' to store them in a
+                bytearray or any other array typecode to use an array
+        """
+        self.typecode = typecode
+        if typecode is None:
+            self.cells = list(cells)
+        elif typecode == "B":
+            self.cells = bytearray(cells)
+        else:
+            self.cells = array(typecode, cells)
+
+        if head_pos < 0:
+            self.cells[0:0] = self._blanks(-head_pos)
+            head_pos = 0
+        elif head_pos >= len(self.cells):
+            self.cells.extend(self._blanks(head_pos - len(self.cells) + 1))
+
+        self.head = head_pos
+        self.lo = self.base_lo = 0
+        self.hi = self.base_hi = len(self.cells)
+        # Buffer index of position 0 of the snapshots and pages of the last
+        # snapshot
+        self.origin = 0
+        self.pages = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Returns a new tape with the contents of a TapeSnapshot"""
+        pages, start, end, head, typecode = snapshot
+        tape = cls((), 0, typecode)
+        tape.cells.extend(tape._blanks(end - start - 1))
+        for first, cells in pages.values():
+            tape.cells[first - start : first - start + len(cells)] = cells
+
+        tape.head = head - start
+        tape.base_lo, tape.base_hi = 0, end - start
+        tape.lo, tape.hi = tape.head, tape.head + 1
+        tape.origin = -start
+        tape.pages = pages
+        return tape
+
+    def read(self):
+        """Returns the symbol id under the head"""
+        return self.cells[self.head]
+
+    def write(self, sym):
+        """Writes the symbol id under the head"""
+        self.cells[self.head] = sym
+
+    def move(self, delta):
+        """Moves the head delta cells (-1, 0 or 1)"""
+        head = self.head + delta
+        if head < self.lo:
+            if head < 0:
+                head += self.grow_left()
+            self.lo = head
+        elif head >= self.hi:
+            if head == len(self.cells):
+                self.grow_right()
+            self.hi = head + 1
+        self.head = head
+
+    def get(self, pos):
+        """Returns the symbol id at the given position (blank if unused)"""
+        start, end = self.bounds()
+        if pos < 0 or pos >= end - start:
+            return 0
+        return self.cells[start + pos]
+
+    def size(self):
+        """Returns the number of used cells"""
+        start, end = self.bounds()
+        return end - start
+
+    def position(self):
+        """Returns the head position"""
+        return self.head - min(self.lo, self.base_lo)
+
+    def bounds(self):
+        """Returns the range (start, end) of buffer indexes of the used cells"""
+        return min(self.lo, self.base_lo), max(self.hi, self.base_hi)
+
+    def snapshot(self):
+        """
+        Returns a TapeSnapshot with the current contents of the tape.
+
+        The tape is split in pages of SNAPSHOT_PAGE_SIZE cells and snapshots
+        are persistent: a snapshot only copies the pages visited by the head
+        since the previous snapshot and shares the rest with it. The first
+        snapshot of a tape copies all the used cells.
+        """
+        start, end = self.bounds()
+        if self.pages is None:
+            pages = {}
+            first, last = start, end
+        else:
+            pages = dict(self.pages)
+            first, last = self.lo, self.hi
+
+        page_size = Tape.SNAPSHOT_PAGE_SIZE
+        origin = self.origin
+        for page in range(
+            (first - origin) // page_size, (last - 1 - origin) // page_size + 1
+        ):
+            a = max(origin + page * page_size, start)
+            b = min(origin + (page + 1) * page_size, end)
+            pages[page] = (a - origin, self.cells[a:b])
+
+        self.pages = pages
+        self.base_lo, self.base_hi = start, end
+        self.lo, self.hi = self.head, self.head + 1
+        return TapeSnapshot(
+            pages, start - origin, end - origin, self.head - origin, self.typecode
+        )
+
+    def __iter__(self):
+        start, end = self.bounds()
+        return iter(self.cells[start:end])
+
+    def grow_left(self):
+        """
+        Doubles the buffer adding blank cells on its left side.
+
+        The buffer object is modified in place so references to it remain
+        valid. Returns the number of added cells, which is also the amount
+        by which all the indexes (head, lo, hi, ...) have been shifted.
+        """
+        n = len(self.cells)
+        self.cells[0:0] = self._blanks(n)
+        self.head += n
+        self.lo += n
+        self.hi += n
+        self.base_lo += n
+        self.base_hi += n
+        self.origin += n
+        return n
+
+    def grow_right(self):
+        """
+        Doubles the buffer adding blank cells on its right side.
+
+        The buffer object is modified in place so references to it remain
+        valid. Returns the number of added cells.
+        """
+        n = len(self.cells)
+        self.cells.extend(self._blanks(n))
+        return n
+
+    def _blanks(self, n):
+        """Returns n blank cells of the same type as the buffer"""
+        if self.typecode is None:
+            return [0] * n
+        if self.typecode == "B":
+            return bytes(n)
+        return array(self.typecode, bytes(n * self.cells.itemsize))
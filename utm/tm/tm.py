@@ -1,17 +1,46 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import copy
-from abc import ABCMeta, abstractmethod
-
+import os
+from abc import ABCMeta
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from types import MappingProxyType
+
+from utm.tm import batch, engine
+from utm.tm.analysis import analyze
+from utm.tm.tape import Tape, compact_typecode
 from utm.tm.exceptions import (
     HaltStateException,
     InvalidSymbolException,
     UnknownTransitionException,
     TapeNotSetException,
+    UndoJournalEmptyException,
 )
 
 
+Snapshot = namedtuple("Snapshot", ("state", "steps", "tape"))
+Snapshot.__doc__ = """Configuration of a turing machine, see TuringMachine.snapshot().
+
+    - state: Current state
+    - steps: Number of executed steps
+    - tape: utm.tm.tape.TapeSnapshot or None if the tape was not set
+"""
+
+Breakpoints = namedtuple(
+    "Breakpoints", ("states", "transitions", "head_positions", "steps")
+)
+Breakpoints.__doc__ = """Breakpoints of a turing machine, see
+TuringMachine.set_breakpoints().
+
+    - states: Frozenset of states
+    - transitions: Frozenset of (state, symbol) tuples
+    - head_positions: Frozenset of head positions
+    - steps: Sorted tuple of executed steps counts
+"""
+
+
 # TODO: rewrite doc
 
 
@@ -27,12 +56,45 @@ class TuringMachine:
             - MOVE_LEFT
             - MOVE_RIGHT
             - NON_MOVEMENT
+
+    The machine only holds the execution state (tape, current state, steps
+    and observers), the definition is an immutable MachineDefinition that
+    can be shared by many machines, see from_definition().
     """
 
+    __slots__ = (
+        "_definition",
+        "_table",
+        "_tape",
+        "_cur_state",
+        "_num_executed_steps",
+        "_observers",
+        "_event_observers",
+        "_step_observed",
+        "_steps_batch_size",
+        "_pending_steps",
+        "_profiler",
+        "_undo_limit",
+        "_undo_journal",
+        "_breakpoints",
+    )
+
     MOVE_RIGHT = 1
     MOVE_LEFT = 2
     NON_MOVEMENT = 3
     HEAD_MOVEMENTS = frozenset((MOVE_LEFT, MOVE_RIGHT, NON_MOVEMENT))
+    HEAD_DISPLACEMENTS = {MOVE_LEFT: -1, MOVE_RIGHT: 1, NON_MOVEMENT: 0}
+    HEAD_MOVEMENTS_BY_DISPLACEMENT = {d: m for m, d in HEAD_DISPLACEMENTS.items()}
+
+    # run() return values
+    EXIT_HALT = engine.EXIT_HALT
+    EXIT_MAX_STEPS = engine.EXIT_MAX_STEPS
+    EXIT_UNKNOWN_TRANSITION = engine.EXIT_UNKNOWN_TRANSITION
+    EXIT_LOOP = engine.EXIT_LOOP
+    EXIT_BREAKPOINT = engine.EXIT_BREAKPOINT
+
+    # Minimum number of steps between two loop detection checkpoints
+    LOOP_CHECK_INTERVAL = 1024
 
     def __init__(
         self,
@@ -68,27 +130,138 @@ class TuringMachine:
             - blank:
                 Default symbol in all unspecified tape positions
         """
-        self._states = frozenset(states)
-        self._in_alphabet = frozenset(in_alphabet)
-        self._tape_alphabet = frozenset(tape_alphabet)
-        self._trans_function = copy.copy(trans_function)
-        self._init_state = init_state
-        self._final_states = frozenset(final_states)
-        self._halt_state = halt_state
-        self._blank_sym = blank_sym
+        self._init_runtime(
+            MachineDefinition(
+                states,
+                in_alphabet,
+                tape_alphabet,
+                trans_function,
+                init_state,
+                final_states,
+                halt_state,
+                blank_sym,
+            )
+        )
+
+    @classmethod
+    def from_definition(cls, definition):
+        """Returns a new machine that runs the given MachineDefinition.
+
+        The machine is at the initial state, without tape nor observers. The
+        definition is shared, not copied, so creating a machine this way is
+        cheap regardless of the size of the definition.
+        """
+        tm = cls.__new__(cls)
+        tm._init_runtime(definition)
+        return tm
 
-        self._check_data()
+    @classmethod
+    def load_compiled(cls, path, check_table=False):
+        """Loads a machine saved with save_compiled().
+
+        The file is memory-mapped and its transition table is used in place,
+        so loading only reads the states and symbols, not the transitions.
+
+        :param check_table: If True the transition table is also checked,
+            which reads all of it. Use it for files that may be corrupt or
+            come from untrusted sources.
+
+        :raise utm.tm.compiled.CompiledFormatError: if the file is not a
+            compiled machine.
+        """
+        from utm.tm import compiled
+
+        return cls.from_definition(
+            MachineDefinition.from_table(*compiled.load(path, check_table))
+        )
+
+    @classmethod
+    def load_source(cls, path, cache_dir=None):
+        """Parses a machine source file.
+
+        If cache_dir is given the compiled machine is saved there, named
+        after the hash of the source, and later loads of the same source
+        load the compiled file instead of parsing it again. The tables of the
+        cached files are not checked, see load_compiled().
+        """
+        from utm.tm import compiled
+        from utm.tm.parser import TuringMachineParser
+
+        if cache_dir is not None:
+            cache_path = compiled.cache_path(path, cache_dir)
+            try:
+                return cls.load_compiled(cache_path)
+            except (OSError, compiled.CompiledFormatError):
+                pass
+
+        parser = TuringMachineParser()
+        parser.parse_file(path)
+        tm = parser.create()
+        if not isinstance(tm, TuringMachine):
+            raise Exception("%s is not a single tape machine" % path)
+
+        if cache_dir is not None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tm.save_compiled(cache_path)
+            except OSError:
+                pass  # the cache is only an optimization
+        return tm
+
+    def save_compiled(self, path):
+        """Saves the machine definition to path in a binary format that is
+        loaded without parsing, see load_compiled().
+
+        :raise TypeError: if some state or symbol is not a string.
+        """
+        from utm.tm import compiled
+
+        definition = self._definition
+        compiled.save(
+            path,
+            definition.table,
+            definition.in_alphabet,
+            definition.init_state,
+            definition.final_states,
+        )
+
+    def clone(self):
+        """Returns a new machine with the same definition, see
+        from_definition().
+        """
+        return self.from_definition(self._definition)
+
+    def _init_runtime(self, definition):
+        """Initializes the execution state of a new machine."""
+        self._definition = definition
+        # Integer compiled form of the transition function used by run()
+        self._table = definition.table
 
         # Machine tape, head and current state
         self._tape = None
-        self._head = 0
-        self._cur_state = init_state
+        self._cur_state = definition.init_state
         self._num_executed_steps = 0
 
         # Set of observers
         # is a list because other structures like set forces to implement
         # the __hash__ operation
         self._observers = []
+        # Observers of each event, see _update_event_observers()
+        self._event_observers = {}
+        self._update_event_observers()
+        # Step records (state id, read id, written id, displacement) not yet
+        # delivered to the batched observers
+        self._pending_steps = array("i")
+        # Profiler collecting the steps of this machine, see set_profiler()
+        self._profiler = None
+        # Transition index of each executed step, newest last, kept to undo
+        # the last _undo_limit steps, see set_undo_limit()
+        self._undo_limit = 0
+        self._undo_journal = array("i")
+        # Breakpoints or None, while there are state or transition
+        # breakpoints _table is a copy of the definition table that marks
+        # them, see set_breakpoints()
+        self._breakpoints = None
 
     def run_step(self):
         """
@@ -104,70 +277,124 @@ class TuringMachine:
         if self._tape is None:
             raise TapeNotSetException("Tape must be set before perform an step")
 
-        cur = (self._cur_state, self._tape[self._head])
-        for obs in self._observers:
+        observers = self._event_observers
+        table = self._table
+        tape = self._tape
+        read = tape.read()
+        cur = (self._cur_state, table.symbols[read])
+        for obs in observers[BaseTuringMachineObserver.STEP_START]:
             obs.on_step_start(cur[0], cur[1])
 
-        try:
-            state, sym, movement = self._trans_function[cur]
+        i = table.state_base(self._cur_state) + read
+        nxt = table.next_state[i]
+        if nxt < 0:
+            raise UnknownTransitionException(
+                "There are no transition for %s" % str(cur)
+            )
 
-            self._tape[self._head] = sym
-            self._cur_state = state
+        sym_id = table.write[i]
+        displacement = table.move[i]
+        state = table.state_at(nxt)
+        sym = table.symbols[sym_id]
+        movement = TuringMachine.HEAD_MOVEMENTS_BY_DISPLACEMENT[displacement]
+        tape.write(sym_id)
+
+        prev_head_pos = tape.position()
+        size, origin, head = len(tape.cells), tape.origin, tape.head
+        tape.move(displacement)
+        head_pos = tape.position()
+        if self._profiler is not None:
+            self._profiler._add_step(table, i, tape, size, origin, head)
+        if self._undo_limit:
+            self._add_undo_steps((i,))
+
+        if observers[BaseTuringMachineObserver.STEPS]:
+            self._pending_steps.extend(
+                (table.state_ids[self._cur_state], read, sym_id, displacement)
+            )
 
-            prev_head_pos = self._head
+        self._cur_state = state
 
-            if movement == TuringMachine.MOVE_LEFT:
-                if self._head == 0:
-                    self._tape.insert(0, self._blank_sym)
-                else:
-                    self._head -= 1
+        # Notify observers
+        for obs in observers[BaseTuringMachineObserver.STEP_END]:
+            obs.on_step_end(state, sym, movement)
 
-            elif movement == TuringMachine.MOVE_RIGHT:
-                self._head += 1
-                if self._head == len(self._tape):
-                    self._tape.append(self._blank_sym)
+        if prev_head_pos != head_pos:
+            for obs in observers[BaseTuringMachineObserver.HEAD_MOVED]:
+                obs.on_head_moved(head_pos, prev_head_pos)
 
-            # Notify observers
-            for obs in self._observers:
-                obs.on_step_end(state, sym, movement)
+        self._num_executed_steps += 1
 
-                if prev_head_pos != self._head:
-                    obs.on_head_moved(self._head, prev_head_pos)
+        # Full batches are delivered once the step is complete, so observers
+        # find the machine in the configuration that follows the batch
+        if len(self._pending_steps) >= 4 * self._steps_batch_size:
+            self.flush_steps()
 
-            self._num_executed_steps += 1
+    def step_back(self):
+        """
+        Undoes the last executed step: restores the previous state, the
+        overwritten symbol and the previous head position.
 
-        except KeyError:
-            raise UnknownTransitionException(
-                "There are no transition for %s" % str(cur)
-            )
+        Only the steps executed since the tape was set (or restored) and
+        within the undo limit can be undone, see set_undo_limit().
+
+            - If there are no steps to undo raises UndoJournalEmptyException
+        """
+        if not self.get_undo_steps():
+            raise UndoJournalEmptyException("There are no steps to undo")
+        self.flush_steps()
+        if len(self._undo_journal) > self._undo_limit:
+            del self._undo_journal[: len(self._undo_journal) - self._undo_limit]
+
+        table = self._table
+        tape = self._tape
+        i = self._undo_journal.pop()
+        tape.move(-table.move[i])
+        tape.write(i % table.num_symbols)
+        self._cur_state = table.state_at(i - i % table.num_symbols)
+        self._num_executed_steps -= 1
+
+        head_pos = tape.position()
+        for obs in self._event_observers[BaseTuringMachineObserver.TAPE_CHANGED]:
+            obs.on_tape_changed(head_pos)
 
-    def run(self, max_steps=None):
+    def run(self, max_steps=None, block_size=None, detect_loops=False):
         """
-        run(max_steps=None): int
+        run(max_steps=None, block_size=None, detect_loops=False): int
 
         Perform steps until 'halt' or 'max steps'
 
         Return values:
-            0 - Ends by halt state
-            1 - Ends by max steps limit
-            2 - Ends by unknown transition
+            0 - Ends by halt state (EXIT_HALT)
+            1 - Ends by max steps limit (EXIT_MAX_STEPS)
+            2 - Ends by unknown transition (EXIT_UNKNOWN_TRANSITION)
+            3 - Ends because the machine never halts (EXIT_LOOP), only
+                when detect_loops is True
+            5 - Ends at a breakpoint (EXIT_BREAKPOINT), see
+                set_breakpoints()
+
+        When there are no observers attached the steps are executed by the
+        compiled engine instead of calling run_step() repeatedly. The engine
+        sweeps scan loops (e.g. '1, 1 -> 1, 1, >') over a whole run of
+        symbols at once and, if block_size is given, executes block
+        macro-steps: what the machine does inside a block of block_size cells
+        is computed once and replayed every time the same block is entered
+        in the same state. Step counts are exact in both cases.
+
+        If detect_loops is True the configuration (state, non-blank part of
+        the tape and head position relative to it) is hashed at checkpoints
+        and compared following Brent's algorithm. A repeated configuration
+        proves that the machine will never halt, so the run stops with
+        EXIT_LOOP, as well as when the machine sweeps blanks endlessly towards
+        the unused part of the tape or enters one of the endless states of
+        the static analysis of its definition, see MachineDefinition.analysis.
+
+        While the undo journal is enabled, see set_undo_limit(), the engine
+        records every step and block_size is ignored.
         """
-        try:
-            if max_steps:
-                try:
-                    for _ in range(max_steps):
-                        self.run_step()
-                    return 1
-                except HaltStateException:
-                    return 0
-
-            else:
-                while not self.is_at_halt_state():
-                    self.run_step()
-                return 0
-
-        except UnknownTransitionException:
-            return 2
+        if detect_loops:
+            return self._run_detecting_loops(max_steps, block_size)
+        return self._run_until(max_steps, block_size)
 
     def get_current_state(self):
         """
@@ -179,19 +406,23 @@ class TuringMachine:
         """
         Returns the blank symbol
         """
-        return self._blank_sym
+        return self._definition.blank_sym
 
     def get_halt_state(self):
         """
         Returns the halt state
         """
-        return self._halt_state
+        return self._definition.halt_state
 
     def get_initial_state(self):
         """
         Returns the initial state
         """
-        return self._init_state
+        return self._definition.init_state
+
+    def get_definition(self):
+        """Returns the MachineDefinition run by this machine"""
+        return self._definition
 
     def get_symbol_at(self, pos):
         """
@@ -200,27 +431,24 @@ class TuringMachine:
         The internal symbols goes from 0 to getInternalTapeSize() - 1
         for any other position out of this range the blank symbol is returned
         """
-        if pos < 0 or pos >= len(self._tape):
-            return self._blank_sym
-
-        return self._tape[pos]
+        return self._table.symbols[self._tape.get(pos)]
 
     def get_internal_tape_size(self):
         """
         Returns the size of the internal tape representation
         """
-        return len(self._tape)
+        return self._tape.size()
 
     def get_head_position(self):
         """
         Returns the current head position
         """
-        return self._head
+        return self._tape.position()
 
     def get_tape_iterator(self):
         """Returns an iterator of the internal tape"""
-        if self._tape:
-            return iter(self._tape)
+        if self._tape is not None:
+            return map(self._table.symbols.__getitem__, self._tape)
         else:
             raise TapeNotSetException("Tape must be set before getting its iterator")
 
@@ -235,13 +463,13 @@ class TuringMachine:
         """
         Returns true only if current state is the halt state
         """
-        return self._cur_state == self._halt_state
+        return self._cur_state == self._definition.halt_state
 
     def is_at_final_state(self):
         """
         Returns true only if current state is a final state
         """
-        return self._cur_state in self._final_states
+        return self._cur_state in self._definition.final_states
 
     def is_tape_set(self):
         """
@@ -255,54 +483,221 @@ class TuringMachine:
         :param word: An iterable str/list/tuple/... of symbols.
         :param max_steps: Limit of steps to test if the word is accepted.
 
+        The configuration, the executed steps counter and the undo journal of
+        the machine are restored afterwards.
+
         :return: True if accepted, False otherwise.
         """
-        old_tape, old_head = self._tape, self._head
-        old_state = self._cur_state
-
-        self.set_tape(word)
-        self.run(max_steps)
-        accepted = self.is_at_final_state()
+        saved = self.snapshot()
+        old_journal, old_limit = self._undo_journal, self._undo_limit
+        old_table = self._table
 
-        self._tape, self._head = old_tape, old_head
-        self._cur_state = old_state
+        # Breakpoints do not stop the test and its steps can not be undone
+        self._table = self._definition.table
+        self._undo_limit = 0
+        try:
+            self.set_tape(word)
+            self._run(max_steps)
+            accepted = self.is_at_final_state()
+        finally:
+            self._table = old_table
+            self._undo_limit = old_limit
+            self.restore(saved)
+            self._undo_journal = old_journal
 
         return accepted
 
-    def set_tape(self, tape, head_pos=0):
+    def accept_many(
+        self, words, max_steps=None, workers=None, chunksize=256, with_tape=False
+    ):
+        """Tests a batch of words, spreading them over a pool of processes.
+
+        Each word is run from the initial state on a separate copy of this
+        machine, so the state of this instance is left untouched. The machine
+        definition is sent once to each worker process.
+
+        :param words: Iterable of words (str/list/tuple/... of symbols).
+        :param max_steps: Limit of steps for each word.
+        :param workers: Number of worker processes, defaults to the number of
+            CPUs. If it is 1 the words are tested in the calling process.
+        :param chunksize: Number of words sent to a worker process at once.
+        :param with_tape: If True the results include the final tape.
+
+        :return: Iterator of utm.tm.batch.WordResult (word, accepted,
+            exit_code, steps, state, tape, error), in the same order as
+            words. A word with an invalid symbol gets a result with the
+            error instead of stopping the batch.
+        """
+        return batch.accept_many(
+            type(self),
+            self._definition,
+            words,
+            max_steps,
+            workers,
+            chunksize,
+            with_tape,
+        )
+
+    def set_tape(self, tape, head_pos=0, compact=False):
         """Sets tape content and head position.
 
         If head position is negative or greater than tape length the tape is
         filled with blanks.
 
+        :param compact: If True the tape cells are stored in a bytearray (or
+            a wider integer array for alphabets of more than 256 symbols)
+            instead of a list, which takes 1/8 of the memory for big tapes.
+
         :raise InvalidSymbolException: if tape contains an invalid symbol.
         """
+        self.flush_steps()
 
-        for s in tape:
-            if s not in self._tape_alphabet:
-                raise InvalidSymbolException("Invalid tape symbol " + str(s))
-
-        # If head pos is out of tape make tape grow with blanks
-        if head_pos < 0:
-            self._tape = [self._blank_sym] * (-head_pos)
-            self._tape.extend(tape)
-            self._head = 0
-        elif head_pos >= len(tape):
-            self._tape = list(tape)
-            if not self._tape:
-                self._tape = [self._blank_sym]  # Empty tape
-            self._tape.extend([self._blank_sym] * (head_pos - len(tape)))
-            self._head = head_pos
-        else:
-            self._tape = list(tape)
-            self._head = head_pos
+        table = self._table
+        typecode = compact_typecode(table.num_symbols) if compact else None
+        try:
+            self._tape = Tape(
+                map(table.symbol_ids.__getitem__, tape), head_pos, typecode
+            )
+        except KeyError as e:
+            raise InvalidSymbolException("Invalid tape symbol " + str(e.args[0]))
+        self._undo_journal = array("i")
 
-        for obs in self._observers:
+        for obs in self._event_observers[BaseTuringMachineObserver.TAPE_CHANGED]:
             obs.on_tape_changed(head_pos)
 
+    def snapshot(self):
+        """Returns a Snapshot of the current configuration (state, executed
+        steps and tape), see restore().
+
+        Snapshots are persistent, taking one only copies the tape pages the
+        head has visited since the previous snapshot of this machine and
+        shares the rest of the tape with it. They can be pickled, e.g. to
+        resume a long run later on a machine of the same definition.
+        """
+        tape = None if self._tape is None else self._tape.snapshot()
+        return Snapshot(self._cur_state, self._num_executed_steps, tape)
+
+    def restore(self, snapshot):
+        """Sets the configuration saved in the given snapshot."""
+        self.flush_steps()
+
+        state, steps, tape = snapshot
+        self._cur_state = state
+        self._num_executed_steps = steps
+        self._tape = None if tape is None else Tape.from_snapshot(tape)
+        self._undo_journal = array("i")
+
+        if self._tape is not None:
+            head_pos = self._tape.position()
+            for obs in self._event_observers[BaseTuringMachineObserver.TAPE_CHANGED]:
+                obs.on_tape_changed(head_pos)
+
+    def fork(self):
+        """Returns a new machine with the same definition and configuration.
+
+        Both machines continue independently from here, the observers are
+        not copied.
+        """
+        tm = self.from_definition(self._definition)
+        tm.restore(self.snapshot())
+        return tm
+
+    def set_profiler(self, profiler):
+        """Sets the utm.tm.profiler.Profiler that collects the steps of this
+        machine, None to stop profiling.
+
+        While profiling, run() ignores block_size since block macro-steps
+        would hide the transitions executed inside the blocks.
+        """
+        self._profiler = profiler
+
+    def get_profiler(self):
+        """Returns the profiler of this machine, None if not profiling"""
+        return self._profiler
+
+    def set_breakpoints(self, states=(), transitions=(), head_positions=(), steps=()):
+        """Sets the breakpoints of run(), replacing the previous ones.
+
+        run() stops with EXIT_BREAKPOINT before executing a transition from
+        one of the given states or one of the given (state, symbol)
+        transitions and after a step that leaves the head at one of the
+        given positions or the executed steps counter at one of the given
+        counts. When run() starts at a breakpoint it does not stop there,
+        so calling it again resumes the execution. run_step() and
+        is_word_accepted() ignore the breakpoints.
+
+        Head positions are relative to the first cell of the tape when it
+        was set, as in the Profiler, they do not change when the tape grows
+        to the left.
+
+        State and transition breakpoints are marked in a copy of the
+        transition table, so the engine only checks them when they are hit.
+        Head position and step breakpoints split the run in chunks that can
+        not go past them, which slows it down while the head is near a
+        breakpoint position. Block macro-steps are not used while there are
+        breakpoints.
+
+        :raise ValueError: if a state is not a state of the machine.
+        :raise InvalidSymbolException: if a symbol is not in the tape
+            alphabet.
+        """
+        table = self._definition.table
+        n = table.num_symbols
+        indexes = []
+        for state in states:
+            base = self._state_base(state)
+            indexes.extend(i for i in range(base, base + n) if table.next_state[i] >= 0)
+        for state, symbol in transitions:
+            if symbol not in table.symbol_ids:
+                raise InvalidSymbolException("Invalid tape symbol " + str(symbol))
+            indexes.append(self._state_base(state) + table.symbol_ids[symbol])
+
+        breakpoints = Breakpoints(
+            frozenset(states),
+            frozenset(transitions),
+            frozenset(head_positions),
+            tuple(sorted(set(steps))),
+        )
+        self._breakpoints = breakpoints if any(breakpoints) else None
+        self._table = table.with_breakpoints(indexes) if indexes else table
+
+    def get_breakpoints(self):
+        """Returns the Breakpoints of run()"""
+        if self._breakpoints is None:
+            return Breakpoints(frozenset(), frozenset(), frozenset(), ())
+        return self._breakpoints
+
+    def clear_breakpoints(self):
+        """Removes all the breakpoints"""
+        self.set_breakpoints()
+
+    def set_undo_limit(self, steps):
+        """Sets the number of executed steps that can be undone with
+        step_back(), 0 disables the undo journal.
+
+        The journal takes 4 bytes per step (up to twice the limit between
+        trims) and makes run() record the steps, which is several times
+        slower than running without it.
+        """
+        if steps < 0:
+            raise ValueError("The undo limit can not be negative")
+        self._undo_limit = steps
+        if not steps:
+            self._undo_journal = array("i")
+        elif len(self._undo_journal) > steps:
+            del self._undo_journal[: len(self._undo_journal) - steps]
+
+    def get_undo_limit(self):
+        """Returns the number of steps that can be undone, 0 if disabled"""
+        return self._undo_limit
+
+    def get_undo_steps(self):
+        """Returns the number of steps that step_back() can undo now"""
+        return min(len(self._undo_journal), self._undo_limit)
+
     def set_at_initial_state(self):
         """Forces the machine state to be the initial state."""
-        self._cur_state = self._init_state
+        self._cur_state = self._definition.init_state
 
     def attach_observer(self, observer):
         """Attaches an observer to this Turing Machine."""
@@ -311,19 +706,478 @@ class TuringMachine:
             raise TypeError("Observer must be subclass of BaseTuringMachineObserver")
 
         if observer not in self._observers:
+            self.flush_steps()
             self._observers.append(observer)
+            self._update_event_observers()
 
     def detach_observer(self, observer):
         """Removes the specified observer"""
         try:
             self._observers.remove(observer)
         except ValueError:
-            pass
+            return
+
+        self.flush_steps()
+        self._update_event_observers()
+
+    def flush_steps(self):
+        """Delivers the pending step records to the batched observers.
+
+        Records are delivered automatically when a batch is full, at the end
+        of run() and before the tape is changed, this is only needed to get
+        the records of steps performed with run_step().
+        """
+        if self._pending_steps:
+            batch, self._pending_steps = self._pending_steps, array("i")
+            for obs in self._event_observers[BaseTuringMachineObserver.STEPS]:
+                obs.on_steps(batch)
+
+    def decode_steps(self, batch):
+        """Decodes a batch of step records received by on_steps().
+
+        :return: Iterator of tuples (state, read symbol, written symbol,
+            movement) where movement is one of the MOVE_* constants.
+        """
+        states = self._table.states
+        symbols = self._table.symbols
+        movements = TuringMachine.HEAD_MOVEMENTS_BY_DISPLACEMENT
+        for i in range(0, len(batch), 4):
+            yield (
+                states[batch[i]],
+                symbols[batch[i + 1]],
+                symbols[batch[i + 2]],
+                movements[batch[i + 3]],
+            )
 
     def reset_executed_steps_counter(self):
         """Set the executed steps counter to 0"""
         self._num_executed_steps = 0
 
+    def _update_event_observers(self):
+        """Groups the observers by the events they handle."""
+        self._event_observers = {
+            event: tuple(o for o in self._observers if event in o.EVENTS)
+            for event in BaseTuringMachineObserver.ALL_EVENTS
+        }
+        self._step_observed = any(
+            self._event_observers[e] for e in BaseTuringMachineObserver.STEP_EVENTS
+        )
+        self._steps_batch_size = min(
+            (o.STEPS_BATCH_SIZE for o in self._observers if o.STEPS in o.EVENTS),
+            default=BaseTuringMachineObserver.STEPS_BATCH_SIZE,
+        )
+
+    def _run(self, max_steps, block_size=None):
+        """Runs without loop detection."""
+        if not self._step_observed:
+            if self._event_observers[BaseTuringMachineObserver.STEPS]:
+                return self._run_recording(max_steps)
+            if self._undo_limit:
+                return self._run_journaled(max_steps)
+            return self._run_compiled(max_steps, block_size)
+
+        try:
+            if max_steps:
+                try:
+                    for _ in range(max_steps):
+                        self.run_step()
+                except HaltStateException:
+                    return TuringMachine.EXIT_HALT
+
+                if self.is_at_halt_state():
+                    return TuringMachine.EXIT_HALT
+                return TuringMachine.EXIT_MAX_STEPS
+
+            else:
+                while not self.is_at_halt_state():
+                    self.run_step()
+                return TuringMachine.EXIT_HALT
+
+        except UnknownTransitionException:
+            return TuringMachine.EXIT_UNKNOWN_TRANSITION
+
+    def _run_until(self, max_steps, block_size=None, resume=True):
+        """Runs stopping at the breakpoints, if there are any.
+
+        :param resume: If True and the machine is at a breakpoint it does
+            not stop there.
+        """
+        if self._breakpoints is None:
+            return self._run(max_steps, block_size)
+
+        _, _, positions, break_steps = self._breakpoints
+        limit = max_steps if max_steps else -1
+        steps = 0
+
+        while steps != limit:
+            counter = self._num_executed_steps
+            chunk = limit - steps if limit > 0 else None
+            # The chunk can not go past the next steps and head breakpoints
+            k = bisect_right(break_steps, counter)
+            if k < len(break_steps):
+                chunk = min(chunk or break_steps[k], break_steps[k] - counter)
+            if positions and self._tape is not None:
+                pos = self._tape.head - self._tape.origin
+                distance = min(abs(p - pos) for p in positions) or 1
+                chunk = min(chunk or distance, distance)
+            if self._step_observed:
+                # run_step() does not check the table breakpoints
+                chunk = 1
+
+            if self._at_table_breakpoint():
+                if steps or not resume:
+                    return TuringMachine.EXIT_BREAKPOINT
+                # Executes the transition where the run resumes unmarked
+                table, self._table = self._table, self._definition.table
+                try:
+                    exit_code = self._run(1)
+                finally:
+                    self._table = table
+            else:
+                exit_code = self._run(chunk)
+
+            steps += self._num_executed_steps - counter
+            if exit_code != TuringMachine.EXIT_MAX_STEPS:
+                return exit_code
+            if (
+                k < len(break_steps) and self._num_executed_steps == break_steps[k]
+            ) or (positions and self._tape.head - self._tape.origin in positions):
+                return TuringMachine.EXIT_BREAKPOINT
+
+        # Otherwise the next run would resume past the breakpoint
+        if steps and self._at_table_breakpoint():
+            return TuringMachine.EXIT_BREAKPOINT
+        return TuringMachine.EXIT_MAX_STEPS
+
+    def _at_table_breakpoint(self):
+        """Returns True if the next transition is marked as a breakpoint"""
+        if self._tape is None or self.is_at_halt_state():
+            return False
+        i = self._table.state_base(self._cur_state) + self._tape.read()
+        return self._table.loop_next[i] == engine.BREAKPOINT
+
+    def _state_base(self, state):
+        try:
+            return self._table.state_base(state)
+        except KeyError:
+            raise ValueError("Unknown state %s" % str(state))
+
+    def _run_detecting_loops(self, max_steps, block_size):
+        """Runs in chunks checking for repeated configurations in between."""
+        limit = max_steps if max_steps else -1
+        steps = 0
+        saved = None
+        power = lam = 1
+        endless = self._definition.analysis.endless_states
+
+        while True:
+            if self._cur_state in endless:
+                return TuringMachine.EXIT_LOOP
+
+            chunk = TuringMachine.LOOP_CHECK_INTERVAL
+            if self._tape is not None:
+                # Keep checkpoints amortized O(1) per step on big tapes
+                chunk = max(chunk, self._tape.size())
+            if limit > 0:
+                chunk = min(chunk, limit - steps)
+
+            start = self._num_executed_steps
+            exit_code = self._run_until(chunk, block_size, resume=steps == 0)
+            steps += self._num_executed_steps - start
+            if exit_code != TuringMachine.EXIT_MAX_STEPS or steps == limit:
+                return exit_code
+
+            base = self._table.state_base(self._cur_state)
+            conf = engine.configuration(self._table, self._tape, base)
+            if conf is None or conf == saved:
+                return TuringMachine.EXIT_LOOP
+
+            # Brent: move the saved checkpoint at every power of two
+            if lam == power:
+                saved = conf
+                power *= 2
+                lam = 0
+            lam += 1
+
+    def _run_recording(self, max_steps):
+        """Runs the compiled engine delivering the steps in batches."""
+        limit = max_steps if max_steps else -1
+        steps = 0
+        exit_code = TuringMachine.EXIT_MAX_STEPS
+
+        try:
+            while steps != limit:
+                chunk = self._steps_batch_size - len(self._pending_steps) // 4
+                if limit > 0:
+                    chunk = min(chunk, limit - steps)
+
+                start = self._num_executed_steps
+                exit_code = self._run_compiled(chunk, records=self._pending_steps)
+                steps += self._num_executed_steps - start
+
+                if len(self._pending_steps) >= 4 * self._steps_batch_size:
+                    self.flush_steps()
+                if exit_code != TuringMachine.EXIT_MAX_STEPS:
+                    break
+        finally:
+            self.flush_steps()
+
+        return exit_code
+
+    def _run_journaled(self, max_steps):
+        """Runs the compiled engine in chunks, adding the steps to the undo
+        journal and trimming it in between.
+        """
+        limit = max_steps if max_steps else -1
+        steps = 0
+        exit_code = TuringMachine.EXIT_MAX_STEPS
+
+        while steps != limit:
+            chunk = max(self._undo_limit, BaseTuringMachineObserver.STEPS_BATCH_SIZE)
+            if limit > 0:
+                chunk = min(chunk, limit - steps)
+
+            start = self._num_executed_steps
+            # The profiler only reports the steps as records
+            records = None if self._profiler is None else array("i")
+            exit_code = self._run_compiled(chunk, records=records)
+            steps += self._num_executed_steps - start
+            # Trims the journal
+            self._add_undo_steps(())
+            if exit_code != TuringMachine.EXIT_MAX_STEPS:
+                break
+
+        return exit_code
+
+    def _add_undo_steps(self, transitions):
+        """Appends the transition indexes of executed steps to the undo
+        journal, trimming it when it doubles the limit.
+        """
+        journal = self._undo_journal
+        journal.extend(transitions)
+        if len(journal) > 2 * self._undo_limit:
+            del journal[: len(journal) - self._undo_limit]
+
+    def _run_compiled(self, max_steps, block_size=None, records=None):
+        """Runs the machine on the integer transition table."""
+        if self.is_at_halt_state():
+            return engine.EXIT_HALT
+        if self._tape is None:
+            raise TapeNotSetException("Tape must be set before perform an step")
+
+        table = self._table
+        base = table.state_base(self._cur_state)
+        first = 0 if records is None else len(records)
+        if self._profiler is not None:
+            exit_code, base, steps = self._profiler._run(
+                table, self._tape, base, max_steps, records
+            )
+        elif records is not None:
+            exit_code, base, steps = engine.run_recording(
+                table, self._tape, base, records, max_steps
+            )
+        elif self._undo_limit:
+            exit_code, base, steps = engine.run_journaled(
+                table, self._tape, base, self._undo_journal, max_steps
+            )
+        elif block_size and block_size > 1:
+            cache = self._definition.macro_caches.setdefault(block_size, {})
+            exit_code, base, steps = engine.run_blocks(
+                table, self._tape, base, block_size, cache, max_steps
+            )
+        else:
+            exit_code, base, steps = engine.run(table, self._tape, base, max_steps)
+
+        self._cur_state = table.state_at(base)
+        self._num_executed_steps += steps
+        if self._undo_limit and records is not None:
+            n = table.num_symbols
+            self._add_undo_steps(
+                s * n + r for s, r in zip(records[first::4], records[first + 1 :: 4])
+            )
+
+        return exit_code
+
+    def __str__(self):
+        return str(self._definition)
+
+
+# Turing Machine definition
+##############################################################################
+
+
+class MachineDefinition:
+    """
+    Immutable definition of a turing machine: states, alphabets, transition
+    function and its compiled transition table.
+
+    The definition is validated and compiled once and any number of machines
+    can run it at the same time without copying it, see
+    TuringMachine.from_definition(). Its attributes are read only.
+    """
+
+    __slots__ = (
+        "states",
+        "in_alphabet",
+        "tape_alphabet",
+        "init_state",
+        "final_states",
+        "halt_state",
+        "blank_sym",
+        "table",
+        "macro_caches",
+        "_trans_function",
+        "_analysis",
+    )
+
+    def __init__(
+        self,
+        states,
+        in_alphabet,
+        tape_alphabet,
+        trans_function,
+        init_state,
+        final_states,
+        halt_state,
+        blank_sym,
+    ):
+        """
+        MachineDefinition(states, in_alphabet, tape_alphabet, trans_function,
+                          istate, fstates, hstate, blank)
+
+        Validates and compiles the given data, the arguments are the same as
+        the ones of TuringMachine.
+        """
+        trans_function = dict(trans_function)
+        self._init(
+            frozenset(states),
+            frozenset(in_alphabet),
+            frozenset(tape_alphabet),
+            MappingProxyType(trans_function),
+            init_state,
+            frozenset(final_states),
+            halt_state,
+            blank_sym,
+            None,
+        )
+        self._check_data()
+        object.__setattr__(self, "table", self._compile(trans_function))
+
+    @classmethod
+    def from_table(cls, table, in_alphabet, init_state, final_states):
+        """Returns the definition of an already compiled transition table.
+
+        The transition function is rebuilt from the table the first time it
+        is needed.
+        """
+        definition = cls.__new__(cls)
+        definition._init(
+            frozenset(table.states),
+            frozenset(in_alphabet),
+            frozenset(table.symbols),
+            None,
+            init_state,
+            frozenset(final_states),
+            table.state_at(table.halt_base),
+            table.symbols[0],
+            table,
+        )
+        return definition
+
+    @property
+    def trans_function(self):
+        """Read only mapping (state, symbol) : (state, symbol, movement)"""
+        if self._trans_function is None:
+            table = self.table
+            symbols = table.symbols
+            movements = TuringMachine.HEAD_MOVEMENTS_BY_DISPLACEMENT
+            trans_function = {
+                (table.state_at(i), symbols[i % table.num_symbols]): (
+                    table.state_at(nxt),
+                    symbols[table.write[i]],
+                    movements[table.move[i]],
+                )
+                for i, nxt in enumerate(table.next_state)
+                if nxt >= 0
+            }
+            object.__setattr__(
+                self, "_trans_function", MappingProxyType(trans_function)
+            )
+        return self._trans_function
+
+    @property
+    def analysis(self):
+        """utm.tm.analysis.Analysis of the transition function, computed the
+        first time it is needed
+        """
+        if self._analysis is None:
+            object.__setattr__(
+                self,
+                "_analysis",
+                analyze(self.table, self.init_state, self.final_states),
+            )
+        return self._analysis
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MachineDefinition is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("MachineDefinition is immutable")
+
+    def __reduce__(self):
+        # The table may be a view of a memory-mapped file, compile it again
+        return (
+            MachineDefinition,
+            (
+                self.states,
+                self.in_alphabet,
+                self.tape_alphabet,
+                dict(self.trans_function),
+                self.init_state,
+                self.final_states,
+                self.halt_state,
+                self.blank_sym,
+            ),
+        )
+
+    def _init(
+        self,
+        states,
+        in_alphabet,
+        tape_alphabet,
+        trans_function,
+        init_state,
+        final_states,
+        halt_state,
+        blank_sym,
+        table,
+    ):
+        _set = object.__setattr__
+        _set(self, "states", states)
+        _set(self, "in_alphabet", in_alphabet)
+        _set(self, "tape_alphabet", tape_alphabet)
+        _set(self, "_trans_function", trans_function)
+        _set(self, "init_state", init_state)
+        _set(self, "final_states", final_states)
+        _set(self, "halt_state", halt_state)
+        _set(self, "blank_sym", blank_sym)
+        _set(self, "table", table)
+        # Block macro-steps computed by TuringMachine.run(), by block size,
+        # they only depend on the table so all the machines share them
+        _set(self, "macro_caches", {})
+        _set(self, "_analysis", None)
+
+    def _compile(self, trans_function):
+        """Returns the engine table of the given transition function"""
+        return engine.TransitionTable(
+            self.states,
+            self.tape_alphabet,
+            trans_function,
+            self.halt_state,
+            self.blank_sym,
+            TuringMachine.HEAD_DISPLACEMENTS,
+        )
+
     def _check_data(self):
         """
         Checks if the given information is correct
@@ -332,34 +1186,34 @@ class TuringMachine:
             2- Blank symbol is into the tape alphabet
             3- Initial state is in states
             4- Final states are all in states
-            5- Transition states are defined in states
-            6- Transition symbols are defined in tape alphabet
-            7- Transition is composed by elements with the specified format:
-                    (state, symbol) : (nstate, nsymbol, movement)
-
+            5- Transitions are valid, see _check_transitions()
 
         If one of the above fails raises an exception
         """
-        movements = frozenset(
-            [
-                TuringMachine.MOVE_LEFT,
-                TuringMachine.MOVE_RIGHT,
-                TuringMachine.NON_MOVEMENT,
-            ]
-        )
-
-        if not self._in_alphabet.issubset(self._tape_alphabet):
+        if not self.in_alphabet.issubset(self.tape_alphabet):
             raise Exception("Input alphabet is not subset of tape alphabet")
 
-        if self._blank_sym not in self._tape_alphabet:
+        if self.blank_sym not in self.tape_alphabet:
             raise Exception("Blank symbol is not into the tape alphabet")
 
-        if self._init_state not in self._states:
+        if self.init_state not in self.states:
             raise Exception("Initial state is not a valid state")
 
-        if not self._final_states.issubset(self._states):
+        if not self.final_states.issubset(self.states):
             raise Exception("Final states are not a subset of states")
 
+        self._check_transitions()
+
+    def _check_transitions(self):
+        """
+        Checks the transitions, raising an exception if one of them fails
+
+            1- Transition states are defined in states
+            2- Transition symbols are defined in tape alphabet
+            3- Transition is composed by elements with the specified format:
+                    (state, symbol) : (nstate, nsymbol, movement)
+        """
+        movements = TuringMachine.HEAD_MOVEMENTS
         for k, v in self._trans_function.items():
             if len(k) != 2 or len(v) != 3:
                 raise Exception(
@@ -367,9 +1221,9 @@ class TuringMachine:
                 )
 
             inv_state = None
-            if k[0] not in self._states:
+            if k[0] not in self.states:
                 inv_state = k[0]
-            if v[0] not in self._states:
+            if v[0] not in self.states:
                 inv_state = v[0]
             if inv_state:
                 raise Exception(
@@ -378,9 +1232,9 @@ class TuringMachine:
                 )
 
             inv_sym = None
-            if k[1] not in self._tape_alphabet:
+            if k[1] not in self.tape_alphabet:
                 inv_sym = k[1]
-            if v[1] not in self._tape_alphabet:
+            if v[1] not in self.tape_alphabet:
                 inv_sym = v[1]
             if inv_sym:
                 raise Exception(
@@ -405,14 +1259,14 @@ class TuringMachine:
             "Halt state: %s\n\n"
             "Transition Function:\n%s"
             % (
-                str(self._states),
-                str(self._in_alphabet),
-                str(self._tape_alphabet),
-                str(self._blank_sym),
-                str(self._init_state),
-                str(self._final_states),
-                str(self._halt_state),
-                str(self._trans_function),
+                str(self.states),
+                str(self.in_alphabet),
+                str(self.tape_alphabet),
+                str(self.blank_sym),
+                str(self.init_state),
+                str(self.final_states),
+                str(self.halt_state),
+                str(dict(self.trans_function)),
             )
         )
 
@@ -422,18 +1276,48 @@ class TuringMachine:
 
 
 class BaseTuringMachineObserver(metaclass=ABCMeta):
-    @abstractmethod
+    """
+    Base class of the Turing Machine observers.
+
+    Observers declare the events they handle in EVENTS (the names of the
+    methods that handle them), the machine only dispatches those events and
+    run() keeps using the compiled engine when no observer handles any of
+    STEP_START, STEP_END and HEAD_MOVED. Methods of unhandled events are
+    never called.
+
+    The STEPS event is a buffered alternative to the per step events,
+    on_steps(batch) receives the records of up to STEPS_BATCH_SIZE steps at
+    once. The batch is an array('i') with 4 integers per step: state id,
+    read symbol id, written symbol id and head displacement (-1, 0 or 1),
+    TuringMachine.decode_steps() converts them back to states and symbols.
+    The batch is shared by all the observers and must not be modified.
+    """
+
+    STEP_START = "on_step_start"
+    STEP_END = "on_step_end"
+    TAPE_CHANGED = "on_tape_changed"
+    HEAD_MOVED = "on_head_moved"
+    STEPS = "on_steps"
+
+    ALL_EVENTS = frozenset((STEP_START, STEP_END, TAPE_CHANGED, HEAD_MOVED, STEPS))
+    STEP_EVENTS = frozenset((STEP_START, STEP_END, HEAD_MOVED))
+
+    # Events handled by the observer
+    EVENTS = frozenset((STEP_START, STEP_END, TAPE_CHANGED, HEAD_MOVED))
+    # Maximum number of steps delivered by each on_steps() call
+    STEPS_BATCH_SIZE = 4096
+
     def on_step_start(self, state, symbol):
         raise NotImplementedError()
 
-    @abstractmethod
     def on_step_end(self, state, symbol, movement):
         raise NotImplementedError()
 
-    @abstractmethod
     def on_tape_changed(self, head_pos):
         raise NotImplementedError()
 
-    @abstractmethod
     def on_head_moved(self, head_pos, old_head_pos):
         raise NotImplementedError()
+
+    def on_steps(self, batch):
+        raise NotImplementedError()
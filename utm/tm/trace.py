@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+from utm.tm.tape import Tape, compact_typecode
+from utm.tm.tm import BaseTuringMachineObserver, Snapshot, TuringMachine
+
+
+# Trace file format
+##############################################################################
+#
+# A trace file is a header followed by an append-only sequence of chunks,
+# all the integers are little endian:
+#
+#   header:   MAGIC, version (H), number of states (I), number of symbols (I)
+#   keyframe: b"K", step (Q), machine steps (Q), state id (I), start (q),
+#             end (q), head (q) and the end - start cells of the tape from
+#             the first used one
+#   steps:    b"S", number of steps (I) and 4 integers per step: state id,
+#             read symbol id, written symbol id and head displacement (-1 is
+#             stored as the largest integer of the typecode)
+#
+# Steps are numbered from the beginning of the trace. A keyframe holds the
+# whole configuration of the machine after the given number of steps,
+# cells and step records use the smallest unsigned typecode able to store
+# the ids, see compact_typecode().
+
+MAGIC = b"UTMTRACE"
+VERSION = 1
+
+_HEADER = struct.Struct("<HII")
+_KEYFRAME = struct.Struct("<QQIqqq")
+_STEPS = struct.Struct("<I")
+_KEYFRAME_TAG = b"K"
+_STEPS_TAG = b"S"
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def _to_bytes(values):
+    if _BIG_ENDIAN and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if _BIG_ENDIAN and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+
+def _record_typecode(table):
+    return compact_typecode(max(len(table.states), table.num_symbols, 3))
+
+
+class TraceRecorder(BaseTuringMachineObserver):
+    """
+    Records the steps of a turing machine in a trace file that can be
+    replayed with TraceReplayer.
+
+    The recorder attaches itself to the machine and writes the step records
+    as they are delivered in batches, so the machine keeps running on the
+    compiled engine. A keyframe with the whole configuration is written when
+    recording starts, whenever the tape is set or restored and every
+    keyframe_interval steps (at least as many steps as cells has the tape,
+    which keeps the cost of the keyframes amortized O(1) per step).
+
+    Changes of the state that do not change the tape, such as
+    set_at_initial_state(), are only seen by the replayer from the next
+    step or keyframe on.
+    """
+
+    EVENTS = frozenset(
+        (BaseTuringMachineObserver.STEPS, BaseTuringMachineObserver.TAPE_CHANGED)
+    )
+
+    # Default number of steps between two keyframes
+    KEYFRAME_INTERVAL = 1 << 16
+
+    def __init__(self, tm, path, keyframe_interval=None):
+        """
+        TraceRecorder(tm, path, keyframe_interval=None)
+
+            - tm:
+                TuringMachine to record
+            - path:
+                Trace file, it is overwritten
+            - keyframe_interval:
+                Minimum number of steps between two keyframes, by default
+                KEYFRAME_INTERVAL
+        """
+        if not isinstance(tm, TuringMachine):
+            raise TypeError("Only single tape machines can be traced")
+        self._tm = tm
+        self._table = tm.get_definition().table
+        self._keyframe_interval = keyframe_interval or self.KEYFRAME_INTERVAL
+        # Keyframes are written between batches
+        self.STEPS_BATCH_SIZE = min(self.STEPS_BATCH_SIZE, self._keyframe_interval)
+        self._cell_typecode = compact_typecode(self._table.num_symbols)
+        self._record_typecode = _record_typecode(self._table)
+        self._steps = 0
+        self._keyframe_step = 0
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file.write(
+            _HEADER.pack(VERSION, len(self._table.states), self._table.num_symbols)
+        )
+        if tm.is_tape_set():
+            self._write_keyframe()
+        tm.attach_observer(self)
+
+    def get_num_steps(self):
+        """Returns the number of recorded steps"""
+        return self._steps
+
+    def flush(self):
+        """Writes the pending steps of the machine and the buffered data to
+        the file
+        """
+        self._tm.flush_steps()
+        self._file.flush()
+
+    def close(self):
+        """Stops recording and closes the file"""
+        if self._file.closed:
+            return
+        self._tm.flush_steps()
+        self._tm.detach_observer(self)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def on_tape_changed(self, head_pos):
+        self._write_keyframe()
+
+    def on_steps(self, batch):
+        # Truncates the integers of the batch keeping their low order bytes
+        records = array(self._record_typecode)
+        ratio = batch.itemsize // records.itemsize
+        records.frombytes(batch.tobytes())
+        if ratio > 1:
+            records = records[ratio - 1 :: ratio] if _BIG_ENDIAN else records[::ratio]
+
+        self._file.write(_STEPS_TAG)
+        self._file.write(_STEPS.pack(len(batch) // 4))
+        self._file.write(_to_bytes(records))
+        self._steps += len(batch) // 4
+
+        interval = max(self._keyframe_interval, self._tm.get_internal_tape_size())
+        if self._steps - self._keyframe_step >= interval:
+            self._write_keyframe()
+
+    def _write_keyframe(self):
+        state, steps, tape = self._tm.snapshot()
+        pages, start, end, head, _ = tape
+        cells = array(self._cell_typecode, [0]) * (end - start)
+        for first, page in pages.values():
+            cells[first - start : first - start + len(page)] = array(
+                self._cell_typecode, page
+            )
+
+        self._file.write(_KEYFRAME_TAG)
+        self._file.write(
+            _KEYFRAME.pack(
+                self._steps, steps, self._table.state_ids[state], start, end, head
+            )
+        )
+        self._file.write(_to_bytes(cells))
+        self._keyframe_step = self._steps
+
+
+class TraceReplayer:
+    """
+    Random access to the configurations of a trace written by
+    TraceRecorder.
+
+    Opening a trace only indexes its chunks. seek() loads the nearest
+    keyframe at or before the requested step and applies the step records
+    from it, so any step is reached replaying at most one keyframe interval
+    of steps. A trace that ends with an incomplete chunk, e.g. because the
+    recording process was killed, is read up to its last complete chunk.
+    """
+
+    def __init__(self, path, definition):
+        """
+        TraceReplayer(path, definition)
+
+            - path:
+                Trace file
+            - definition:
+                MachineDefinition of the recorded machine
+        """
+        self._table = definition.table
+        self._cell_typecode = compact_typecode(self._table.num_symbols)
+        self._record_typecode = _record_typecode(self._table)
+        self._file = open(path, "rb")
+        try:
+            self._read_index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def get_num_steps(self):
+        """Returns the number of recorded steps"""
+        return self._num_steps
+
+    def get_keyframe_steps(self):
+        """Returns the list of steps with a keyframe"""
+        return [step for step, _ in self._keyframes]
+
+    def seek(self, step):
+        """Returns the Snapshot of the configuration after the given number
+        of steps of the trace, it can be set on a machine of the same
+        definition with TuringMachine.restore().
+
+        When several configurations share the step (the tape was set or
+        restored there) the last one is returned.
+
+        :raise IndexError: if step is not in [0, get_num_steps()].
+        """
+        if not self._keyframes or not 0 <= step <= self._num_steps:
+            raise IndexError("Step %d is not in the trace" % step)
+
+        k = bisect_right(self._keyframe_steps, step) - 1
+        if k < 0:
+            raise IndexError("Step %d is before the first keyframe" % step)
+        first_step, offset = self._keyframes[k]
+        self._file.seek(offset)
+        _, machine_steps, state_id, start, end, head = _KEYFRAME.unpack(
+            self._file.read(_KEYFRAME.size)
+        )
+        cells = _from_bytes(
+            self._cell_typecode,
+            self._file.read((end - start) * array(self._cell_typecode).itemsize),
+        )
+        tape = Tape(cells, head - start, self._cell_typecode)
+
+        table = self._table
+        num_symbols = table.num_symbols
+        base = state_id * num_symbols
+        for records in self._records(offset, first_step, step):
+            for i in range(0, len(records), 4):
+                tape.write(records[i + 2])
+                tape.move(records[i + 3] if records[i + 3] <= 1 else -1)
+            i = len(records) - 4
+            base = table.next_state[records[i] * num_symbols + records[i + 1]]
+
+        return Snapshot(
+            table.state_at(base), machine_steps + step - first_step, tape.snapshot()
+        )
+
+    def iter_steps(self, start=0, stop=None):
+        """Returns an iterator of tuples (state, read symbol, written symbol,
+        movement) of the recorded steps in [start, stop), as
+        TuringMachine.decode_steps() does.
+        """
+        stop = self._num_steps if stop is None else min(stop, self._num_steps)
+        states = self._table.states
+        symbols = self._table.symbols
+        movements = TuringMachine.HEAD_MOVEMENTS_BY_DISPLACEMENT
+        for records in self._records(0, start, stop):
+            for i in range(0, len(records), 4):
+                yield (
+                    states[records[i]],
+                    symbols[records[i + 1]],
+                    symbols[records[i + 2]],
+                    movements[records[i + 3] if records[i + 3] <= 1 else -1],
+                )
+
+    def close(self):
+        """Closes the trace file"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_index(self):
+        """Reads the header and the position of every chunk"""
+        f = self._file
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a trace file")
+        version, num_states, num_symbols = _HEADER.unpack(f.read(_HEADER.size))
+        if version != VERSION:
+            raise ValueError("Unsupported trace version %d" % version)
+        if (num_states, num_symbols) != (
+            len(self._table.states),
+            self._table.num_symbols,
+        ):
+            raise ValueError("The trace was recorded from another machine")
+
+        cell_size = array(self._cell_typecode).itemsize
+        record_size = 4 * array(self._record_typecode).itemsize
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(len(MAGIC) + _HEADER.size)
+
+        # Keyframes (step, offset) and step chunks (first step, offset)
+        self._keyframes = []
+        self._blocks = []
+        steps = 0
+        while True:
+            tag = f.read(1)
+            offset = f.tell()
+            if tag == _KEYFRAME_TAG:
+                data = f.read(_KEYFRAME.size)
+                if len(data) < _KEYFRAME.size:
+                    break
+                step, _, _, start, end, _ = _KEYFRAME.unpack(data)
+                size = (end - start) * cell_size
+                if offset + _KEYFRAME.size + size > file_size:
+                    break
+                self._keyframes.append((step, offset))
+            elif tag == _STEPS_TAG:
+                data = f.read(_STEPS.size)
+                if len(data) < _STEPS.size:
+                    break
+                (count,) = _STEPS.unpack(data)
+                size = count * record_size
+                if offset + _STEPS.size + size > file_size:
+                    break
+                self._blocks.append((steps, offset))
+                steps += count
+            else:
+                break
+            f.seek(size, 1)
+
+        self._num_steps = steps
+        self._keyframe_steps = [step for step, _ in self._keyframes]
+        self._block_steps = [step for step, _ in self._blocks]
+        self._block_offsets = [offset for _, offset in self._blocks]
+
+    def _records(self, offset, start, stop):
+        """Returns an iterator of arrays with the step records in
+        [start, stop) of the chunks after the given file offset.
+        """
+        itemsize = array(self._record_typecode).itemsize
+        # First chunk after offset that can hold start
+        b = max(
+            bisect_right(self._block_offsets, offset),
+            bisect_right(self._block_steps, start) - 1,
+        )
+
+        f = self._file
+        while b < len(self._blocks) and start < stop:
+            first, block_offset = self._blocks[b]
+            f.seek(block_offset)
+            (count,) = _STEPS.unpack(f.read(_STEPS.size))
+            lo, hi = max(start, first) - first, min(stop, first + count) - first
+            if lo < hi:
+                f.seek(4 * lo * itemsize, 1)
+                yield _from_bytes(
+                    self._record_typecode, f.read(4 * (hi - lo) * itemsize)
+                )
+            start = first + hi
+            b += 1
@@ -1,24 +1,33 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import html
+import itertools
 import os
 import importlib.resources
 import sys
+import time
+from collections import deque
 from typing import Final
 
-from PySide2 import QtGui, QtWidgets
+from PySide2 import QtCore, QtGui, QtWidgets
 from PySide2.QtCore import Qt
 
 from utm import highlighters, resources as utm_resources
+from utm.log import ActivityLog
 from utm.tm import (
     BaseTuringMachineObserver,
+    MachineCache,
     TuringMachine,
     TuringMachineParser,
 )
+from utm.tm.analysis import warnings
 from utm.tm.exceptions import (
     UnknownTransitionException,
     HaltStateException,
+    InvalidSymbolException,
     TapeNotSetException,
+    UndoJournalEmptyException,
 )
 
 __program__: Final = "Universal Turing Machine Simulator"
@@ -54,13 +63,61 @@ class GUI(QtWidgets.QWidget):
     # Tape style(s)
     TAPE_HEAD_STYLE = "QLineEdit { border: 2px solid red; background: white;}"
 
-    def __init__(self):
+    # Run Until Halt executes the machine in slices of about RUN_SLICE_SECONDS
+    # from a timer, redrawing the tape and status at most once per frame
+    RUN_SLICE_SECONDS = 0.02
+    RUN_FRAME_SECONDS = 1 / 25
+    RUN_FIRST_SLICE_STEPS = 1000
+
+    # Number of steps that can be undone with Step Back, 4 bytes each. Run
+    # Until Halt runs without the undo journal, which would slow it down,
+    # and Step Back undoes the whole run at once
+    UNDO_LIMIT = 1 << 20
+
+    # Default and allowed range of the maximum number of lines kept by the
+    # activity log, see set_log_max_lines()
+    LOG_MAX_LINES = 5000
+    LOG_MAX_LINES_RANGE = (100, 1000000)
+    # Log lines of each step logged by Run Until Halt
+    LOG_STEP_LINES = 6
+
+    # Number of parsed machines kept, setting an already seen source again
+    # does not parse it
+    MACHINE_CACHE_SIZE = 16
+
+    # Activity log style of each message level: (color, bold)
+    LOG_STYLES = {
+        ActivityLog.INFO: ("black", False),
+        ActivityLog.STRIKING_INFO: ("darkblue", True),
+        ActivityLog.ERROR: ("red", False),
+    }
+
+    def __init__(self, log_max_lines=LOG_MAX_LINES):
+        """
+        :param log_max_lines: Maximum number of lines kept by the activity
+            log, it can be changed later with set_log_max_lines().
+        """
         super().__init__()
 
+        # Kept up to date with the source text box as it is edited
         self.parser = TuringMachineParser()
+        self.machine_cache = MachineCache(GUI.MACHINE_CACHE_SIZE)
         self.turing_machine = None
+        self.tm_observer = TuringMachineObserver(self)
+        self.run_log_observer = RunLogObserver(self)
+        self.activity_log = ActivityLog()
         self.main_vbox = QtWidgets.QVBoxLayout(self)
 
+        self.run_timer = QtCore.QTimer(self)
+        self.run_timer.setInterval(0)
+        self._run_slice_steps = GUI.RUN_FIRST_SLICE_STEPS
+        self._run_start_steps = 0
+        self._run_start_time = 0.0
+        self._last_frame_time = 0.0
+        # Configuration at the start of the last Run Until Halt
+        self._run_undo_snapshot = None
+        self._log_max_lines = log_max_lines
+
     def init_gui(self):
         # Configure window
         self.setMinimumSize(GUI.DEF_WIDTH, GUI.DEF_HEIGHT)
@@ -101,51 +158,101 @@ class GUI(QtWidgets.QWidget):
         """Prints a message on the log_textbox
         Text Color: RED
         """
-        self.log_textbox.setTextColor(Qt.red)
-        self.log_textbox.setFontWeight(QtGui.QFont.Normal)
-        self.log_textbox.append(error)
+        self._print_log(ActivityLog.ERROR, error)
 
     def print_info_log(self, msg):
         """Prints a message on the log_textbox
         Text Color: BLACK
         """
-        self.log_textbox.setTextColor(Qt.black)
-        self.log_textbox.setFontWeight(QtGui.QFont.Normal)
-        self.log_textbox.append(msg)
+        self._print_log(ActivityLog.INFO, msg)
 
     def print_striking_info_log(self, msg):
         """Prints a message on the log_textbox making it more visible than a
         normal log
         """
-        self.log_textbox.setTextColor(Qt.darkBlue)
-        self.log_textbox.setFontWeight(QtGui.QFont.Bold)
-        self.log_textbox.append(msg)
+        self._print_log(ActivityLog.STRIKING_INFO, msg)
+
+    def get_log_max_lines(self):
+        """Returns the maximum number of lines kept by the log area"""
+        return self._log_max_lines
+
+    def set_log_max_lines(self, max_lines):
+        """Sets the maximum number of lines kept by the log area, within
+        LOG_MAX_LINES_RANGE, the oldest lines are dropped. Exports are not
+        affected, they get every line.
+        """
+        low, high = GUI.LOG_MAX_LINES_RANGE
+        max_lines = min(max(max_lines, low), high)
+        self._log_max_lines = max_lines
+        self.log_textbox.setMaximumBlockCount(max_lines)
+        self.log_lines_spinbox.setValue(max_lines)
+        self.export_log_btn.setToolTip(
+            "Streams the whole log to a file, the log area only keeps the "
+            "last %d lines" % max_lines
+        )
+
+    def get_log_max_steps(self):
+        """Returns the number of steps logged by Run Until Halt that fit in
+        the log area
+        """
+        return self._log_max_lines // GUI.LOG_STEP_LINES + 1
 
     #
     # QtGui event handlers
     #
 
+    def closeEvent(self, event):
+        self.run_timer.stop()
+        self.activity_log.stop_export()
+        super().closeEvent(event)
+
     def on_set_turing_machine_clicked(self):
         tm_str = str(self.src_textbox.toPlainText())
         try:
-            self.parser.clean()
-            self.parser.parse_string(tm_str)
-            self.turing_machine = self.parser.create()
-            self.turing_machine.attach_observer(TuringMachineObserver(self))
+            tm = self.machine_cache.get(tm_str, self.parser.create)
+            if not isinstance(tm, TuringMachine):
+                raise Exception("The simulator only runs single tape machines")
+            self.turing_machine = tm
+            self.turing_machine.attach_observer(self.tm_observer)
+            self.turing_machine.set_undo_limit(GUI.UNDO_LIMIT)
+            self._run_undo_snapshot = None
 
             self.print_info_log("Turing machine created")
             self.print_info_log(
                 "Current state: " + str(self.turing_machine.get_current_state())
             )
+            for msg in warnings(tm.get_definition().analysis):
+                self.print_info_log("Warning: " + msg)
 
         except Exception as e:
             self.print_error_log("Error: %s" % str(e))
 
+    def on_source_changed(self, position, chars_removed, chars_added):
+        # Parse again only the lines touched by the change, the number of
+        # replaced lines is deduced from the change in the number of lines
+        doc = self.src_textbox.document()
+        first = doc.findBlock(position)
+        last = doc.findBlock(min(position + chars_added, doc.characterCount() - 1))
+        num_lines = last.blockNumber() - first.blockNumber() + 1
+        lines = []
+        block = first
+        for _ in range(num_lines):
+            lines.append(block.text())
+            block = block.next()
+
+        removed = num_lines - (doc.blockCount() - self.parser.get_line_count())
+        try:
+            self.parser.update_lines(first.blockNumber(), removed, lines)
+        except IndexError:
+            self._reset_source_parser()
+        self._update_source_status()
+
     def on_set_tape_clicked(self):
         tape_str = str(self.tape_textbox.toPlainText())
         if self.turing_machine is not None:
             self.turing_machine.set_tape(tape_str)
             self.turing_machine.set_at_initial_state()
+            self._run_undo_snapshot = None
             self.print_info_log("Tape value established")
         else:
             self.print_error_log(
@@ -166,22 +273,88 @@ class GUI(QtWidgets.QWidget):
         except Exception as e:
             self.print_error_log(str(type(e)))
 
+    def on_step_back_clicked(self):
+        if self.turing_machine is None:
+            self.print_error_log("Error: Turing machine is unset")
+            return
+        if (
+            self.turing_machine.get_undo_steps() == 0
+            and self._run_undo_snapshot is not None
+        ):
+            self.turing_machine.restore(self._run_undo_snapshot)
+            self._run_undo_snapshot = None
+            self.print_info_log("------- Step Back (Run Until Halt) -------")
+        else:
+            try:
+                self.turing_machine.step_back()
+            except UndoJournalEmptyException as e:
+                self.print_error_log(str(e))
+                return
+            self.print_info_log("-------------- Step Back --------------")
+
+        self.print_info_log(
+            "Current state: "
+            + str(self.turing_machine.get_current_state())
+            + (" (FINAL)" if self.turing_machine.is_at_final_state() else "")
+        )
+
     def on_run_until_halt_clicked(self):
-        try:
-            if self.turing_machine.is_at_halt_state():
-                self.print_error_log("Error: The Turing Machine is on halt state")
-            else:
-                self.print_info_log("---------- Run Until Halt ----------")
-
-                try:
-                    while not self.turing_machine.is_at_halt_state():
-                        self.turing_machine.run_step()
-                except TapeNotSetException as e:
-                    self.print_error_log(str(e))
-                except UnknownTransitionException as e:
-                    self.print_error_log(str(e))
-        except AttributeError:
+        if self.turing_machine is None:
             self.print_error_log("Error: Turing machine is unset")
+        elif self.turing_machine.is_at_halt_state():
+            self.print_error_log("Error: The Turing Machine is on halt state")
+        elif not self.turing_machine.is_tape_set():
+            self.print_error_log("Error: The tape must be set before running")
+        elif self._set_breakpoints():
+            self.print_info_log("---------- Run Until Halt ----------")
+
+            # The steps are collected in batches and logged, along with a
+            # redraw of the tape and status, once per frame
+            self.turing_machine.detach_observer(self.tm_observer)
+            self.turing_machine.attach_observer(self.run_log_observer)
+            # The journal would make the run several times slower, the run
+            # is undone restoring its initial configuration instead
+            self._run_undo_snapshot = self.turing_machine.snapshot()
+            self.turing_machine.set_undo_limit(0)
+
+            self._run_slice_steps = GUI.RUN_FIRST_SLICE_STEPS
+            self._run_start_steps = self.turing_machine.get_executed_steps_counter()
+            self._run_start_time = self._last_frame_time = time.perf_counter()
+            self._set_running(True)
+            self.run_timer.start()
+
+    def on_run_slice(self):
+        tm = self.turing_machine
+        start = time.perf_counter()
+        exit_code = tm.run(self._run_slice_steps)
+        now = time.perf_counter()
+
+        # Adapt the slice length to take about RUN_SLICE_SECONDS
+        elapsed = now - start
+        if elapsed > 0:
+            target = self._run_slice_steps * GUI.RUN_SLICE_SECONDS / elapsed
+            self._run_slice_steps = max(1, min(int(target), 4 * self._run_slice_steps))
+
+        if exit_code == TuringMachine.EXIT_HALT:
+            self._finish_run("Halt state reached")
+        elif exit_code == TuringMachine.EXIT_BREAKPOINT:
+            self._finish_run("Breakpoint reached")
+        elif exit_code == TuringMachine.EXIT_UNKNOWN_TRANSITION:
+            symbol = tm.get_symbol_at(tm.get_head_position())
+            self._finish_run(
+                "There are no transition for %s"
+                % str((tm.get_current_state(), symbol)),
+                error=True,
+            )
+        elif now - self._last_frame_time >= GUI.RUN_FRAME_SECONDS:
+            self._last_frame_time = now
+            self._log_run_steps()
+            self._update_run_status(now)
+            self.redraw_tape(tm.get_head_position())
+
+    def on_stop_clicked(self):
+        if self.run_timer.isActive():
+            self._finish_run("Execution stopped")
 
     def on_load_clicked(self):
         fname, _ = QtWidgets.QFileDialog.getOpenFileName(
@@ -209,6 +382,26 @@ class GUI(QtWidgets.QWidget):
     def on_clear_log_clicked(self):
         self.log_textbox.clear()
 
+    def on_export_log_toggled(self, checked):
+        if not checked:
+            self.activity_log.stop_export()
+            self.print_info_log("Log export stopped")
+            return
+
+        fname, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export log", os.path.expanduser("~")
+        )
+        if not fname:
+            self.export_log_btn.setChecked(False)
+            return
+
+        try:
+            self.activity_log.start_export(fname, self._get_log_lines())
+            self.print_info_log("Exporting log to: %s" % fname)
+        except OSError as e:
+            self.export_log_btn.setChecked(False)
+            self.print_error_log("Error: %s" % str(e))
+
     def on_print_all_tape(self):
         if self.turing_machine:
             try:
@@ -228,6 +421,152 @@ class GUI(QtWidgets.QWidget):
     # 'Private'
     #
 
+    def _print_log(self, level, msg):
+        self.activity_log.append(level, msg)
+
+        color, bold = GUI.LOG_STYLES[level]
+        text = html.escape(msg)
+        if bold:
+            text = "<b>%s</b>" % text
+        self.log_textbox.appendHtml('<span style="color:%s">%s</span>' % (color, text))
+        # The log area is the only copy of the messages, the level is kept
+        # in the block for exports
+        self.log_textbox.document().lastBlock().setUserState(level)
+
+    def _log_run_steps(self):
+        """Logs the steps collected by run_log_observer since the last call,
+        all of them are exported but only the last ones reach the log area.
+        """
+        batches = self.run_log_observer.take_batches()
+        if not batches:
+            return
+
+        tm = self.turing_machine
+        final_states = tm.get_definition().final_states
+        shown = deque(maxlen=self._log_max_lines)
+        steps = (step for batch in batches for step in tm.decode_steps(batch))
+        state, symbol, written, movement = next(steps)
+        for step in itertools.chain(steps, [(tm.get_current_state(),)]):
+            lines = step_start_log_lines(state, symbol) + step_end_log_lines(
+                step[0], written, movement, step[0] in final_states
+            )
+            self.activity_log.append_many(ActivityLog.INFO, lines)
+            shown.extend(lines)
+            if len(step) > 1:
+                state, symbol, written, movement = step
+
+        doc = self.log_textbox.document()
+        cursor = QtGui.QTextCursor(doc)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        if not doc.isEmpty():
+            cursor.insertBlock()
+        cursor.insertText("\n".join(shown), QtGui.QTextCharFormat())
+        self.log_textbox.moveCursor(QtGui.QTextCursor.End)
+
+    def _get_log_lines(self):
+        """Returns an iterator of the (level, message) tuples shown on the
+        log area
+        """
+        doc = self.log_textbox.document()
+        if doc.isEmpty():
+            return
+        block = doc.firstBlock()
+        while block.isValid():
+            level = block.userState()
+            yield (ActivityLog.INFO if level < 0 else level), block.text()
+            block = block.next()
+
+    def _finish_run(self, msg, error=False):
+        self.run_timer.stop()
+        self.turing_machine.detach_observer(self.run_log_observer)
+        self.turing_machine.attach_observer(self.tm_observer)
+        self.turing_machine.set_undo_limit(GUI.UNDO_LIMIT)
+        self._set_running(False)
+        self._log_run_steps()
+
+        self._update_run_status(time.perf_counter())
+        self.redraw_tape(self.turing_machine.get_head_position())
+
+        if error:
+            self.print_error_log(msg)
+        else:
+            self.print_info_log(msg)
+        steps = self.turing_machine.get_executed_steps_counter()
+        self.print_info_log("Steps executed: %d" % (steps - self._run_start_steps))
+        self.print_info_log(
+            "Current state: "
+            + str(self.turing_machine.get_current_state())
+            + (" (FINAL)" if self.turing_machine.is_at_final_state() else "")
+        )
+
+    def _set_breakpoints(self):
+        """Sets the breakpoints of the breakpoints box on the machine,
+        returns False if they are not valid.
+        """
+        states, transitions, head_positions, steps = [], [], [], []
+        for item in self.breakpoints_textbox.text().split(";"):
+            item = item.strip()
+            if not item:
+                continue
+            key, _, value = item.partition(" ")
+            try:
+                if key == "head":
+                    head_positions.append(int(value))
+                elif key == "step":
+                    steps.append(int(value))
+                elif "," in item:
+                    state, symbol = item.split(",", 1)
+                    transitions.append((state.strip(), symbol.strip()))
+                else:
+                    states.append(item)
+            except ValueError:
+                self.print_error_log("Error: Invalid breakpoint '%s'" % item)
+                return False
+
+        try:
+            self.turing_machine.set_breakpoints(
+                states, transitions, head_positions, steps
+            )
+        except (ValueError, InvalidSymbolException) as e:
+            self.print_error_log("Error: Invalid breakpoint, %s" % str(e))
+            return False
+        return True
+
+    def _reset_source_parser(self):
+        self.parser.clean()
+        self.parser.update_lines(0, 0, self.src_textbox.toPlainText().split("\n"))
+
+    def _update_source_status(self):
+        errors = self.parser.get_errors()
+        if errors:
+            self.src_status_label.setText("Line %d, %s" % errors[0])
+            self.src_status_label.setToolTip(
+                "\n".join("Line %d, %s" % error for error in errors[:20])
+            )
+        else:
+            self.src_status_label.setText("")
+            self.src_status_label.setToolTip("")
+
+    def _update_run_status(self, now):
+        steps = self.turing_machine.get_executed_steps_counter() - self._run_start_steps
+        elapsed = now - self._run_start_time
+        rate = steps / elapsed if elapsed > 0 else 0.0
+        self.run_status_label.setText(
+            "Steps: {:,} ({:,.0f} steps/s)".format(steps, rate)
+        )
+
+    def _set_running(self, running):
+        self.stop_btn.setEnabled(running)
+        for btn in (
+            self.set_tm_btn,
+            self.set_tape_btn,
+            self.run_step_btn,
+            self.step_back_btn,
+            self.run_all_btn,
+        ):
+            btn.setEnabled(not running)
+        self.breakpoints_textbox.setEnabled(not running)
+
     def _init_icon(self):
         data = importlib.resources.read_binary(utm_resources, "icon.png")
         pix_map = QtGui.QPixmap()
@@ -266,7 +605,9 @@ class GUI(QtWidgets.QWidget):
 
         # Add log text box
         log_label = QtWidgets.QLabel("Activity Log", self)
-        self.log_textbox = QtWidgets.QTextEdit(self)
+        # Plain text edit lays out only the visible blocks and drops the
+        # oldest ones once the maximum block count is reached
+        self.log_textbox = QtWidgets.QPlainTextEdit(self)
         self.log_textbox.setReadOnly(True)
         log_vbox.addWidget(log_label, 0, Qt.AlignCenter)
         log_vbox.addWidget(self.log_textbox)
@@ -275,8 +616,18 @@ class GUI(QtWidgets.QWidget):
         log_hbox = QtWidgets.QHBoxLayout()
         self.clear_log_btn = QtWidgets.QPushButton("Clear Log", self)
         self.print_all_tape_btn = QtWidgets.QPushButton("Print All Tape", self)
+        self.export_log_btn = QtWidgets.QPushButton("Export Log", self)
+        self.export_log_btn.setCheckable(True)
+        self.log_lines_spinbox = QtWidgets.QSpinBox(self)
+        self.log_lines_spinbox.setRange(*GUI.LOG_MAX_LINES_RANGE)
+        self.log_lines_spinbox.setSingleStep(1000)
+        self.log_lines_spinbox.setSuffix(" lines")
+        self.log_lines_spinbox.setToolTip("Lines kept by the log area")
+        self.set_log_max_lines(self._log_max_lines)
 
         log_hbox.addWidget(self.print_all_tape_btn)
+        log_hbox.addWidget(self.export_log_btn)
+        log_hbox.addWidget(self.log_lines_spinbox)
         log_hbox.addWidget(self.clear_log_btn)
 
         log_vbox.addLayout(log_hbox)
@@ -292,12 +643,15 @@ class GUI(QtWidgets.QWidget):
         ctrl_llabel = QtWidgets.QLabel("TM Source Code", self)
         self.src_textbox = QtWidgets.QTextEdit(self)
         highlighters.TMSourceHighlighter(self.src_textbox)
+        self.src_status_label = QtWidgets.QLabel("", self)
+        self.src_status_label.setStyleSheet("QLabel { color: red; }")
         self.src_load_btn = QtWidgets.QPushButton("Load", self)
         self.src_save_btn = QtWidgets.QPushButton("Save", self)
 
         self.ctrl_lvbox = QtWidgets.QVBoxLayout()
         self.ctrl_lvbox.addWidget(ctrl_llabel, 0, Qt.AlignCenter)
         self.ctrl_lvbox.addWidget(self.src_textbox)
+        self.ctrl_lvbox.addWidget(self.src_status_label)
         ctrl_btn_hbox = QtWidgets.QHBoxLayout()
         ctrl_btn_hbox.addWidget(self.src_load_btn)
         ctrl_btn_hbox.addWidget(self.src_save_btn)
@@ -309,17 +663,41 @@ class GUI(QtWidgets.QWidget):
         self.set_tm_btn = QtWidgets.QPushButton("Set TM", self)
         self.set_tape_btn = QtWidgets.QPushButton("Set Tape", self)
         self.run_step_btn = QtWidgets.QPushButton("Run Step", self)
+        self.step_back_btn = QtWidgets.QPushButton("Step Back", self)
         self.run_all_btn = QtWidgets.QPushButton("Run Until Halt", self)
+        self.stop_btn = QtWidgets.QPushButton("Stop", self)
+        self.stop_btn.setEnabled(False)
+        self.breakpoints_textbox = QtWidgets.QLineEdit(self)
+        self.breakpoints_textbox.setPlaceholderText("Breakpoints")
+        self.run_status_label = QtWidgets.QLabel("", self)
 
         self.ctrl_rvbox = QtWidgets.QVBoxLayout()
         self.ctrl_rvbox.addWidget(ctrl_rlabel, 0, Qt.AlignCenter)
         self.ctrl_rvbox.addWidget(self.tape_textbox)
         self.ctrl_rvbox.addWidget(self.set_tm_btn)
         self.ctrl_rvbox.addWidget(self.set_tape_btn)
-        self.ctrl_rvbox.addWidget(self.run_step_btn)
+        step_btn_hbox = QtWidgets.QHBoxLayout()
+        step_btn_hbox.addWidget(self.step_back_btn)
+        step_btn_hbox.addWidget(self.run_step_btn)
+        self.ctrl_rvbox.addLayout(step_btn_hbox)
+        self.ctrl_rvbox.addWidget(self.breakpoints_textbox)
         self.ctrl_rvbox.addWidget(self.run_all_btn)
+        self.ctrl_rvbox.addWidget(self.stop_btn)
+        self.ctrl_rvbox.addWidget(self.run_status_label, 0, Qt.AlignCenter)
 
         # Add some tooltips
+        self.breakpoints_textbox.setToolTip(
+            "Run Until Halt stops at these breakpoints, separated by ';':\n"
+            "  q3 - before a transition from state q3\n"
+            "  q3, 1 - before the transition of state q3 and symbol 1\n"
+            "  head 10 - when the head reaches position 10, counted from the\n"
+            "      first cell of the tape when it was set\n"
+            "  step 500 - when 500 steps have been executed"
+        )
+        self.step_back_btn.setToolTip(
+            "Undoes the last step, up to %d steps since the tape was set, or "
+            "the whole last Run Until Halt" % GUI.UNDO_LIMIT
+        )
         self.set_tape_btn.setToolTip(
             "Sets the tape values and forces the TM " "to be at the initial state"
         )
@@ -334,41 +712,57 @@ class GUI(QtWidgets.QWidget):
         self.set_tm_btn.clicked.connect(self.on_set_turing_machine_clicked)
         self.set_tape_btn.clicked.connect(self.on_set_tape_clicked)
         self.run_step_btn.clicked.connect(self.on_run_step_clicked)
+        self.step_back_btn.clicked.connect(self.on_step_back_clicked)
         self.run_all_btn.clicked.connect(self.on_run_until_halt_clicked)
+        self.stop_btn.clicked.connect(self.on_stop_clicked)
+        self.run_timer.timeout.connect(self.on_run_slice)
         self.src_load_btn.clicked.connect(self.on_load_clicked)
         self.src_save_btn.clicked.connect(self.on_save_clicked)
+        self._reset_source_parser()
+        self.src_textbox.document().contentsChange.connect(self.on_source_changed)
         self.clear_log_btn.clicked.connect(self.on_clear_log_clicked)
+        self.export_log_btn.toggled.connect(self.on_export_log_toggled)
+        self.log_lines_spinbox.valueChanged.connect(self.set_log_max_lines)
         self.print_all_tape_btn.clicked.connect(self.on_print_all_tape)
 
 
+def step_start_log_lines(state, symbol):
+    """Returns the log lines of the start of a step"""
+    return [
+        "+++++++++++++++++++++++++++++++++++++++++++++++",
+        'Started step at state "%s" with tape symbol "%s"' % (str(state), str(symbol)),
+    ]
+
+
+def step_end_log_lines(new_state, writen_symbol, movement, final):
+    """Returns the log lines of the end of a step"""
+    if movement == TuringMachine.MOVE_LEFT:
+        moved = "Head moved to the left"
+    elif movement == TuringMachine.MOVE_RIGHT:
+        moved = "Head moved to the right"
+    else:
+        moved = "Head remains at the same position"
+
+    return [
+        "-----------------------------------------------",
+        "Writen Symbol: " + str(writen_symbol),
+        moved,
+        "Current state: " + str(new_state) + (" (FINAL)" if final else ""),
+    ]
+
+
 class TuringMachineObserver(BaseTuringMachineObserver):
     def __init__(self, gui):
         self.gui = gui
 
     def on_step_start(self, current_state, current_tape_symbol):
-        self.gui.print_info_log("+++++++++++++++++++++++++++++++++++++++++++++++")
-        self.gui.print_info_log(
-            'Started step at state "%s" with tape symbol "%s"'
-            % (str(current_state), str(current_tape_symbol))
-        )
+        for line in step_start_log_lines(current_state, current_tape_symbol):
+            self.gui.print_info_log(line)
 
     def on_step_end(self, new_state, writen_symbol, movement):
-        self.gui.print_info_log("-----------------------------------------------")
-
-        self.gui.print_info_log("Writen Symbol: " + str(writen_symbol))
-
-        if movement == TuringMachine.MOVE_LEFT:
-            self.gui.print_info_log("Head moved to the left")
-        elif movement == TuringMachine.MOVE_RIGHT:
-            self.gui.print_info_log("Head moved to the right")
-        else:
-            self.gui.print_info_log("Head remains at the same position")
-
-        self.gui.print_info_log(
-            "Current state: "
-            + str(new_state)
-            + (" (FINAL)" if self.gui.turing_machine.is_at_final_state() else "")
-        )
+        final = self.gui.turing_machine.is_at_final_state()
+        for line in step_end_log_lines(new_state, writen_symbol, movement, final):
+            self.gui.print_info_log(line)
 
     def on_tape_changed(self, head_pos):
         self.gui.redraw_tape(head_pos)
@@ -377,5 +771,35 @@ class TuringMachineObserver(BaseTuringMachineObserver):
         self.gui.redraw_tape(head_pos)
 
 
+class RunLogObserver(BaseTuringMachineObserver):
+    """
+    Collects the step batches of Run Until Halt, the GUI logs them once per
+    frame. Unless the log is being exported only the batches of the last
+    GUI.get_log_max_steps() steps are kept, the older ones would not fit in
+    the log.
+    """
+
+    EVENTS = frozenset((BaseTuringMachineObserver.STEPS,))
+
+    def __init__(self, gui):
+        self.gui = gui
+        self._batches = deque()
+        self._steps = 0
+
+    def on_steps(self, batch):
+        self._batches.append(batch)
+        self._steps += len(batch) // 4
+        if not self.gui.activity_log.is_exporting():
+            max_steps = self.gui.get_log_max_steps()
+            while self._steps - len(self._batches[0]) // 4 >= max_steps:
+                self._steps -= len(self._batches.popleft()) // 4
+
+    def take_batches(self):
+        """Returns the collected batches and forgets them"""
+        batches, self._batches = self._batches, deque()
+        self._steps = 0
+        return batches
+
+
 if __name__ == "__main__":
     main()